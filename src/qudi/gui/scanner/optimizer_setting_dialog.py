@@ -87,6 +87,10 @@ class OptimizerSettingWidget(QtWidgets.QWidget):
         self.optimize_sequence_combobox = QtWidgets.QComboBox()
         self.optimize_sequence_combobox.addItems(str(seq) for seq in self.available_opt_sequences)
 
+        self.optimize_mode_combobox = QtWidgets.QComboBox()
+        self.optimize_mode_combobox.addItem('Scan sequence', 'sequence')
+        self.optimize_mode_combobox.addItem('Line search', 'line_search')
+
         label = QtWidgets.QLabel('Data channel:')
         label.setAlignment(QtCore.Qt.AlignVCenter | QtCore.Qt.AlignRight)
         label.setFont(font)
@@ -95,6 +99,11 @@ class OptimizerSettingWidget(QtWidgets.QWidget):
         misc_settings_groupbox.setLayout(QtWidgets.QGridLayout())
         misc_settings_groupbox.layout().addWidget(label, 0, 0)
         misc_settings_groupbox.layout().addWidget(self.data_channel_combobox, 0, 1)
+        label = QtWidgets.QLabel('Optimize mode:')
+        label.setAlignment(QtCore.Qt.AlignVCenter | QtCore.Qt.AlignRight)
+        label.setFont(font)
+        misc_settings_groupbox.layout().addWidget(label, 1, 0)
+        misc_settings_groupbox.layout().addWidget(self.optimize_mode_combobox, 1, 1)
         misc_settings_groupbox.layout().setColumnStretch(1, 1)
 
         label_opt_seq = QtWidgets.QLabel('Sequence:')
@@ -121,7 +130,8 @@ class OptimizerSettingWidget(QtWidgets.QWidget):
                 'scan_sequence': self.available_opt_sequences[self.optimize_sequence_combobox.currentIndex()].sequence,
                 'scan_resolution': self.axes_widget.resolution,
                 'scan_range': self.axes_widget.range,
-                'scan_frequency': self.axes_widget.frequency}
+                'scan_frequency': self.axes_widget.frequency,
+                'optimize_mode': self.optimize_mode_combobox.currentData()}
 
     @property
     def available_opt_sequences(self):
@@ -142,6 +152,11 @@ class OptimizerSettingWidget(QtWidgets.QWidget):
             self.optimize_sequence_combobox.setCurrentIndex(idx_combo)
 
             self.optimize_sequence_combobox.blockSignals(False)
+        if 'optimize_mode' in settings:
+            self.optimize_mode_combobox.blockSignals(True)
+            idx_combo = self.optimize_mode_combobox.findData(settings['optimize_mode'])
+            self.optimize_mode_combobox.setCurrentIndex(max(idx_combo, 0))
+            self.optimize_mode_combobox.blockSignals(False)
         if 'scan_range' in settings:
             self.axes_widget.set_range(settings['scan_range'])
         if 'scan_resolution' in settings:
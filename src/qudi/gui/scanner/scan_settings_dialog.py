@@ -139,8 +139,25 @@ class ScannerSettingsWidget(QtWidgets.QWidget):
         frequency_groupbox.setFont(font)
         frequency_groupbox.setLayout(layout)
 
+        self.averages_spinbox = QtWidgets.QSpinBox()
+        self.averages_spinbox.setObjectName('averages_spinBox')
+        self.averages_spinbox.setRange(1, 10000)
+        self.averages_spinbox.setValue(1)
+        self.averages_spinbox.setToolTip('Number of frames to acquire and average for each scan')
+        layout = QtWidgets.QHBoxLayout()
+        label = QtWidgets.QLabel('Frames:')
+        label.setAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+        layout.addWidget(label)
+        layout.addWidget(self.averages_spinbox)
+        layout.setStretch(1, 1)
+
+        averages_groupbox = QtWidgets.QGroupBox('Frame Averaging')
+        averages_groupbox.setFont(font)
+        averages_groupbox.setLayout(layout)
+
         self.setLayout(QtWidgets.QVBoxLayout())
         self.layout().addWidget(frequency_groupbox)
+        self.layout().addWidget(averages_groupbox)
 
     @property
     def axes(self):
@@ -157,6 +174,16 @@ class ScannerSettingsWidget(QtWidgets.QWidget):
             for ax, widgets in self.axes_widgets.items()
         }
 
+    @property
+    def averages(self):
+        return self.averages_spinbox.value()
+
+    @QtCore.Slot(int)
+    def set_averages(self, value):
+        self.averages_spinbox.blockSignals(True)
+        self.averages_spinbox.setValue(value)
+        self.averages_spinbox.blockSignals(False)
+
     @QtCore.Slot(dict)
     @QtCore.Slot(object, str)
     def set_frequency(self, value, axis=None):
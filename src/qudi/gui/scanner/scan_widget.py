@@ -32,6 +32,7 @@ from qudi.util.widgets.plotting.image_widget import RubberbandZoomSelectionImage
 from qudi.util.widgets.plotting.plot_item import XYPlotItem
 from qudi.util.paths import get_artwork_dir
 from qudi.interface.scanning_probe_interface import ScanData, ScannerAxis, ScannerChannel
+from qudi.interface.scanner_interface import ScanDataPyramid
 
 
 class _BaseScanWidget(QtWidgets.QWidget):
@@ -230,6 +231,12 @@ class Scan2DWidget(_BaseScanWidget):
         # disable buggy pyqtgraph 'Export..' context menu
         self.image_widget.plot_widget.getPlotItem().vb.scene().contextMenu[0].setVisible(False)
 
+        # Multi-resolution representation of large images. Only the level matching the screen
+        # resolution (and the visible region when zoomed in) is pushed to the image item.
+        self._pyramid = ScanDataPyramid()
+        self._updating_image = False
+        self.image_item.getViewBox().sigRangeChanged.connect(self._view_range_changed)
+
     @property
     def marker_position(self) -> Tuple[float, float]:
         return self.image_widget.region_selection[self.image_widget.SelectionMode.XY][0][0]
@@ -286,9 +293,35 @@ class Scan2DWidget(_BaseScanWidget):
     def set_scan_data(self, data: ScanData) -> None:
         # Save reference for channel changes
         self._scan_data = data
+        self._pyramid.update(data)
         # Set data
         self._update_scan_data()
 
+    @property
+    def _view_pixels(self) -> int:
+        vb = self.image_item.getViewBox()
+        return int(max(vb.width(), vb.height()))
+
+    def _view_range_changed(self, *args) -> None:
+        # Show the visible region at a matching resolution level when zoomed in
+        if self._updating_image or self._pyramid.number_of_levels < 2:
+            return
+        current_channel = self.channel_selection_combobox.currentText()
+        if (self._scan_data is None) or (current_channel not in self._scan_data.channels):
+            return
+        x_range, y_range = self.image_item.getViewBox().viewRange()
+        image, image_range = self._pyramid.get_region(current_channel,
+                                                      x_range,
+                                                      y_range,
+                                                      self._scan_data.scan_range,
+                                                      self._view_pixels)
+        self._updating_image = True
+        try:
+            self.image_widget.set_image(image)
+            self.image_widget.set_image_extent(image_range, adjust_for_px_size=True)
+        finally:
+            self._updating_image = False
+
     @QtCore.Slot(dict)
     def _region_changed(self, regions) -> None:
         center = regions[self.image_widget.SelectionMode.XY][0][0]
@@ -314,7 +347,34 @@ class Scan2DWidget(_BaseScanWidget):
             or (current_channel not in self._scan_data.channels):
             self.image_widget.set_image(None)
         else:
-            self.image_widget.set_image(self._scan_data.data[current_channel])
-            self.image_widget.set_image_extent(self._scan_data.scan_range,
-                                               adjust_for_px_size=True)
-            self.image_widget.autoRange()
+            self._updating_image = True
+            try:
+                if self._pyramid.number_of_levels > 1:
+                    level = self._pyramid.level_for_size(self._view_pixels)
+                    image = self._pyramid.get_level(current_channel, level)
+                else:
+                    image = self._scan_data.data[current_channel]
+                self.image_widget.set_image(image)
+                # Level pixels are 2**level blocks of full resolution pixels
+                self.image_widget.set_image_extent(
+                    self._level_range(image.shape),
+                    adjust_for_px_size=True
+                )
+                self.image_widget.autoRange()
+            finally:
+                self._updating_image = False
+
+    def _level_range(self, shape) -> Tuple[Tuple[float, float], Tuple[float, float]]:
+        # Range of pixel centers of a (downsampled) image covering the full scan range
+        image_range = list()
+        for (scan_min, scan_max), size, full_size in zip(self._scan_data.scan_range,
+                                                         shape,
+                                                         self._scan_data.scan_resolution):
+            if size == full_size or full_size < 2:
+                image_range.append((scan_min, scan_max))
+                continue
+            step = (scan_max - scan_min) / (full_size - 1)
+            factor = 2 ** int(round(np.log2(full_size / size)))
+            last = min((size - 1) * factor + (factor - 1) / 2, full_size - 1)
+            image_range.append((scan_min + step * (factor - 1) / 2, scan_min + step * last))
+        return tuple(image_range)
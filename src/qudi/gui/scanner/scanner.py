@@ -119,7 +119,7 @@ class ScannerGui(GuiBase):
     # signals
     sigScannerTargetChanged = QtCore.Signal(dict, object)
     sigScanSettingsChanged = QtCore.Signal(dict)
-    sigToggleScan = QtCore.Signal(bool, tuple, object)
+    sigToggleScan = QtCore.Signal(bool, tuple, object, int)
     sigOptimizerSettingsChanged = QtCore.Signal(dict)
     sigToggleOptimize = QtCore.Signal(bool)
     sigSaveScan = QtCore.Signal(object, object)
@@ -229,6 +229,12 @@ class ScannerGui(GuiBase):
         self._scanning_logic().sigScanStateChanged.connect(
             self.scan_state_updated, QtCore.Qt.QueuedConnection
         )
+        self._scanning_logic().sigScanSliceUpdated.connect(
+            self.scan_slice_updated, QtCore.Qt.QueuedConnection
+        )
+        self._scanning_logic().sigAveragingProgress.connect(
+            self.averaging_progress_updated, QtCore.Qt.QueuedConnection
+        )
         self._data_logic().sigHistoryScanDataRestored.connect(
             self._update_from_history, QtCore.Qt.QueuedConnection
         )
@@ -275,6 +281,8 @@ class ScannerGui(GuiBase):
         self._scanning_logic().sigScannerTargetChanged.disconnect(self.scanner_target_updated)
         self._scanning_logic().sigScanSettingsChanged.disconnect(self.scanner_settings_updated)
         self._scanning_logic().sigScanStateChanged.disconnect(self.scan_state_updated)
+        self._scanning_logic().sigScanSliceUpdated.disconnect(self.scan_slice_updated)
+        self._scanning_logic().sigAveragingProgress.disconnect(self.averaging_progress_updated)
         self._optimize_logic().sigOptimizeStateChanged.disconnect(self.optimize_state_updated)
         self._data_logic().sigHistoryScanDataRestored.disconnect(self._update_from_history)
         self.scanner_control_dockwidget.sigTargetChanged.disconnect()
@@ -592,13 +600,15 @@ class ScannerGui(GuiBase):
         """
         # ToDo: Implement backwards scanning functionality
         forward_freq = {ax: freq[0] for ax, freq in self._ssd.settings_widget.frequency.items()}
-        self.sigScanSettingsChanged.emit({'frequency': forward_freq})
+        self.sigScanSettingsChanged.emit({'frequency': forward_freq,
+                                          'averages': self._ssd.settings_widget.averages})
 
     @QtCore.Slot()
     def restore_scanner_settings(self):
         """ ToDo: Document
         """
-        self.scanner_settings_updated({'frequency': self._scanning_logic().scan_frequency})
+        self.scanner_settings_updated({'frequency': self._scanning_logic().scan_frequency,
+                                       'averages': self._scanning_logic().scan_averages})
 
     @QtCore.Slot(bool)
     def scanner_settings_toggle_gui_lock(self, locked):
@@ -634,6 +644,8 @@ class ScannerGui(GuiBase):
                 ax: (forward, old_freq[ax][1]) for ax, forward in settings['frequency'].items()
             }
             self._ssd.settings_widget.set_frequency(new_freq)
+        if 'averages' in settings:
+            self._ssd.settings_widget.set_averages(settings['averages'])
         return
 
     @QtCore.Slot(dict)
@@ -698,7 +710,9 @@ class ScannerGui(GuiBase):
                                                               text=y_ax,
                                                               units=scan_data.axes_units[y_ax],
                                                               axs=scan_data.scan_axes)
-                elif scan_data.scan_dimension == 1:
+                elif scan_data.scan_dimension == 1 and tuple(scan_data.scan_axes) in \
+                        [tuple(step) for step in self.optimizer_dockwidget.scan_sequence]:
+                    # line search optimize scans of 2D sequence steps have no plot
                     x_ax = scan_data.scan_axes[0]
                     self.optimizer_dockwidget.set_plot_data(
                         x=np.linspace(*scan_data.scan_range[0], scan_data.scan_resolution[0]),
@@ -723,6 +737,23 @@ class ScannerGui(GuiBase):
                     self._update_scan_data(scan_data)
         return
 
+    @QtCore.Slot(int, int)
+    def averaging_progress_updated(self, frames_done, frames_total):
+        """ Shows the number of completed frames of an averaged scan in the status bar.
+        """
+        if frames_total > 1:
+            self._mw.statusBar().showMessage(f'Averaged frames: {frames_done}/{frames_total}')
+        else:
+            self._mw.statusBar().clearMessage()
+
+    @QtCore.Slot(int, object, object)
+    def scan_slice_updated(self, index, slice_data, caller_id=None):
+        """ Show the currently acquired slice of a running 3D scan in the 2D scan widget of the
+        first two scan axes.
+        """
+        if slice_data is not None and slice_data.scan_axes in self.scan_2d_dockwidgets:
+            self._update_scan_data(slice_data)
+
     @QtCore.Slot(bool, dict, object)
     def optimize_state_updated(self, is_running, optimal_position=None, fit_data=None):
         self._optimizer_state['is_running'] = is_running
@@ -830,6 +861,9 @@ class ScannerGui(GuiBase):
 
     @QtCore.Slot(object)
     def _update_from_history(self, scan_data):
+        if scan_data.scan_dimension == 3:
+            # show the last slice of a volume
+            scan_data = scan_data.get_slice(scan_data.scan_resolution[2] - 1)
         self._update_scan_data(scan_data)
         self.set_active_tab(scan_data.scan_axes)
 
@@ -890,7 +924,9 @@ class ScannerGui(GuiBase):
             self._toggle_enable_scan_buttons(not enabled, exclude_scan=axes)
             self._toggle_enable_actions(not enabled)
             self._toggle_enable_scan_crosshairs(not enabled)
-            self.sigToggleScan.emit(enabled, axes, self.module_uuid)
+            # Frame averaging only applies to scans started from this GUI
+            self.sigToggleScan.emit(enabled, axes, self.module_uuid,
+                                    self._ssd.settings_widget.averages)
         return toggle_func
 
     def __get_save_scan_data_func(self, axes: Union[Tuple[str], Tuple[str, str]]):
@@ -0,0 +1,438 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file contains a dummy hardware module for the FiniteSamplingIOInterface, e.g. to run and
+benchmark the NiXSeriesScanner without a National Instruments card.
+
+Copyright (c) 2021, the qudi developers. See the AUTHORS.md file at the top-level directory of this
+distribution and on <https://github.com/Ulm-IQO/qudi-iqo-modules/>
+
+This file is part of qudi.
+
+Qudi is free software: you can redistribute it and/or modify it under the terms of
+the GNU Lesser General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along with qudi.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import time
+import importlib
+import numpy as np
+
+from qudi.core.configoption import ConfigOption
+from qudi.util.mutex import RecursiveMutex
+from qudi.util.enums import SamplingOutputMode
+from qudi.interface.finite_sampling_io_interface import FiniteSamplingIOInterface
+from qudi.interface.finite_sampling_io_interface import FiniteSamplingIOConstraints
+
+
+class SpotResponse:
+    """ Default response of the FiniteSamplingIODummy input channels. Gaussian spots are randomly
+    placed within the output voltage space. Count rate channels (unit "c/s") return Poissonian
+    counts, all other channels the spot intensity with gaussian noise.
+
+    Any callable with the same signature can be used as response function:
+        response(channel, outputs, times) -> 1D numpy.ndarray
+    with <outputs> being a dict of output sample arrays for each active output channel (keys) and
+    <times> the sample times in s since the start of the frame.
+    """
+
+    def __init__(self, output_limits, count_channels, spot_number=50, spot_width=0.05,
+                 peak_rate=2e5, background_rate=5e3, seed=None):
+        rng = np.random.default_rng(seed)
+        self._channels = tuple(output_limits)
+        lower = np.array([min(lim) for lim in output_limits.values()], dtype=np.float64)
+        upper = np.array([max(lim) for lim in output_limits.values()], dtype=np.float64)
+        # spot positions and widths in units of the voltage range of each output channel
+        self._spots = rng.uniform(lower, upper, size=(spot_number, len(lower)))
+        self._widths = spot_width * (upper - lower)
+        self._amplitudes = peak_rate * rng.uniform(0.5, 1, size=spot_number)
+        self._background_rate = background_rate
+        self._count_channels = frozenset(count_channels)
+        self._rng = rng
+
+    def __call__(self, channel, outputs, times):
+        intensity = np.full(len(times), self._background_rate, dtype=np.float64)
+        dims = [(self._channels.index(ch), samples) for ch, samples in outputs.items()
+                if ch in self._channels]
+        for spot, amplitude in zip(self._spots, self._amplitudes):
+            exponent = np.zeros(len(times), dtype=np.float64)
+            for dim, samples in dims:
+                exponent += ((samples - spot[dim]) / self._widths[dim]) ** 2
+            intensity += amplitude * np.exp(-0.5 * exponent)
+        if channel in self._count_channels:
+            return self._rng.poisson(intensity).astype(np.float64)
+        intensity /= self._background_rate
+        return intensity + self._rng.normal(0, 0.05, len(times))
+
+
+class FiniteSamplingIODummy(FiniteSamplingIOInterface):
+    """
+    Dummy hardware for finite sampling IO. Frames are emitted in real time according to sample rate
+    and frame size, i.e. samples become available in the input buffer at the same rate a real
+    device would acquire them. Input samples are generated on read by a pluggable response
+    function of the emitted output samples (see SpotResponse). Channel names are case-insensitive.
+    Together with ProcessSetpointDummy it can replace the NI card of a NiXSeriesScanner (see the
+    commented ni_scanner_dummy block in default.cfg).
+
+    Example config for copy-paste:
+
+    finite_sampling_io_dummy:
+        module.Class: 'dummy.finite_sampling_io_dummy.FiniteSamplingIODummy'
+        options:
+            input_channel_units:
+                PFI8: 'c/s'
+                ai0: 'V'
+            output_channel_units:
+                ao0: 'V'
+                ao1: 'V'
+                ao2: 'V'
+            output_voltage_ranges:  # optional, default [-10, 10] for each output channel
+                ao0: [-10, 10]
+                ao1: [-10, 10]
+                ao2: [0, 10]
+            sample_rate_limits: [1, 1e6]  # optional
+            frame_size_limits: [1, 1e9]  # optional
+            default_output_mode: 'JUMP_LIST'  # optional, must be name of SamplingOutputMode
+            response_function: 'my_package.my_module.my_response'  # optional, import path of callable
+            response_seed: 42  # optional, seed of the default spot response
+    """
+
+    _input_channel_units = ConfigOption(name='input_channel_units',
+                                        default={'pfi8': 'c/s', 'ai0': 'V'},
+                                        constructor=lambda d: {str(k).lower(): v for k, v in d.items()})
+    _output_channel_units = ConfigOption(name='output_channel_units',
+                                         default={f'ao{ch}': 'V' for ch in range(4)},
+                                         constructor=lambda d: {str(k).lower(): v for k, v in d.items()})
+    _output_voltage_ranges = ConfigOption(name='output_voltage_ranges',
+                                          default=dict(),
+                                          constructor=lambda d: {str(k).lower(): v for k, v in d.items()})
+    _sample_rate_limits = ConfigOption(name='sample_rate_limits', default=(1, 1e6))
+    _frame_size_limits = ConfigOption(name='frame_size_limits', default=(1, 1e9))
+    _default_output_mode = ConfigOption(name='default_output_mode', default='JUMP_LIST',
+                                        constructor=lambda x: SamplingOutputMode[x.upper()],
+                                        missing='nothing')
+    _response_function_path = ConfigOption(name='response_function', default=None)
+    _response_seed = ConfigOption(name='response_seed', default=None)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self._thread_lock = RecursiveMutex()
+        self._wait_slice = 10e-3
+        self._constraints = None
+        self._response_function = None
+
+        self.__active_input_channels = frozenset()
+        self.__active_output_channels = frozenset()
+        self.__sample_rate = -1.0
+        self.__output_mode = None
+        self.__frame_size = 0
+        self.__frame_buffer = None
+
+        # Frame timing. Samples [0, acquired) have been acquired, [0, read) have been returned.
+        self.__start_time = 0.0
+        self.__stopped_samples = None
+        self.__read_samples = 0
+
+    def on_activate(self):
+        output_limits = {ch: tuple(self._output_voltage_ranges.get(ch, (-10, 10)))
+                         for ch in self._output_channel_units}
+        input_limits = {ch: (0, 1e8) if unit == 'c/s' else (-10, 10)
+                        for ch, unit in self._input_channel_units.items()}
+        self._constraints = FiniteSamplingIOConstraints(
+            supported_output_modes=(SamplingOutputMode.JUMP_LIST,
+                                    SamplingOutputMode.EQUIDISTANT_SWEEP),
+            input_channel_units=self._input_channel_units,
+            output_channel_units=self._output_channel_units,
+            frame_size_limits=self._frame_size_limits,
+            sample_rate_limits=self._sample_rate_limits,
+            output_channel_limits=output_limits,
+            input_channel_limits=input_limits
+        )
+        assert self._constraints.output_mode_supported(self._default_output_mode), \
+            f'Config output "{self._default_output_mode}" mode not supported'
+
+        if self._response_function_path is None:
+            self._response_function = SpotResponse(
+                output_limits,
+                count_channels=[ch for ch, unit in self._input_channel_units.items() if unit == 'c/s'],
+                seed=self._response_seed
+            )
+        else:
+            module_name, func_name = self._response_function_path.rsplit('.', 1)
+            self._response_function = getattr(importlib.import_module(module_name), func_name)
+
+        self.__active_input_channels = frozenset(self._constraints.input_channel_names)
+        self.__active_output_channels = frozenset(self._constraints.output_channel_names)
+        self.__sample_rate = self._constraints.max_sample_rate
+        self.__output_mode = self._default_output_mode
+        self.__frame_size = 0
+        self.__frame_buffer = None
+
+    def on_deactivate(self):
+        self.stop_buffered_frame()
+        # Free memory
+        self.__frame_buffer = None
+
+    @property
+    def constraints(self):
+        return self._constraints
+
+    @property
+    def active_channels(self):
+        """ Names of all currently active input and output channels.
+
+        @return (frozenset, frozenset): active input channels, active output channels
+        """
+        return self.__active_input_channels, self.__active_output_channels
+
+    def set_active_channels(self, input_channels, output_channels):
+        """ Will set the currently active input and output channels.
+        All other channels will be deactivated.
+
+        @param iterable(str) input_channels: Iterable of input channel names to set active
+        @param iterable(str) output_channels: Iterable of output channel names to set active
+        """
+        input_channels = frozenset(ch.lower() for ch in input_channels)
+        output_channels = frozenset(ch.lower() for ch in output_channels)
+        assert input_channels.issubset(self._constraints.input_channel_names), \
+            f'Invalid input channels "{input_channels.difference(self._constraints.input_channel_names)}"'
+        assert output_channels.issubset(self._constraints.output_channel_names), \
+            f'Invalid output channels "{output_channels.difference(self._constraints.output_channel_names)}"'
+        assert not self.is_running, 'Unable to set active channels while IO is running.'
+        with self._thread_lock:
+            self.__active_input_channels = input_channels
+            self.__active_output_channels = output_channels
+
+    @property
+    def sample_rate(self):
+        """ The sample rate (in Hz) at which the samples will be emitted.
+
+        @return float: The current sample rate in Hz
+        """
+        return self.__sample_rate
+
+    def set_sample_rate(self, rate):
+        """ Sets the sample rate to a new value.
+
+        @param float rate: The sample rate to set
+        """
+        assert not self.is_running, 'Unable to set sample rate while IO is running.'
+        in_range_flag, rate_val = self._constraints.sample_rate_in_range(rate)
+        if not in_range_flag:
+            min_val, max_val = self._constraints.sample_rate_limits
+            self.log.warning(f'Sample rate requested ({rate:.3e}Hz) is out of bounds. Please choose '
+                             f'a value between {min_val:.3e}Hz and {max_val:.3e}Hz. Value will be '
+                             f'clipped to {rate_val:.3e}Hz.')
+        with self._thread_lock:
+            self.__sample_rate = float(rate_val)
+
+    @property
+    def output_mode(self):
+        """ Currently set output mode.
+
+        @return SamplingOutputMode: Enum representing the currently active output mode
+        """
+        return self.__output_mode
+
+    def set_output_mode(self, mode):
+        """ Setter for the current output mode.
+
+        @param SamplingOutputMode mode: The output mode to set as SamplingOutputMode Enum
+        """
+        assert not self.is_running, 'Unable to set output mode while IO is running.'
+        assert self._constraints.output_mode_supported(mode), f'Output mode {mode} not supported'
+        with self._thread_lock:
+            self.__output_mode = mode
+
+    @property
+    def frame_size(self):
+        """ Currently set number of samples per channel to emit for each data frame.
+
+        @return int: Number of samples per frame
+        """
+        return self.__frame_size
+
+    @property
+    def samples_in_buffer(self):
+        """ Current number of acquired but unread samples per channel in the input buffer.
+
+        @return int: Unread samples in input buffer
+        """
+        with self._thread_lock:
+            return self._acquired_samples() - self.__read_samples
+
+    @property
+    def is_running(self):
+        """ Read-only flag indicating if the data acquisition is running.
+
+        @return bool: Finite IO is running (True) or not (False)
+        """
+        return self.module_state() == 'locked'
+
+    def set_frame_data(self, data, validate=True):
+        """ Fills the frame buffer for the next data frame to be emitted. Data must be a dict
+        containing exactly all active channels as keys with corresponding sample data as values.
+
+        If <output_mode> is SamplingOutputMode.JUMP_LIST, the values must be 1D numpy.ndarrays
+        containing the entire data frame.
+        If <output_mode> is SamplingOutputMode.EQUIDISTANT_SWEEP, the values must be iterables of
+        length 3 representing the entire data frame to be constructed with numpy.linspace(),
+        i.e. (start, stop, steps).
+
+        Calling this method will alter read-only property <frame_size>
+
+        @param dict data: The frame data (values) to be set for all active output channels (keys)
+        @param bool validate: optional, check the output values against the channel limits
+        """
+        assert not self.is_running, 'IO is running. Can not set frame data'
+        with self._thread_lock:
+            if data is None:
+                self.__frame_size = 0
+                self.__frame_buffer = None
+                return
+
+            data = {ch.lower(): value for ch, value in data.items()}
+            assert set(data) == self.__active_output_channels, \
+                f'Keys of data {*data,} do not match active channels {*self.__active_output_channels,}'
+            if self.__output_mode == SamplingOutputMode.EQUIDISTANT_SWEEP:
+                assert len(set(tup[-1] for tup in data.values())) == 1, 'Linspace lengths are different'
+                frame = {ch: np.linspace(*tup) for ch, tup in data.items()}
+            else:
+                assert all(isinstance(d, np.ndarray) and d.ndim == 1 for d in data.values()), \
+                    'Data values are no 1D numpy.ndarrays'
+                frame = data
+            frame_size = len(next(iter(frame.values())))
+            assert all(len(d) == frame_size for d in frame.values()), 'Length of data values not the same'
+            assert self._constraints.frame_size_in_range(frame_size)[0], \
+                f'Frame size "{frame_size}" is out of range'
+
+            if validate:
+                limits = self._constraints.output_channel_limits
+                for ch, samples in frame.items():
+                    assert min(limits[ch]) <= samples.min() and samples.max() <= max(limits[ch]), \
+                        f'Output channel {ch} value out of constraints range'
+
+            self.__frame_size = frame_size
+            self.__frame_buffer = frame
+
+    def start_buffered_frame(self):
+        """ Will start the input and output of the previously set data frame in a non-blocking way.
+        Must return immediately and not wait for the frame to finish.
+
+        Must raise exception if frame output can not be started.
+        """
+        with self._thread_lock:
+            assert self.__frame_buffer is not None and self.__frame_size > 0, \
+                'No frame data set, can not start buffered frame'
+            assert set(self.__frame_buffer) == self.__active_output_channels, \
+                'Channels in active channels and frame buffer do not coincide'
+            assert not self.is_running, 'Frame IO already running. Can not start'
+
+            self.module_state.lock()
+            self.__read_samples = 0
+            self.__stopped_samples = None
+            self.__start_time = time.perf_counter()
+
+    def stop_buffered_frame(self):
+        """ Will abort the currently running data frame input and output.
+        Will return AFTER the io has been terminated without waiting for the frame to finish
+        (if possible).
+
+        After the io operation has been stopped, the output frame buffer will keep its state and
+        can be re-run or overwritten by calling <set_frame_data>.
+        The input frame buffer will also stay and can be emptied by reading the available samples.
+
+        Must NOT raise exceptions if no frame output is running.
+        """
+        with self._thread_lock:
+            if self.is_running:
+                self.__stopped_samples = self._acquired_samples()
+                self.module_state.unlock()
+
+    def get_buffered_samples(self, number_of_samples=None):
+        """ Returns a chunk of the current data frame for all active input channels read from the
+        input frame buffer. See FiniteSamplingIOInterface for details.
+
+        @param int number_of_samples: optional, the number of samples to read from buffer
+
+        @return dict: Sample arrays (values) for each active input channel (keys)
+        """
+        with self._thread_lock:
+            if number_of_samples is None:
+                number_of_samples = self.samples_in_buffer
+            assert isinstance(number_of_samples, (int, np.integer)), 'Number of requested samples not integer'
+            pending = self._pending_samples()
+            if number_of_samples > pending:
+                raise ValueError(f'Requested {number_of_samples} samples, but only {pending} pending.')
+
+        # Wait without holding the lock, so the frame can be stopped meanwhile
+        self._wait_for_samples(number_of_samples)
+
+        with self._thread_lock:
+            # A stopped frame only returns the samples acquired until the stop
+            number_of_samples = min(number_of_samples, self.samples_in_buffer)
+            start = self.__read_samples
+            stop = start + number_of_samples
+            self.__read_samples = stop
+
+            outputs = {ch: samples[start:stop] for ch, samples in self.__frame_buffer.items()}
+            times = np.arange(start, stop, dtype=np.float64) / self.__sample_rate
+            return {ch: np.asarray(self._response_function(ch, outputs, times), dtype=np.float64)
+                    for ch in self.__active_input_channels}
+
+    def get_frame(self, data=None):
+        """ Performs io for a single data frame for all active channels.
+        This method call is blocking until the entire data frame has been emitted.
+
+        @param dict data: The frame data (values) to be emitted for all active channels (keys)
+
+        @return dict: Frame data (values) for all active input channels (keys)
+        """
+        if data is not None:
+            self.set_frame_data(data)
+        self.start_buffered_frame()
+        frame = self.get_buffered_samples(self.frame_size)
+        self.stop_buffered_frame()
+        return frame
+
+    def set_response_function(self, func):
+        """ Replaces the response function generating the input samples, e.g. for benchmarks.
+        See SpotResponse for the expected signature.
+
+        @param callable func: response(channel, outputs, times) -> 1D numpy.ndarray
+        """
+        assert callable(func), 'Response function must be callable'
+        with self._thread_lock:
+            self._response_function = func
+
+    def _acquired_samples(self):
+        if self.__stopped_samples is not None:
+            return self.__stopped_samples
+        if not self.is_running:
+            return self.__read_samples
+        elapsed = time.perf_counter() - self.__start_time
+        return min(self.__frame_size, int(elapsed * self.__sample_rate))
+
+    def _pending_samples(self):
+        # samples still to be read from the current frame
+        if self.__stopped_samples is not None or not self.is_running:
+            return self._acquired_samples() - self.__read_samples
+        return self.__frame_size - self.__read_samples
+
+    def _wait_for_samples(self, number_of_samples):
+        """ Blocks until the requested number of samples has been "acquired", like a real device.
+        Returns early if the frame is stopped meanwhile. Must be called without holding the lock.
+        """
+        missing = number_of_samples - self.samples_in_buffer
+        while missing > 0 and self.__stopped_samples is None and self.is_running:
+            # sleep in short slices to notice a stop of the frame
+            time.sleep(min(missing / self.__sample_rate, self._wait_slice))
+            missing = number_of_samples - self.samples_in_buffer
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""
+This file contains a dummy hardware module for the ProcessSetpointInterface, e.g. to provide the
+software timed analog output of the NiXSeriesScanner without a National Instruments card.
+
+Copyright (c) 2021, the qudi developers. See the AUTHORS.md file at the top-level directory of this
+distribution and on <https://github.com/Ulm-IQO/qudi-iqo-modules/>
+
+This file is part of qudi.
+
+Qudi is free software: you can redistribute it and/or modify it under the terms of
+the GNU Lesser General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version.
+
+Qudi is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+See the GNU Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public License along with qudi.
+If not, see <https://www.gnu.org/licenses/>.
+"""
+
+from qudi.util.mutex import Mutex
+from qudi.util.helpers import natural_sort
+from qudi.core.configoption import ConfigOption
+from qudi.core.statusvariable import StatusVar
+from qudi.interface.process_control_interface import ProcessControlConstraints
+from qudi.interface.process_control_interface import ProcessSetpointInterface
+
+
+class ProcessSetpointDummy(ProcessSetpointInterface):
+    """ Dummy hardware for setpoint channels, e.g. the analog outputs of a NIXSeriesAnalogOutput.
+    Setpoints can only be set and read while the channel is active. Like the NI analog output, the
+    module is locked while any channel is active.
+
+    Example config for copy-paste:
+
+    process_setpoint_dummy:
+        module.Class: 'dummy.process_setpoint_dummy.ProcessSetpointDummy'
+        options:
+            channels:
+                ao0:
+                    limits: [-10.0, 10.0]  # optional
+                    unit: 'V'  # optional
+                ao1:
+                    limits: [-10.0, 10.0]
+                ao2:
+                    limits: [-10.0, 10.0]
+    """
+
+    _channels_config = ConfigOption(
+        name='channels',
+        default={
+            'ao0': {'limits': (-10.0, 10.0), 'unit': 'V'},
+            'ao1': {'limits': (-10.0, 10.0), 'unit': 'V'},
+            'ao2': {'limits': (-10.0, 10.0), 'unit': 'V'},
+            'ao3': {'limits': (-10.0, 10.0), 'unit': 'V'}
+        },
+        missing='warn'
+    )
+
+    _setpoints = StatusVar(name='current_setpoints', default=dict())
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self._thread_lock = Mutex()
+        self._constraints = None
+        self._active_channels = set()
+
+    def on_activate(self):
+        channels = natural_sort(self._channels_config)
+        self._constraints = ProcessControlConstraints(
+            setpoint_channels=channels,
+            units={ch: self._channels_config[ch].get('unit', 'V') for ch in channels},
+            limits={ch: tuple(self._channels_config[ch].get('limits', (-10.0, 10.0)))
+                    for ch in channels},
+            dtypes={ch: float for ch in channels}
+        )
+        self._active_channels = set()
+
+        # Remove obsolete channels and out-of-bounds values, start missing channels at zero
+        self._setpoints = {
+            ch: value for ch, value in self._setpoints.items()
+            if ch in channels and self._constraints.channel_value_in_range(ch, value)[0]
+        }
+        self._setpoints.update({ch: 0 for ch in channels if ch not in self._setpoints})
+
+    def on_deactivate(self):
+        with self._thread_lock:
+            self._active_channels = set()
+            self._update_module_state()
+
+    @property
+    def constraints(self) -> ProcessControlConstraints:
+        """ Read-Only property holding the constraints for this hardware module.
+        See class ProcessControlConstraints for more details.
+        """
+        return self._constraints
+
+    def set_activity_state(self, channel: str, active: bool) -> None:
+        """ Set activity state for given channel.
+        State is bool type and refers to active (True) and inactive (False).
+        """
+        with self._thread_lock:
+            self._check_channel(channel)
+            if active:
+                self._active_channels.add(channel)
+            else:
+                self._active_channels.discard(channel)
+            self._update_module_state()
+
+    def get_activity_state(self, channel: str) -> bool:
+        """ Get activity state for given channel.
+        State is bool type and refers to active (True) and inactive (False).
+        """
+        with self._thread_lock:
+            self._check_channel(channel)
+            return channel in self._active_channels
+
+    def set_setpoint(self, channel: str, value: float) -> None:
+        """ Set new setpoint for a single channel """
+        value = float(value)
+        with self._thread_lock:
+            self._check_channel(channel)
+            if channel not in self._active_channels:
+                raise RuntimeError(f'Please activate channel "{channel}" before setting setpoint')
+            if not self.constraints.channel_value_in_range(channel, value)[0]:
+                raise ValueError(f'Setpoint {value} for channel "{channel}" out of allowed '
+                                 f'value bounds {self.constraints.channel_limits[channel]}')
+            self._setpoints[channel] = value
+
+    def get_setpoint(self, channel: str) -> float:
+        """ Get current setpoint for a single channel """
+        with self._thread_lock:
+            self._check_channel(channel)
+            if channel not in self._active_channels:
+                raise RuntimeError(f'Please activate channel "{channel}" before getting setpoint')
+            return self._setpoints[channel]
+
+    def _check_channel(self, channel: str) -> None:
+        if channel not in self.constraints.all_channels:
+            raise ValueError(f'Invalid channel specifier "{channel}". Valid channels are:\n'
+                             f'{self.constraints.all_channels}')
+
+    def _update_module_state(self) -> None:
+        busy = len(self._active_channels) > 0
+        if busy and self.module_state() != 'locked':
+            self.module_state.lock()
+        elif not busy and self.module_state() == 'locked':
+            self.module_state.unlock()
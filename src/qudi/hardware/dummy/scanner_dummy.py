@@ -55,6 +55,9 @@ class ScannerDummy(ScannerInterface):
                 x: 10e-9
                 y: 10e-9
                 z: 50e-9
+            progressive_scan: False         # optional, generate each line just-in-time
+            line_time_jitter: 0             # optional, relative std. deviation of each line time
+            dropped_sample_probability: 0   # optional, probability of a sample being NaN
     """
     # TODO Bool indicators deprecated; Change in scanning probe toolchain
 
@@ -70,6 +73,10 @@ class ScannerDummy(ScannerInterface):
     _spot_size_dist = ConfigOption(name='spot_size_dist', default=(100e-9, 15e-9))
     _spot_amplitude_dist = ConfigOption(name='spot_amplitude_dist', default=(2e5, 4e4))
     _require_square_pixels = ConfigOption(name='require_square_pixels', default=False)
+    # progressive line-by-line acquisition simulation
+    _progressive_scan = ConfigOption(name='progressive_scan', default=False)
+    _line_time_jitter = ConfigOption(name='line_time_jitter', default=0.)
+    _dropped_sample_probability = ConfigOption(name='dropped_sample_probability', default=0.)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -94,6 +101,13 @@ class ScannerDummy(ScannerInterface):
         self.__last_line = -1
         self.__update_timer = None
 
+        # Progressive scan simulation state
+        self.__next_sample = 0
+        self.__line_end_times = None
+        self.__line_values = None
+        self.__line_spot_slices = None
+        self.__scan_spots = None
+
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
@@ -132,7 +146,7 @@ class ScannerDummy(ScannerInterface):
         self.__last_line = -1
         self.__update_timer = QtCore.QTimer()
         self.__update_timer.setSingleShot(True)
-        self.__update_timer.timeout.connect(self.get_scan_data, QtCore.Qt.QueuedConnection)
+        self.__update_timer.timeout.connect(self.__scan_update_tick, QtCore.Qt.QueuedConnection)
         return
 
     def on_deactivate(self):
@@ -142,6 +156,7 @@ class ScannerDummy(ScannerInterface):
         # free memory
         self._spots = dict()
         self._scan_image = None
+        self.__reset_progressive_scan()
         try:
             self.__update_timer.stop()
         except:
@@ -194,7 +209,9 @@ class ScannerDummy(ScannerInterface):
         """
         with self._thread_lock:
             if self.module_state() == 'locked':
+                self.__reset_progressive_scan()
                 self.module_state.unlock()
+                self.sigScanFinished.emit()
             self.log.debug('Scanning probe dummy has been reset.')
             return 0
 
@@ -237,6 +254,9 @@ class ScannerDummy(ScannerInterface):
             if len(axes) != len(ranges) or len(axes) != len(resolution):
                 self.log.error('"axes", "range" and "resolution" must have same length.')
                 return True, self.scan_settings
+            if len(axes) > 2:
+                self.log.error('Scanning probe dummy can only simulate 1D and 2D scans.')
+                return True, self.scan_settings
             for i, ax in enumerate(axes):
                 for axis_constr in self._constraints.axes.values():
                     if ax == axis_constr.name:
@@ -349,12 +369,6 @@ class ScannerDummy(ScannerInterface):
                         sim_data = d
             else:
                 sim_data = self._spots[self._current_scan_axes]
-            number_of_spots = sim_data['count']
-            positions = sim_data['pos']
-            amplitudes = sim_data['amp']
-            sigmas = sim_data['sigma']
-            thetas = sim_data['theta']
-
             x_values = np.linspace(self._current_scan_ranges[0][0],
                                    self._current_scan_ranges[0][1],
                                    self._current_scan_resolution[0])
@@ -364,34 +378,11 @@ class ScannerDummy(ScannerInterface):
                                        self._current_scan_resolution[1])
             else:
                 y_values = np.linspace(self._current_position['y'], self._current_position['y'], 1)
-            xy_grid = np.meshgrid(x_values, y_values, indexing='ij')
 
-            include_dist = self._spot_size_dist[0] + 5 * self._spot_size_dist[1]
-            self._scan_image = np.random.uniform(0, 2e4, self._current_scan_resolution)
-            for i in range(number_of_spots):
-                if positions[i][0] < self._current_scan_ranges[0][0] - include_dist:
-                    continue
-                if positions[i][0] > self._current_scan_ranges[0][1] + include_dist:
-                    continue
-                if len(self._current_scan_axes) == 1:
-                    if positions[i][1] < self._current_position['y'] - include_dist:
-                        continue
-                    if positions[i][1] > self._current_position['y'] + include_dist:
-                        continue
-                else:
-                    if positions[i][1] < self._current_scan_ranges[1][0] - include_dist:
-                        continue
-                    if positions[i][1] > self._current_scan_ranges[1][1] + include_dist:
-                        continue
-                gauss = self._gaussian_2d(xy_grid,
-                                          amp=amplitudes[i],
-                                          pos=positions[i],
-                                          sigma=sigmas[i],
-                                          theta=thetas[i])
-                if len(self._current_scan_axes) == 1:
-                    self._scan_image += gauss[:, 0]
-                else:
-                    self._scan_image += gauss
+            if self._progressive_scan:
+                self.__init_progressive_scan(sim_data, x_values, y_values)
+            else:
+                self.__init_precomputed_scan(sim_data, x_values, y_values)
 
             if self._constraints.has_position_feedback:
                 feedback_axes = tuple(self._constraints.axes.values())
@@ -410,11 +401,158 @@ class ScannerDummy(ScannerInterface):
             self._scan_data.new_scan()
             self.__scan_start = time.time()
             self.__last_line = -1
+            self.__next_sample = 0
             line_time = self._current_scan_resolution[0] / self._current_scan_frequency
-            self.__update_timer.setInterval(int(round(line_time * 1000)))
+            self.__update_timer.setInterval(max(1, int(round(line_time * 1000))))
             self.__start_timer()
             return 0
 
+    def __init_precomputed_scan(self, sim_data, x_values, y_values):
+        """ Computes the entire scan image up front. The image is revealed line by line during
+        the scan in get_scan_data.
+        """
+        number_of_spots = sim_data['count']
+        positions = sim_data['pos']
+        amplitudes = sim_data['amp']
+        sigmas = sim_data['sigma']
+        thetas = sim_data['theta']
+
+        xy_grid = np.meshgrid(x_values, y_values, indexing='ij')
+
+        include_dist = self._spot_size_dist[0] + 5 * self._spot_size_dist[1]
+        self._scan_image = np.random.uniform(0, 2e4, self._current_scan_resolution)
+        for i in range(number_of_spots):
+            if positions[i][0] < self._current_scan_ranges[0][0] - include_dist:
+                continue
+            if positions[i][0] > self._current_scan_ranges[0][1] + include_dist:
+                continue
+            if len(self._current_scan_axes) == 1:
+                if positions[i][1] < self._current_position['y'] - include_dist:
+                    continue
+                if positions[i][1] > self._current_position['y'] + include_dist:
+                    continue
+            else:
+                if positions[i][1] < self._current_scan_ranges[1][0] - include_dist:
+                    continue
+                if positions[i][1] > self._current_scan_ranges[1][1] + include_dist:
+                    continue
+            gauss = self._gaussian_2d(xy_grid,
+                                      amp=amplitudes[i],
+                                      pos=positions[i],
+                                      sigma=sigmas[i],
+                                      theta=thetas[i])
+            if len(self._current_scan_axes) == 1:
+                self._scan_image += gauss[:, 0]
+            else:
+                self._scan_image += gauss
+
+    def __init_progressive_scan(self, sim_data, x_values, y_values):
+        """ Prepares the just-in-time generation of scan lines. Only the spots relevant for the
+        scan area are kept, sorted by their slow axis position, so that each line can look up its
+        contributing spots by a precomputed index slice.
+        Line end times are randomized according to the configured line time jitter.
+        """
+        self._scan_image = None
+        include_dist = self._spot_size_dist[0] + 5 * self._spot_size_dist[1]
+        positions = sim_data['pos']
+        y_min, y_max = y_values.min(), y_values.max()
+        mask = (positions[:, 0] >= x_values.min() - include_dist) & \
+               (positions[:, 0] <= x_values.max() + include_dist) & \
+               (positions[:, 1] >= y_min - include_dist) & \
+               (positions[:, 1] <= y_max + include_dist)
+        order = np.argsort(positions[mask, 1])
+        self.__scan_spots = {key: sim_data[key][mask][order]
+                             for key in ('pos', 'amp', 'sigma', 'theta')}
+
+        # Per-line index slices into the sorted spot arrays
+        spot_y = self.__scan_spots['pos'][:, 1]
+        self.__line_spot_slices = np.stack(
+            (np.searchsorted(spot_y, y_values - include_dist, side='left'),
+             np.searchsorted(spot_y, y_values + include_dist, side='right')),
+            axis=1
+        )
+        self.__line_values = (x_values, y_values)
+
+        # Line end times relative to scan start (with optional jitter)
+        line_time = self._current_scan_resolution[0] / self._current_scan_frequency
+        number_of_lines = len(y_values)
+        line_times = np.full(number_of_lines, line_time)
+        if self._line_time_jitter > 0:
+            line_times *= np.random.normal(1, self._line_time_jitter, number_of_lines)
+            np.clip(line_times, 0.1 * line_time, None, out=line_times)
+        self.__line_end_times = np.cumsum(line_times)
+
+    def __reset_progressive_scan(self):
+        self.__next_sample = 0
+        self.__line_end_times = None
+        self.__line_values = None
+        self.__line_spot_slices = None
+        self.__scan_spots = None
+
+    def __simulate_line_segment(self, line_index, start, stop):
+        """ Generates the samples [start, stop) of the scan line with index line_index from the
+        spots close to this line.
+        """
+        x_values = self.__line_values[0][start:stop]
+        y_value = self.__line_values[1][line_index]
+        first, last = self.__line_spot_slices[line_index]
+
+        samples = np.random.uniform(0, 2e4, len(x_values))
+        if last > first:
+            x0, y0 = self.__scan_spots['pos'][first:last].T
+            sigx, sigy = self.__scan_spots['sigma'][first:last].T
+            theta = self.__scan_spots['theta'][first:last]
+            amp = self.__scan_spots['amp'][first:last]
+            a = np.cos(-theta) ** 2 / (2 * sigx ** 2) + np.sin(-theta) ** 2 / (2 * sigy ** 2)
+            b = np.sin(2 * -theta) / (4 * sigy ** 2) - np.sin(2 * -theta) / (4 * sigx ** 2)
+            c = np.sin(-theta) ** 2 / (2 * sigx ** 2) + np.cos(-theta) ** 2 / (2 * sigy ** 2)
+            x_prime = x_values[:, np.newaxis] - x0
+            y_prime = y_value - y0
+            samples += np.sum(
+                amp * np.exp(-(a * x_prime ** 2 + 2 * b * x_prime * y_prime + c * y_prime ** 2)),
+                axis=1
+            )
+
+        if self._dropped_sample_probability > 0:
+            samples[np.random.random_sample(len(samples)) < self._dropped_sample_probability] = np.nan
+        return samples
+
+    def __update_progressive_scan_data(self):
+        """ Generates all lines (or line segments for 1D scans) that are due since the last call.
+        """
+        elapsed = time.time() - self.__scan_start
+        channels = self._constraints.channels
+
+        if self._scan_data.scan_dimension == 2:
+            number_of_lines = self._current_scan_resolution[1]
+            acquired_lines = min(
+                int(np.searchsorted(self.__line_end_times, elapsed, side='right')),
+                number_of_lines
+            )
+            for line in range(self.__next_sample, acquired_lines):
+                samples = self.__simulate_line_segment(line, 0, self._current_scan_resolution[0])
+                for ch in channels:
+                    self._scan_data.data[ch][:, line] = samples
+            self.__next_sample = max(self.__next_sample, acquired_lines)
+            finished = acquired_lines >= number_of_lines
+        else:
+            resolution = self._current_scan_resolution[0]
+            acquired_samples = min(int(resolution * elapsed / self.__line_end_times[0]),
+                                   resolution)
+            if acquired_samples > self.__next_sample:
+                samples = self.__simulate_line_segment(0, self.__next_sample, acquired_samples)
+                for ch in channels:
+                    self._scan_data.data[ch][self.__next_sample:acquired_samples] = samples
+                self.__next_sample = acquired_samples
+            finished = acquired_samples >= resolution
+
+        if finished:
+            self.__reset_progressive_scan()
+            self.module_state.unlock()
+            self.sigScanFinished.emit()
+        elif self.thread() is QtCore.QThread.currentThread():
+            self.__start_timer()
+
     def stop_scan(self):
         """ Closes the scanner and cleans up afterwards.
 
@@ -424,7 +562,9 @@ class ScannerDummy(ScannerInterface):
             self.log.debug('Scanning probe dummy "stop_scan" called.')
             if self.module_state() == 'locked':
                 self._scan_image = None
+                self.__reset_progressive_scan()
                 self.module_state.unlock()
+                self.sigScanFinished.emit()
             return 0
 
     def emergency_stop(self):
@@ -435,6 +575,8 @@ class ScannerDummy(ScannerInterface):
         except FysomError:
             pass
         self._scan_image = None
+        self.__reset_progressive_scan()
+        self.sigScanFinished.emit()
         self.log.warning('Scanner has been emergency stopped.')
         return 0
 
@@ -449,7 +591,9 @@ class ScannerDummy(ScannerInterface):
                 print('nope, no scan data in hardware')
                 return None
 
-            if self.module_state() != 'idle':
+            if self.module_state() != 'idle' and self._progressive_scan:
+                self.__update_progressive_scan_data()
+            elif self.module_state() != 'idle':
                 elapsed = time.time() - self.__scan_start
                 line_time = self._current_scan_resolution[0] / self._current_scan_frequency
 
@@ -468,6 +612,7 @@ class ScannerDummy(ScannerInterface):
                             self.__last_line = acquired_lines - 1
                         if acquired_lines >= self._current_scan_resolution[1]:
                             self.module_state.unlock()
+                            self.sigScanFinished.emit()
                         elif self.thread() is QtCore.QThread.currentThread():
                             self.__start_timer()
                 else:
@@ -487,10 +632,21 @@ class ScannerDummy(ScannerInterface):
                             self.__last_line = acquired_lines - 1
                         if acquired_lines >= self._current_scan_resolution[0]:
                             self.module_state.unlock()
+                            self.sigScanFinished.emit()
                         elif self.thread() is QtCore.QThread.currentThread():
                             self.__start_timer()
             return self._scan_data
 
+    def __scan_update_tick(self):
+        """ Simulates the acquisition of all lines due since the last tick and notifies listeners.
+        """
+        with self._thread_lock:
+            if self.module_state() == 'idle':
+                return
+            self.get_scan_data()
+            if self.module_state() != 'idle':
+                self.sigScanDataReady.emit()
+
     def __start_timer(self):
         if self.thread() is not QtCore.QThread.currentThread():
             QtCore.QMetaObject.invokeMethod(self.__update_timer,
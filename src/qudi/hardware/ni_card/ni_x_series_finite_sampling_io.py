@@ -34,6 +34,7 @@ from qudi.interface.finite_sampling_io_interface import FiniteSamplingIOInterfac
 from qudi.util.enums import SamplingOutputMode
 from qudi.util.mutex import RecursiveMutex
 import time
+import threading
 import warnings
 
 
@@ -75,6 +76,7 @@ class NIXSeriesFiniteSamplingIO(FiniteSamplingIOInterface):
             default_output_mode: 'JUMP_LIST' # optional, must be name of SamplingOutputMode
             read_write_timeout: 10  # optional
             sample_clock_output: '/Dev1/PFI11' # optional: routing of sample clock to a physical connection
+            samples_event_period: 2e-3  # optional, approx. period (s) of the "samples acquired" hardware event
 
     """
 
@@ -97,6 +99,7 @@ class NIXSeriesFiniteSamplingIO(FiniteSamplingIOInterface):
 
     _physical_sample_clock_output = ConfigOption(name='sample_clock_output',
                                                  default=None)
+    _samples_event_period = ConfigOption(name='samples_event_period', default=2e-3, missing='nothing')
 
     _adc_voltage_ranges = ConfigOption(name='adc_voltage_ranges',
                                        default={'ai{}'.format(channel_index): [-10, 10]
@@ -134,10 +137,21 @@ class NIXSeriesFiniteSamplingIO(FiniteSamplingIOInterface):
         # Internal settings
         self.__frame_size = -1
         self.__frame_buffer = -1
+        # output channel order of the rows in the frame buffer
+        self.__frame_buffer_channels = tuple()
+
+        # Keep tasks between frames and re-arm them (see set_rearm_frames)
+        self.__rearm_frames = False
+        self.__armed_channels = None
 
         # unread samples buffer
         self.__unread_samples_buffer = None
         self._number_of_pending_samples = 0
+        # persistent read buffer for the interleaved analog input samples
+        self.__ai_read_buffer = np.empty(0, dtype=self.__data_type)
+        # set by the "every N samples acquired" hardware event to wake up waiting readers
+        self.__samples_event = threading.Event()
+        self.__samples_event_interval = 0
 
         # List of all available counters and terminals for this device
         self.__all_counters = tuple()
@@ -309,6 +323,8 @@ class NIXSeriesFiniteSamplingIO(FiniteSamplingIOInterface):
         self.terminate_all_tasks()
         # Free memory if possible while module is inactive
         self.__frame_buffer = np.empty(0, dtype=self.__data_type)
+        self.__frame_buffer_channels = tuple()
+        self.__ai_read_buffer = np.empty(0, dtype=self.__data_type)
         return
 
     @property
@@ -441,8 +457,9 @@ class NIXSeriesFiniteSamplingIO(FiniteSamplingIOInterface):
         with self._thread_lock:
             self.__frame_size = samples_per_channel
             self.__frame_buffer = None
+            self.__frame_buffer_channels = tuple()
 
-    def set_frame_data(self, data):
+    def set_frame_data(self, data, validate=True):
         """ Fills the frame buffer for the next data frame to be emitted. Data must be a dict
         containing exactly all active channels as keys with corresponding sample data as values.
 
@@ -454,7 +471,12 @@ class NIXSeriesFiniteSamplingIO(FiniteSamplingIOInterface):
 
         Calling this method will alter read-only property <frame_size>
 
+        The frame is stored in the (channels x samples) layout written to the device, so
+        starting the frame does not require another copy.
+
         @param dict data: The frame data (values) to be set for all active output channels (keys)
+        @param bool validate: optional, check the output values against the channel limits. Only
+                              skip this for frames that have been validated before (e.g. cached).
         """
         assert data is None or isinstance(data, dict), f'Wrong arguments passed to set_frame_data,' \
                                                        f'expected dict and got {type(data)}'
@@ -480,12 +502,6 @@ class NIXSeriesFiniteSamplingIO(FiniteSamplingIOInterface):
                     f'Data values are no 1D numpy.ndarrays'
                 assert all(len(d) == frame_size for d in data.values()), f'Length of data values not the same'
 
-                for output_channel in data:
-                    assert not np.any(
-                        (min(data[output_channel]) < min(self.constraints.output_channel_limits[output_channel])) |
-                        (max(data[output_channel]) > max(self.constraints.output_channel_limits[output_channel]))
-                    ), f'Output channel {output_channel} value out of constraints range'
-
             elif self.output_mode == SamplingOutputMode.EQUIDISTANT_SWEEP:
                 assert all(len(tup) == 3 and isinstance(tup, tuple) for tup in data.values()), \
                     f'EQUIDISTANT_SWEEP output mode requires value tuples of length 3 for each output channel'
@@ -493,24 +509,34 @@ class NIXSeriesFiniteSamplingIO(FiniteSamplingIOInterface):
                     f'Linspace number of points not integer'
 
                 assert len(set(tup[-1] for tup in data.values())) == 1, 'Linspace lengths are different'
-
-                for output_channel in data:
-                    assert not np.any(
-                        (min(data[output_channel][:-1]) < min(self.constraints.output_channel_limits[output_channel])) |
-                        (max(data[output_channel][:-1]) > max(self.constraints.output_channel_limits[output_channel]))
-                    ), f'Output channel {output_channel} value out of constraints range'
                 frame_size = next(iter(data.values()))[-1]
             else:
                 frame_size = 0
 
+            # Build the frame in the final write layout
+            channels = tuple(active_output_channels_set)
+            frame_buffer = np.empty((len(channels), frame_size), dtype=self.__data_type)
+            for num, output_channel in enumerate(channels):
+                if self.output_mode == SamplingOutputMode.JUMP_LIST:
+                    frame_buffer[num] = data[output_channel]
+                elif self.output_mode == SamplingOutputMode.EQUIDISTANT_SWEEP:
+                    frame_buffer[num] = np.linspace(*data[output_channel])
+
+            if validate and frame_size > 0:
+                limits = self.constraints.output_channel_limits
+                lower = np.array([min(limits[ch]) for ch in channels])
+                upper = np.array([max(limits[ch]) for ch in channels])
+                out_of_range = (frame_buffer.min(axis=1) < lower) | (frame_buffer.max(axis=1) > upper)
+                assert not np.any(out_of_range), \
+                    f'Output channel(s) {*(ch for ch, err in zip(channels, out_of_range) if err),} ' \
+                    f'value out of constraints range'
+
         with self._thread_lock:
             self._set_frame_size(frame_size)
             # set frame buffer
             if data is not None:
-                if self.output_mode == SamplingOutputMode.JUMP_LIST:
-                    self.__frame_buffer = {output_ch: jump_list for output_ch, jump_list in data.items()}
-                elif self.output_mode == SamplingOutputMode.EQUIDISTANT_SWEEP:
-                    self.__frame_buffer = {output_ch: np.linspace(*tup) for output_ch, tup in data.items()}
+                self.__frame_buffer = frame_buffer
+                self.__frame_buffer_channels = channels
             if data is None:
                 self._set_frame_size(0)  # Sets frame buffer to None
 
@@ -526,7 +552,8 @@ class NIXSeriesFiniteSamplingIO(FiniteSamplingIOInterface):
         assert self.frame_size != 0, f'No frame data set, can not start buffered frame'
         assert not self.is_running, f'Frame IO already running. Can not start'
 
-        assert self.active_channels[1] == set(self.__frame_buffer), \
+        assert self.__frame_buffer is not None and \
+               self.active_channels[1] == set(self.__frame_buffer_channels), \
             f'Channels in active channels and frame buffer do not coincide'
 
         self.module_state.lock()
@@ -534,31 +561,53 @@ class NIXSeriesFiniteSamplingIO(FiniteSamplingIOInterface):
         with self._thread_lock:
             self._number_of_pending_samples = self.frame_size
 
-            # # set up all tasks
-            if self._init_sample_clock() < 0:
+            armed_channels = (self.__active_channels['di_channels'],
+                              self.__active_channels['ai_channels'],
+                              self.__active_channels['ao_channels'])
+            if self.__armed_channels is not None and self.__armed_channels == armed_channels:
+                # Re-use the tasks kept from the last frame with the same channel set
+                if self._rearm_tasks() < 0:
+                    self.terminate_all_tasks()
+                    self.module_state.unlock()
+                    raise NiInitError('Re-arming tasks failed; all tasks terminated')
+            else:
+                # Tasks kept for a different channel set can not be re-used
                 self.terminate_all_tasks()
-                self.module_state.unlock()
-                raise NiInitError('Sample clock initialization failed; all tasks terminated')
 
-            if self._init_digital_tasks() < 0:
-                self.terminate_all_tasks()
-                self.module_state.unlock()
-                raise NiInitError('Counter task initialization failed; all tasks terminated')
+                # # set up all tasks
+                if self._init_sample_clock() < 0:
+                    self.terminate_all_tasks()
+                    self.module_state.unlock()
+                    raise NiInitError('Sample clock initialization failed; all tasks terminated')
 
-            if self._init_analog_in_task() < 0:
-                self.terminate_all_tasks()
-                self.module_state.unlock()
-                raise NiInitError('Analog in task initialization failed; all tasks terminated')
+                if self._init_digital_tasks() < 0:
+                    self.terminate_all_tasks()
+                    self.module_state.unlock()
+                    raise NiInitError('Counter task initialization failed; all tasks terminated')
 
-            if self._init_analog_out_task() < 0:
-                self.terminate_all_tasks()
-                self.module_state.unlock()
-                raise NiInitError('Analog out task initialization failed; all tasks terminated')
+                if self._init_analog_in_task() < 0:
+                    self.terminate_all_tasks()
+                    self.module_state.unlock()
+                    raise NiInitError('Analog in task initialization failed; all tasks terminated')
+
+                if self._init_analog_out_task() < 0:
+                    self.terminate_all_tasks()
+                    self.module_state.unlock()
+                    raise NiInitError('Analog out task initialization failed; all tasks terminated')
 
-            output_data = np.ndarray((len(self.active_channels[1]), self.frame_size))
+                self._init_samples_event()
 
-            for num, output_channel in enumerate(self.active_channels[1]):
-                output_data[num] = self.__frame_buffer[output_channel]
+                if self.__rearm_frames:
+                    self.__armed_channels = armed_channels
+
+            # The analog out task channels are created in the iteration order of the active channels
+            channels = tuple(self.active_channels[1])
+            if channels == self.__frame_buffer_channels:
+                output_data = self.__frame_buffer
+            else:
+                output_data = self.__frame_buffer[
+                    [self.__frame_buffer_channels.index(ch) for ch in channels]
+                ]
 
             try:
                 self._ao_writer.write_many_sample(output_data)
@@ -618,9 +667,37 @@ class NIXSeriesFiniteSamplingIO(FiniteSamplingIOInterface):
 
             with warnings.catch_warnings():
                 warnings.simplefilter("ignore")
-                self.terminate_all_tasks()  # nidaqmx raises a warning when frame is stopped before all samples acq.
+                # nidaqmx raises a warning when frame is stopped before all samples acq.
+                if self.__armed_channels is None or self._disarm_tasks() < 0:
+                    self.terminate_all_tasks()
             self.module_state.unlock()
 
+    @property
+    def rearm_frames(self):
+        """ Flag indicating if the tasks are kept after a frame and re-armed for the next frame
+        with the same set of active channels.
+
+        @return bool: Frame re-arming enabled (True) or not (False)
+        """
+        return self.__rearm_frames
+
+    def set_rearm_frames(self, enable):
+        """ Enables or disables keeping the tasks between frames. If enabled, tasks are only
+        stopped and their hardware resources released after a frame. The next frame with the same
+        set of active channels re-arms them instead of creating new tasks. Sample rate and frame
+        size may change in between.
+
+        @param bool enable: Keep and re-arm tasks between frames (True) or not (False)
+
+        @return bool: The frame re-arming state actually set
+        """
+        assert not self.is_running, 'Unable to change frame re-arming while IO is running.'
+        with self._thread_lock:
+            self.__rearm_frames = bool(enable)
+            if not self.__rearm_frames:
+                self.terminate_all_tasks()
+            return self.__rearm_frames
+
     def get_buffered_samples(self, number_of_samples=None):
         """ Returns a chunk of the current data frame for all active input channels read from the
         input frame buffer.
@@ -644,77 +721,114 @@ class NIXSeriesFiniteSamplingIO(FiniteSamplingIOInterface):
 
         @return dict: Sample arrays (values) for each active input channel (keys)
         """
-
         with self._thread_lock:
             if number_of_samples is not None:
                 assert isinstance(number_of_samples, (int, np.integer)), f'Number of requested samples not integer'
 
             samples_to_read = number_of_samples if number_of_samples is not None else self.samples_in_buffer
-            pre_stop = not self.is_running
+            buffers = {ch: np.empty(samples_to_read, dtype=self.__data_type) for ch in self.active_channels[0]}
+            read_samples = self.read_buffered_samples_into(buffers, samples_to_read)
+            return {ch: buf[:read_samples] for ch, buf in buffers.items()}
+
+    def read_buffered_samples_into(self, buffers, number_of_samples=None):
+        """ Same as <get_buffered_samples> but the samples are written into the given (persistent)
+        buffers instead of newly allocated arrays. Samples are written to the start of each buffer.
+        If <number_of_samples> is omitted, the currently available samples are read, limited by the
+        size of the buffers.
+
+        @param dict buffers: 1D float64 numpy.ndarrays (values) for each active input channel (keys)
+        @param int number_of_samples: optional, the number of samples to read from buffer
+
+        @return int: Number of samples per channel written into the buffers
+        """
+        with self._thread_lock:
+            assert set(buffers) == set(self.active_channels[0]), \
+                f'Keys of buffers {*buffers,} do not match active input channels {*self.active_channels[0],}'
+            assert all(isinstance(buf, np.ndarray) and buf.ndim == 1 and buf.dtype == self.__data_type
+                       and buf.flags.c_contiguous and buf.flags.writeable for buf in buffers.values()), \
+                f'Buffers must be writeable, contiguous 1D numpy.ndarrays of type {self.__data_type}'
+            capacity = min((len(buf) for buf in buffers.values()), default=np.inf)
+
+            if number_of_samples is None:
+                samples_to_read = min(self.samples_in_buffer, capacity)
+            else:
+                assert isinstance(number_of_samples, (int, np.integer)), f'Number of requested samples not integer'
+                assert number_of_samples <= capacity, \
+                    f'Requested {number_of_samples} samples do not fit into buffers of size {capacity}'
+                samples_to_read = number_of_samples
 
             if not samples_to_read <= self._number_of_pending_samples:
                 raise ValueError(f"Requested {samples_to_read} samples, "
                                  f"but only {self._number_of_pending_samples} enough pending.")
 
-            if samples_to_read > 0 and self.is_running:
-                request_time = time.time()
-                # if number_of_samples > self.samples_in_buffer:
-                #     self.log.debug(f'Waiting for samples to become available since requested {number_of_samples} are more then '
-                #                    f'the {self.samples_in_buffer} in the buffer')
-                while samples_to_read > self.samples_in_buffer:
-                    if time.time() - request_time < 1.1 * self.frame_size / self.sample_rate:  # TODO Is this timeout ok?
-                        time.sleep(0.05)
-                    else:
-                        raise TimeoutError(f'Acquiring {samples_to_read} samples took longer then the whole frame')
-
-            data = dict()
-
             if samples_to_read == 0:
-                return dict.fromkeys(self.active_channels[0], np.array([]))
+                return 0
 
             if not self.is_running:
                 # When the IO was stopped with samples in buffer, return the ones in
-                if number_of_samples is None:
-                    data = self.__unread_samples_buffer.copy()
-                    self.__unread_samples_buffer = dict.fromkeys(self.active_channels[0], np.array([]))
-                    self._number_of_pending_samples = 0
-                    return data
-                else:
-                    for key in self.__unread_samples_buffer:
-                        data[key] = self.__unread_samples_buffer[key][:samples_to_read]
-                    self._number_of_pending_samples -= samples_to_read
-                    self.__unread_samples_buffer = {key: arr[samples_to_read:] for (key, arr)
-                                                    in self.__unread_samples_buffer.items()}
-                    return data
-            else:
-                if self._di_readers:
-                    write_offset = 0
-                    di_data = np.zeros(len(self.__active_channels['di_channels']) * samples_to_read)
-                    for di_reader in self._di_readers:
-                        di_reader.read_many_sample_double(
-                            di_data[write_offset:],
-                            number_of_samples_per_channel=samples_to_read,
-                            timeout=self._rw_timeout)
-                        write_offset += samples_to_read
-
-                    di_data = di_data.reshape(len(self.__active_channels['di_channels']), samples_to_read)
-                    for num, di_channel in enumerate(self.__active_channels['di_channels']):
-                        data[di_channel] = di_data[num] * self.sample_rate  # To go to c/s # TODO What if unit not c/s
-
-                if self._ai_reader is not None:
-                    data_buffer = np.zeros(samples_to_read * len(self.__active_channels['ai_channels']))
-                    # self.log.debug(f'Buff shape {data_buffer.shape} and len {len(data_buffer)}')
-                    read_samples = self._ai_reader.read_many_sample(
-                        data_buffer,
+                for key, buf in buffers.items():
+                    buf[:samples_to_read] = self.__unread_samples_buffer[key][:samples_to_read]
+                self._number_of_pending_samples -= samples_to_read
+                self.__unread_samples_buffer = {key: arr[samples_to_read:] for (key, arr)
+                                                in self.__unread_samples_buffer.items()}
+                return samples_to_read
+
+            self._wait_for_samples(samples_to_read)
+
+            if self._di_readers:
+                for di_reader, di_channel in zip(self._di_readers, self.__active_channels['di_channels']):
+                    buf = buffers[di_channel]
+                    di_reader.read_many_sample_double(
+                        buf,
                         number_of_samples_per_channel=samples_to_read,
                         timeout=self._rw_timeout)
-                    if read_samples != samples_to_read:
-                        return data
-                    for num, ai_channel in enumerate(self.__active_channels['ai_channels']):
-                        data[ai_channel] = data_buffer[num * samples_to_read:(num + 1) * samples_to_read]
-
-                self._number_of_pending_samples -= samples_to_read
-                return data
+                    buf[:samples_to_read] *= self.sample_rate  # To go to c/s # TODO What if unit not c/s
+
+            if self._ai_reader is not None:
+                ai_channels = self.__active_channels['ai_channels']
+                buffer_size = samples_to_read * len(ai_channels)
+                if self.__ai_read_buffer.size < buffer_size:
+                    self.__ai_read_buffer = np.empty(buffer_size, dtype=self.__data_type)
+                data_buffer = self.__ai_read_buffer[:buffer_size]
+                read_samples = self._ai_reader.read_many_sample(
+                    data_buffer,
+                    number_of_samples_per_channel=samples_to_read,
+                    timeout=self._rw_timeout)
+                if read_samples != samples_to_read:
+                    self.log.error(f'Only {read_samples} of {samples_to_read} analog input samples read.')
+                    return 0
+                data_buffer = data_buffer.reshape(len(ai_channels), samples_to_read)
+                for num, ai_channel in enumerate(ai_channels):
+                    buffers[ai_channel][:samples_to_read] = data_buffer[num]
+
+            self._number_of_pending_samples -= samples_to_read
+            return samples_to_read
+
+    def _wait_for_samples(self, number_of_samples):
+        """ Blocks until the requested number of samples is available in the input buffer.
+        Waits for the "every N samples acquired" hardware event instead of polling. The wait is
+        bounded, since the event only fires at multiples of N samples.
+        """
+        timeout = 1.1 * self.frame_size / self.sample_rate  # TODO Is this timeout ok?
+        if self.__samples_event_interval > 0:
+            wait_slice = max(2 * self.__samples_event_interval / self.sample_rate, 1e-3)
+        else:
+            # no hardware event registered, poll at the configured event period
+            wait_slice = max(self._samples_event_period, 1e-3)
+        deadline = time.perf_counter() + timeout
+        while True:
+            self.__samples_event.clear()
+            if number_of_samples <= self.samples_in_buffer:
+                return
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise TimeoutError(f'Acquiring {number_of_samples} samples took longer then the whole frame')
+            self.__samples_event.wait(min(wait_slice, remaining))
+
+    def __samples_acquired_callback(self, task_handle, every_n_samples_event_type, number_of_samples,
+                                    callback_data):
+        self.__samples_event.set()
+        return 0
 
     def get_frame(self, data=None):
         """ Performs io for a single data frame for all active channels.
@@ -1039,6 +1153,119 @@ class NIXSeriesFiniteSamplingIO(FiniteSamplingIOInterface):
         self._ai_task_handle = ai_task
         return 0
 
+    def _rearm_tasks(self):
+        """
+        Adapts the kept tasks to the current sample rate and frame size. Their resources are
+        reserved again implicitly when they are started.
+        The "every N samples acquired" event is registered again, since N depends on sample rate
+        and frame size.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        try:
+            self._clk_task_handle.co_channels.all.co_pulse_freq = self.sample_rate
+            self._clk_task_handle.timing.samp_quant_samp_per_chan = self.frame_size + 1
+            for task in (self._ai_task_handle, self._ao_task_handle):
+                if task is not None:
+                    task.timing.samp_clk_rate = self.sample_rate
+                    task.timing.samp_quant_samp_per_chan = self.frame_size
+            for task in self._di_task_handles:
+                task.timing.samp_quant_samp_per_chan = self.frame_size
+            # DAQmx requires to unregister the event of the last frame before registering a new one
+            if self.__samples_event_interval > 0:
+                if self._ai_task_handle is not None:
+                    task = self._ai_task_handle
+                else:
+                    task = self._di_task_handles[0]
+                task.register_every_n_samples_acquired_into_buffer_event(
+                    self.__samples_event_interval, None
+                )
+                self.__samples_event_interval = 0
+        except ni.DaqError:
+            self.log.exception('Unable to re-arm tasks for the next frame.')
+            return -1
+        self._init_samples_event()
+        return 0
+
+    def _disarm_tasks(self):
+        """
+        Stops all tasks and releases their hardware resources (e.g. for other modules using the
+        same analog output channels) without clearing them.
+
+        @return int: error code (0:OK, -1:error)
+        """
+        tasks = [self._clk_task_handle, self._ao_task_handle, self._ai_task_handle,
+                 *self._di_task_handles]
+        try:
+            for task in tasks:
+                if task is not None:
+                    task.stop()
+                    task.control(ni.constants.TaskMode.TASK_UNRESERVE)
+        except ni.DaqError:
+            self.log.exception('Error while stopping tasks kept for the next frame.')
+            return -1
+        return 0
+
+    def _init_samples_event(self):
+        """
+        Registers the "every N samples acquired" event on the analog input task (or the first
+        counter task if no analog input is active). N is the divisor of the frame size closest to
+        the number of samples per config option <samples_event_period>, since DAQmx requires the
+        input buffer size to be a multiple of N.
+        If no suitable N exists or the registration fails, _wait_for_samples falls back to timed
+        waits.
+
+        @return int: error code (0:event registered, -1:falling back to timed waits)
+        """
+        self.__samples_event_interval = 0
+        self.__samples_event.clear()
+        if self._ai_task_handle is not None:
+            task = self._ai_task_handle
+        elif self._di_task_handles:
+            task = self._di_task_handles[0]
+        else:
+            return 0
+
+        interval = self._samples_event_divisor(self.frame_size,
+                                               self.sample_rate * self._samples_event_period)
+        if interval is None:
+            self.log.debug(f'No every N samples event interval suitable for frame size '
+                           f'{self.frame_size}. Waiting for samples with timed waits.')
+            return -1
+        try:
+            task.register_every_n_samples_acquired_into_buffer_event(interval,
+                                                                     self.__samples_acquired_callback)
+        except ni.DaqError as e:
+            self.log.warning(f'Unable to register every N samples acquired event due to {str(e)} '
+                             f'Waiting for samples with timed waits.')
+            return -1
+        self.__samples_event_interval = interval
+        return 0
+
+    @staticmethod
+    def _samples_event_divisor(frame_size, target_interval, max_ratio=4):
+        """ Finds the divisor of the frame size closest to the target interval (on a log scale).
+
+        @param int frame_size: number of samples per frame
+        @param float target_interval: desired number of samples between two events
+        @param float max_ratio: optional, maximum deviation factor from the target interval
+
+        @return int: the interval, None if no divisor within max_ratio of the target exists
+        """
+        frame_size = int(frame_size)
+        if frame_size < 1:
+            return None
+        target_interval = min(max(target_interval, 1), frame_size)
+        best = None
+        for small in range(1, int(np.sqrt(frame_size)) + 1):
+            if frame_size % small:
+                continue
+            for divisor in (small, frame_size // small):
+                ratio = max(divisor / target_interval, target_interval / divisor)
+                if ratio <= max_ratio and (best is None or ratio < best[0]):
+                    best = (ratio, divisor)
+        return None if best is None else best[1]
+
     def _init_analog_out_task(self):
         analog_channels = self.__active_channels['ao_channels']
         if not analog_channels:
@@ -1131,6 +1358,8 @@ class NIXSeriesFiniteSamplingIO(FiniteSamplingIOInterface):
 
     def terminate_all_tasks(self):
         err = 0
+        self.__armed_channels = None
+        self.__samples_event_interval = 0
 
         self._di_readers = list()
         self._ai_reader = None
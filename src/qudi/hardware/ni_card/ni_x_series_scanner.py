@@ -23,6 +23,8 @@ If not, see <https://www.gnu.org/licenses/>.
 
 import numpy as np
 import time
+import threading
+from collections import OrderedDict
 
 from PySide2 import QtCore
 from PySide2.QtGui import QGuiApplication
@@ -41,7 +43,7 @@ class NiXSeriesScanner(ScannerInterface):
     """
     This interfuse combines modules of a National Instrument device to make up a scanning hardware.
     One module for software timed analog output (NIXSeriesAnalogOutput) to position e.g. a scanner to a specific
-    position and a hardware timed module for in and output (NIXSeriesFiniteSamplingIO) to realize 1D/2D scans.
+    position and a hardware timed module for in and output (NIXSeriesFiniteSamplingIO) to realize 1D/2D/3D scans.
 
     Example config for copy-paste:
 
@@ -75,7 +77,20 @@ class NiXSeriesScanner(ScannerInterface):
                 APD2: 'c/s'
                 AI0: 'V'
             backwards_line_resolution: 50 # optional
-            move_velocity: 400e-6 #m/s; This speed is used for scanner movements and avoids jumps from position to position.
+            maximum_move_velocity: 400e-6 #m/s; This speed is used for scanner movements and avoids jumps from position to position.
+            maximum_move_acceleration: 20e-3 # optional, m/s^2; acceleration limit of hardware timed moves
+            move_sample_rate: 5e3 # optional, Hz; AO sample rate of hardware timed move waveforms
+            position_calibration: # optional, non-linear position (m) to voltage (V) lookup tables per axis
+                z:
+                    position: [-100e-6, 0, 100e-6]
+                    voltage: [0, 4.9, 10]
+            scan_memmap_dir: 'C:\\temp' # optional, memory-map raw data of 3D scans to temporary files in this directory
+            channel_dtypes: # optional, numpy dtype names of input channels (default: float64)
+                APD1: 'int32'
+            waveform_cache_size: 16 # optional, number of scan waveforms kept in the LRU cache
+            waveform_cache_max_samples: 4194304 # optional, larger waveforms (samples per channel) are not cached
+            rearm_frames: True # optional, keep the finite sampling io tasks between frames and re-arm them
+            move_timeout_margin: 1 # optional, s; blocking moves are aborted if not done after their duration plus this margin
     """
 
     # TODO What about channels which are not "calibrated" to 'm', e.g. just use 'V'?
@@ -92,10 +107,20 @@ class NiXSeriesScanner(ScannerInterface):
 
     __backwards_line_resolution = ConfigOption(name='backwards_line_resolution', default=50)
     __max_move_velocity = ConfigOption(name='maximum_move_velocity', default=400e-6)
+    __max_move_acceleration = ConfigOption(name='maximum_move_acceleration', default=20e-3)
+    __move_sample_rate = ConfigOption(name='move_sample_rate', default=5e3)
+    _position_calibration = ConfigOption(name='position_calibration', default=dict())
+    _scan_memmap_dir = ConfigOption(name='scan_memmap_dir', default=None)
+    _channel_dtypes = ConfigOption(name='channel_dtypes', default=dict())
+    _waveform_cache_size = ConfigOption(name='waveform_cache_size', default=16)
+    _waveform_cache_max_samples = ConfigOption(name='waveform_cache_max_samples', default=4194304)
+    _rearm_frames = ConfigOption(name='rearm_frames', default=True)
+    _move_timeout_margin = ConfigOption(name='move_timeout_margin', default=1.)
 
     _threaded = True  # Interfuse is by default not threaded.
 
     sigNextDataChunk = QtCore.Signal()
+    sigMoveFinished = QtCore.Signal(dict)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -113,13 +138,31 @@ class NiXSeriesScanner(ScannerInterface):
         self._target_pos = dict()
         self._stored_target_pos = dict()
         self._start_scan_after_cursor = False
-        self._abort_cursor_move = False
-
-        self.__ni_ao_write_timer = None
+        self._follow_velocity = 0
+
+        self.__ni_scan_frame = None
+        # persistent per-channel buffers to read scan samples into, see _fetch_data_chunk
+        self.__read_buffers = dict()
+        self.__move_trajectory = None
+        self.__move_done_timer = None
+        self.__move_duration = 0
+        self._move_done_event = threading.Event()
+        self._move_done_event.set()
         self._min_step_interval = 1e-3
         self._scanner_distance_atol = 1e-9
 
-        self._thread_lock_cursor = Mutex()
+        # Cached position <-> voltage conversion, see __init_conversion_cache
+        self.__reverse_routing = dict()
+        self.__conversion_axes = tuple()
+        self.__voltage_slopes = None
+        self.__voltage_intercepts = None
+        self.__voltage_limits = None
+        self.__calibration_tables = dict()
+
+        # LRU cache of scan waveforms, see _get_scan_waveform
+        self.__waveform_cache = OrderedDict()
+
+        self._thread_lock_cursor = RecursiveMutex()
         self._thread_lock_data = Mutex()
 
     def on_activate(self):
@@ -154,19 +197,22 @@ class NiXSeriesScanner(ScannerInterface):
         for channel, unit in self._input_channel_units.items():
             channels.append(ScannerChannel(name=channel,
                                            unit=unit,
-                                           dtype=np.float64))
+                                           dtype=getattr(np, self._channel_dtypes.get(channel,
+                                                                                      'float64'))))
 
         self._constraints = ScanConstraints(axes=axes,
                                             channels=channels,
                                             backscan_configurable=False,  # TODO incorporate in scanning_probe toolchain
                                             has_position_feedback=False,  # TODO incorporate in scanning_probe toolchain
                                             square_px_only=False)  # TODO incorporate in scanning_probe toolchain
-#
+
+        self.__init_conversion_cache()
+        self._rearm_frames = self._ni_finite_sampling_io().set_rearm_frames(self._rearm_frames)
+
         self._target_pos = self.get_position()  # get voltages/pos from ni_ao
         self._toggle_ao_setpoint_channels(False)  # And free ao resources after that
         self._t_last_move = time.perf_counter()
-        self.__init_ao_timer()
-        self.__t_last_follow = None
+        self.__init_move_timer()
 
         self.sigNextDataChunk.connect(self._fetch_data_chunk, QtCore.Qt.QueuedConnection)
 
@@ -189,6 +235,8 @@ class NiXSeriesScanner(ScannerInterface):
         self._abort_cursor_movement()
         if self._ni_finite_sampling_io().is_running:
             self._ni_finite_sampling_io().stop_buffered_frame()
+        self._ni_finite_sampling_io().set_rearm_frames(False)
+        self.__waveform_cache.clear()
 
     def get_constraints(self):
         """ Get hardware constraints/limitations.
@@ -203,7 +251,7 @@ class NiXSeriesScanner(ScannerInterface):
         pass
 
     def configure_scan(self, scan_settings):
-        """ Configure the hardware with all parameters needed for a 1D or 2D scan.
+        """ Configure the hardware with all parameters needed for a 1D, 2D or 3D scan.
 
         @param dict scan_settings: scan_settings dictionary holding all the parameters 'axes', 'resolution', 'ranges'
         #  TODO update docstring in interface
@@ -260,11 +308,15 @@ class NiXSeriesScanner(ScannerInterface):
                         scan_frequency=frequency,
                         position_feedback_axes=None
                     )
-                    self.raw_data_container = RawDataContainer(self._scan_data.channels,
-                                                               resolution[
-                                                                   1] if self._scan_data.scan_dimension == 2 else 1,
-                                                               resolution[0],
-                                                               self.__backwards_line_resolution)
+                    self.raw_data_container = RawDataContainer(
+                        self._scan_data.channels,
+                        resolution[1] if self._scan_data.scan_dimension > 1 else 1,
+                        resolution[0],
+                        self.__backwards_line_resolution,
+                        number_of_slices=resolution[2] if self._scan_data.scan_dimension == 3 else None,
+                        memmap_dir=self._scan_memmap_dir if self._scan_data.scan_dimension == 3 else None,
+                        dtypes=self._scan_data.channel_dtypes
+                    )
                     # self.log.debug(f"New scanData created: {self._scan_data.data}")
 
                 except:
@@ -272,18 +324,21 @@ class NiXSeriesScanner(ScannerInterface):
                     return True, self.scan_settings
 
             try:
-                self._ni_finite_sampling_io().set_sample_rate(frequency)
-                self._ni_finite_sampling_io().set_active_channels(
-                    input_channels=(self._ni_channel_mapping[in_ch] for in_ch in self._input_channel_units),
-                    output_channels=(self._ni_channel_mapping[ax] for ax in axes)
+                ni_scan_dict = self._get_scan_waveform(self._scan_data)
+                # The finite sampling io is shared with hardware timed moves (e.g. the move back to
+                # the stored target after the last scan might still be running). Only remember the
+                # scan frame here, it is applied right before the scan starts.
+                self.__ni_scan_frame = {
+                    'sample_rate': frequency,
+                    'input_channels': tuple(self._ni_channel_mapping[in_ch] for in_ch in self._input_channel_units),
                     # TODO Use all axes and keep the unused constant? basically just constants in ni scan dict.
-                )
-
-                self._ni_finite_sampling_io().set_output_mode(SamplingOutputMode.JUMP_LIST)
-
-                ni_scan_dict = self._initialize_ni_scan_arrays(self._scan_data)
-
-                self._ni_finite_sampling_io().set_frame_data(ni_scan_dict)
+                    'output_channels': tuple(self._ni_channel_mapping[ax] for ax in axes),
+                    'frame_data': ni_scan_dict
+                }
+                line_length = self._scan_data.scan_resolution[0] + self.__backwards_line_resolution
+                # keyed like the active channels of the finite sampling io (lower case)
+                self.__read_buffers = {ch.lower(): np.empty(max(line_length, 10), dtype=np.float64)
+                                       for ch in self.__ni_scan_frame['input_channels']}
 
             except:
                 self.log.exception("")
@@ -308,14 +363,18 @@ class NiXSeriesScanner(ScannerInterface):
             self.log.error('Cannot move the scanner while, scan is running')
             return self.get_target()
 
-        if not set(position).issubset(self.get_constraints().axes):
+        if not set(position).issubset(self._constraints.axes):
             self.log.error('Invalid axes name in position')
             return self.get_target()
 
         try:
             self._prepare_movement(position, velocity=velocity)
 
-            self.__start_ao_write_timer()
+            if self.thread() is not QtCore.QThread.currentThread():
+                QtCore.QMetaObject.invokeMethod(self, '_start_hw_timed_move',
+                                                QtCore.Qt.BlockingQueuedConnection)
+            else:
+                self._start_hw_timed_move()
             if blocking:
                 self.__wait_on_move_done()
 
@@ -328,10 +387,22 @@ class NiXSeriesScanner(ScannerInterface):
     def __wait_on_move_done(self):
         try:
             t_start = time.perf_counter()
-            while self.is_move_running:
+            timeout = self.__move_duration + self._move_timeout_margin
+            if self.thread() is not QtCore.QThread.currentThread():
+                # move is finished by the module thread, just wait for the completion event
+                self._move_done_event.wait(timeout)
+            while not self._move_done_event.is_set():
+                if time.perf_counter() - t_start > timeout:
+                    self.log.error(f'Hardware timed move not finished after {timeout:.3f} s. '
+                                   f'Aborting move.')
+                    self._move_done_event.set()
+                    # stop the move frame in the module thread without waiting for it
+                    QtCore.QMetaObject.invokeMethod(self, '_abort_hw_timed_move',
+                                                    QtCore.Qt.QueuedConnection)
+                    break
                 self.log.debug(f"Waiting for move done: {self.is_move_running}, {1e3*(time.perf_counter()-t_start)} ms")
                 QGuiApplication.processEvents()
-                time.sleep(self._min_step_interval)
+                self._move_done_event.wait(self._min_step_interval)
 
             #self.log.debug(f"Move_abs finished after waiting {1e3*(time.perf_counter()-t_start)} ms ")
         except:
@@ -410,6 +481,8 @@ class NiXSeriesScanner(ScannerInterface):
 
             with self._thread_lock_data:
                 self._scan_data.new_scan()
+                # fresh buffers, so snapshots of the previous scan are not overwritten
+                self.raw_data_container.new_frame()
                 #self.log.debug(f"New scan data: {self._scan_data.data}, position {self._scan_data._position_data}")
                 self._stored_target_pos = self.get_target().copy()
                 self._scan_data.scanner_target_at_start = self._stored_target_pos
@@ -447,7 +520,7 @@ class NiXSeriesScanner(ScannerInterface):
 
         # self.log.debug("Stopping scan...")
         self._start_scan_after_cursor = False  # Ensure Scan HW is not started after movement
-        if self._ao_setpoint_channels_active:
+        if self._ao_setpoint_channels_active or self.is_move_running:
             self._abort_cursor_movement()
             # self.log.debug("Move aborted")
 
@@ -457,6 +530,7 @@ class NiXSeriesScanner(ScannerInterface):
 
         self.module_state.unlock()
         # self.log.debug("Module unlocked")
+        self.sigScanFinished.emit()
 
         self.move_absolute(self._stored_target_pos)
         self._stored_target_pos = dict()
@@ -472,7 +546,30 @@ class NiXSeriesScanner(ScannerInterface):
             raise RuntimeError('ScanData is not yet configured, please call "configure_scan" first')
         try:
             with self._thread_lock_data:
-                return self._scan_data.copy()
+                if self.is_scan_running:
+                    return self._scan_data.copy()
+                # buffers of a finished scan are not written anymore, no need to copy
+                return self._scan_data.snapshot()
+        except:
+            self.log.exception("")
+
+    def get_scan_slice(self, index=None):
+        """ Get a single 2D slice of a 3D scan. Only the slice is copied, not the entire volume.
+
+        @param int index: optional, slice index along the third scan axis. Defaults to the slice
+                          currently being acquired.
+
+        @return (int, ScanData): slice index, 2D ScanData of the slice
+        """
+        if self._scan_data is None:
+            raise RuntimeError('ScanData is not yet configured, please call "configure_scan" first')
+        try:
+            with self._thread_lock_data:
+                if self._scan_data.data is None:
+                    return 0, None
+                if index is None:
+                    index = self.raw_data_container.current_slice_index
+                return index, self._scan_data.get_slice(index).copy()
         except:
             self.log.exception("")
 
@@ -504,7 +601,7 @@ class NiXSeriesScanner(ScannerInterface):
     @property
     def is_move_running(self):
         with self._thread_lock_cursor:
-            running = self.__t_last_follow is not None
+            running = self.__move_trajectory is not None
             return running
 
     @property
@@ -525,34 +622,81 @@ class NiXSeriesScanner(ScannerInterface):
             # self.log.debug(f'fetch chunk: {self._ni_finite_sampling_io().samples_in_buffer}, {self.is_scan_running}')
             # chunk_size = self._scan_data.scan_resolution[0] + self.__backwards_line_resolution
             chunk_size = 10  # TODO Hardcode or go line by line as commented out above?
-            # Request a minimum of chunk_size samples per loop
+            ni_io = self._ni_finite_sampling_io()
+            # Request a minimum of chunk_size samples per loop, at most one scan line (buffer size)
             try:
-                samples_dict = self._ni_finite_sampling_io().get_buffered_samples(chunk_size) \
-                    if self._ni_finite_sampling_io().samples_in_buffer < chunk_size\
-                    else self._ni_finite_sampling_io().get_buffered_samples()
+                read_samples = ni_io.read_buffered_samples_into(
+                    self.__read_buffers,
+                    chunk_size if ni_io.samples_in_buffer < chunk_size else None
+                )
             except ValueError:  # ValueError is raised, when more samples are requested then pending or still to get
                 # after HW stopped
-                samples_dict = self._ni_finite_sampling_io().get_buffered_samples()
+                read_samples = ni_io.read_buffered_samples_into(self.__read_buffers)
 
-            reverse_routing = {val.lower(): key for key, val in self._ni_channel_mapping.items()}
-
-            new_data = {reverse_routing[key]: samples for key, samples in samples_dict.items()}
+            new_data = {self.__reverse_routing[key]: buf[:read_samples] for key, buf in self.__read_buffers.items()}
 
             with self._thread_lock_data:
+                lines_before = self.raw_data_container.completed_lines
                 self.raw_data_container.fill_container(new_data)
-                self._scan_data.data = self.raw_data_container.forwards_data()
+                self._scan_data.set_data(self.raw_data_container.forwards_data(),
+                                         valid_mask=self.raw_data_container.forwards_valid_mask())
 
                 if self._check_scan_end_reached():
                     self.stop_scan()
                 elif not self.is_scan_running:
                     return
                 else:
+                    if self.raw_data_container.completed_lines > lines_before:
+                        self.sigScanDataReady.emit()
                     self.sigNextDataChunk.emit()
 
         except:
             self.log.exception("")
             self.stop_scan()
 
+    def __init_conversion_cache(self):
+        """ Precomputes the position <-> voltage conversion for all scanner axes.
+        Linear axes are converted by an affine transform mapping the axis position range onto the
+        ni output voltage range. Axes with a lookup table in config option <position_calibration>
+        are converted by piecewise linear interpolation of that table instead.
+        """
+        output_limits = self._ni_finite_sampling_io().constraints.output_channel_limits
+        # cached waveforms depend on the conversion
+        self.__waveform_cache.clear()
+
+        self.__reverse_routing = {val.lower(): key for key, val in self._ni_channel_mapping.items()}
+        self.__conversion_axes = tuple(sorted(self._constraints.axes))
+
+        slopes = list()
+        intercepts = list()
+        limits = list()
+        for axis in self.__conversion_axes:
+            voltage_range = output_limits[self._ni_channel_mapping[axis].lower()]
+            position_range = self._constraints.axes[axis].value_range
+            slope = (voltage_range[1] - voltage_range[0]) / (position_range[1] - position_range[0])
+            slopes.append(slope)
+            intercepts.append(voltage_range[1] - position_range[1] * slope)
+            limits.append((min(voltage_range), max(voltage_range)))
+        self.__voltage_slopes = np.array(slopes, dtype=np.float64)
+        self.__voltage_intercepts = np.array(intercepts, dtype=np.float64)
+        self.__voltage_limits = np.array(limits, dtype=np.float64).T
+
+        self.__calibration_tables = dict()
+        for axis, table in self._position_calibration.items():
+            assert axis in self._constraints.axes, f'Calibration table given for unknown axis "{axis}"'
+            positions = np.asarray(table['position'], dtype=np.float64)
+            voltages = np.asarray(table['voltage'], dtype=np.float64)
+            assert positions.ndim == 1 and positions.shape == voltages.shape and len(positions) > 1, \
+                f'Calibration table of axis "{axis}" needs position and voltage 1D arrays of same length'
+            assert np.all(np.diff(positions) > 0), \
+                f'Calibration table positions of axis "{axis}" must be strictly increasing'
+            voltage_steps = np.diff(voltages)
+            assert np.all(voltage_steps > 0) or np.all(voltage_steps < 0), \
+                f'Calibration table voltages of axis "{axis}" must be strictly monotonic'
+            # np.interp needs increasing sample points in both conversion directions
+            order = np.argsort(voltages)
+            self.__calibration_tables[axis] = (positions, voltages, voltages[order], positions[order])
+
     def _position_to_voltage(self, axis, positions):
         """
         @param str axis: scanner axis name for which the position is to be converted to voltages
@@ -562,15 +706,15 @@ class NiXSeriesScanner(ScannerInterface):
         @return np.array/single value: Position(s) converted to voltage(s) (value(s)) [single value & 1D np.array depending on input]
                       for corresponding ni_channel (keys)
         """
+        index = self.__conversion_axes.index(axis)
+        positions = np.asarray(positions, dtype=np.float64)
 
-        ni_channel = self._ni_channel_mapping[axis]
-        voltage_range = self._ni_finite_sampling_io().constraints.output_channel_limits[ni_channel]
-        position_range = self.get_constraints().axes[axis].value_range
-
-        slope = np.diff(voltage_range) / np.diff(position_range)
-        intercept = voltage_range[1] - position_range[1] * slope
-
-        converted = np.clip(positions * slope + intercept, min(voltage_range), max(voltage_range))
+        if axis in self.__calibration_tables:
+            pos_table, volt_table, _, _ = self.__calibration_tables[axis]
+            converted = np.interp(positions, pos_table, volt_table)
+        else:
+            converted = positions * self.__voltage_slopes[index] + self.__voltage_intercepts[index]
+        converted = np.clip(converted, *self.__voltage_limits[:, index])
 
         try:
             # In case of single value, use just this value
@@ -580,6 +724,19 @@ class NiXSeriesScanner(ScannerInterface):
 
         return voltage_data
 
+    def _positions_to_voltages(self, positions):
+        """ Vectorized conversion of positions for all scanner axes at once.
+
+        @param np.ndarray positions: 2D array (samples, axes) of positions with axes sorted by name
+
+        @return np.ndarray: 2D array (samples, axes) of voltages for the corresponding ni channels
+        """
+        voltages = positions * self.__voltage_slopes + self.__voltage_intercepts
+        for axis, (pos_table, volt_table, _, _) in self.__calibration_tables.items():
+            index = self.__conversion_axes.index(axis)
+            voltages[:, index] = np.interp(positions[:, index], pos_table, volt_table)
+        return np.clip(voltages, *self.__voltage_limits)
+
     def _pos_dict_to_vec(self, position):
 
         pos_list = [el[1] for el in sorted(position.items())]
@@ -590,8 +747,7 @@ class NiXSeriesScanner(ScannerInterface):
         if isinstance(position_vec, dict):
             raise ValueError(f"Position can't be provided as dict.")
 
-        axes = sorted(self.get_constraints().axes.keys())
-        return {axes[idx]: pos for idx, pos in enumerate(position_vec)}
+        return {self.__conversion_axes[idx]: pos for idx, pos in enumerate(position_vec)}
 
     def _voltage_dict_to_position_dict(self, voltages):
         """
@@ -600,27 +756,25 @@ class NiXSeriesScanner(ScannerInterface):
         @return dict: Voltage(s) converted to position(s) (value(s)) [single value & 1D np.array depending on input] for
                       for corresponding axis (keys)
         """
-
-        reverse_routing = {val.lower(): key for key, val in self._ni_channel_mapping.items()}
-
         # TODO check voltages given correctly checking?
         positions_data = dict()
         for ni_channel in voltages:
             try:
-                axis = reverse_routing[ni_channel]
-                voltage_range = self._ni_finite_sampling_io().constraints.output_channel_limits[ni_channel]
-                position_range = self.get_constraints().axes[axis].value_range
-
-                slope = np.diff(position_range) / np.diff(voltage_range)
-                intercept = position_range[1] - voltage_range[1] * slope
-
-                converted = voltages[ni_channel] * slope + intercept
-                # round position values to 100 pm. Avoids float precision errors
-                converted = np.around(converted, 10)
-            except KeyError:
+                axis = self.__reverse_routing[ni_channel.lower()]
+                index = self.__conversion_axes.index(axis)
+            except (KeyError, ValueError):
                 # if one of the AO channels is not used for confocal
                 continue
 
+            if axis in self.__calibration_tables:
+                _, _, volt_table, pos_table = self.__calibration_tables[axis]
+                converted = np.interp(voltages[ni_channel], volt_table, pos_table)
+            else:
+                converted = (np.asarray(voltages[ni_channel]) - self.__voltage_intercepts[index]) / \
+                            self.__voltage_slopes[index]
+            # round position values to 100 pm. Avoids float precision errors
+            converted = np.around(converted, 10)
+
             try:
                 # In case of single value, use just this value
                 positions_data[axis] = converted.item()
@@ -629,6 +783,39 @@ class NiXSeriesScanner(ScannerInterface):
 
         return positions_data
 
+    def _get_scan_waveform(self, scan_data):
+        """ Returns the (read-only) voltage waveforms of a scan from the LRU cache, or generates and
+        caches them. The key consists of all settings the waveform depends on. The cache is
+        cleared whenever the position <-> voltage conversion (calibration) is rebuilt.
+        Generated voltages are clipped to the output limits, so cached waveforms need no further
+        validation.
+
+        @param ScanData scan_data: The desired ScanData instance
+
+        @return dict: voltage 1D numpy arrays (values) for each ni output channel (keys)
+        """
+        key = (scan_data.scan_axes,
+               tuple(tuple(rng) for rng in scan_data.scan_range),
+               scan_data.scan_resolution,
+               self.__backwards_line_resolution)
+        try:
+            waveform = self.__waveform_cache[key]
+            self.__waveform_cache.move_to_end(key)
+            return waveform
+        except KeyError:
+            pass
+
+        waveform = self._initialize_ni_scan_arrays(scan_data)
+        if self._waveform_cache_size > 0 and \
+                len(next(iter(waveform.values()))) <= self._waveform_cache_max_samples:
+            for arr in waveform.values():
+                # protect the cached arrays against modification
+                arr.flags.writeable = False
+            self.__waveform_cache[key] = waveform
+            while len(self.__waveform_cache) > self._waveform_cache_size:
+                self.__waveform_cache.popitem(last=False)
+        return waveform
+
     def _initialize_ni_scan_arrays(self, scan_data):
         """
         @param ScanData scan_data: The desired ScanData instance
@@ -647,8 +834,9 @@ class NiXSeriesScanner(ScannerInterface):
             axis = scan_data.scan_axes[0]
             horizontal_resolution = scan_data.scan_resolution[0]
 
-            horizontal = np.linspace(*self._position_to_voltage(axis, scan_data.scan_range[0]),
-                                     horizontal_resolution)
+            # equidistant in position, so non-linear calibration tables are respected
+            horizontal = np.atleast_1d(self._position_to_voltage(
+                axis, np.linspace(*scan_data.scan_range[0], horizontal_resolution)))
 
             horizontal_return_line = np.linspace(self._position_to_voltage(axis, scan_data.scan_range[0][1]),
                                                  self._position_to_voltage(axis, scan_data.scan_range[0][0]),
@@ -671,8 +859,8 @@ class NiXSeriesScanner(ScannerInterface):
             # horizontal scan array / "fast axis"
             horizontal_axis = scan_data.scan_axes[0]
 
-            horizontal = np.linspace(*self._position_to_voltage(horizontal_axis, scan_data.scan_range[0]),
-                                     horizontal_resolution)
+            horizontal = np.atleast_1d(self._position_to_voltage(
+                horizontal_axis, np.linspace(*scan_data.scan_range[0], horizontal_resolution)))
 
             horizontal_return_line = np.linspace(self._position_to_voltage(horizontal_axis, scan_data.scan_range[0][1]),
                                                  self._position_to_voltage(horizontal_axis, scan_data.scan_range[0][0]),
@@ -686,8 +874,8 @@ class NiXSeriesScanner(ScannerInterface):
 
             vertical_axis = scan_data.scan_axes[1]
 
-            vertical = np.linspace(*self._position_to_voltage(vertical_axis, scan_data.scan_range[1]),
-                                   vertical_resolution)
+            vertical = np.atleast_1d(self._position_to_voltage(
+                vertical_axis, np.linspace(*scan_data.scan_range[1], vertical_resolution)))
 
             # during horizontal line, the vertical line keeps its value
             vertical_lines = np.repeat(vertical.reshape(vertical_resolution, 1), horizontal_resolution, axis=1)
@@ -708,70 +896,258 @@ class NiXSeriesScanner(ScannerInterface):
             }
 
             return voltage_dict
-        else:
-            raise NotImplementedError('Ni Scan arrays could not be initialized for given ScanData dimension')
 
-    def __ao_cursor_write_loop(self):
+        elif scan_data.scan_dimension == 3:
 
-        t_start = time.perf_counter()
-        try:
-            current_pos_vec = self._pos_dict_to_vec(self.get_position())
+            horizontal_resolution, vertical_resolution, depth_resolution = scan_data.scan_resolution
+            horizontal_axis, vertical_axis, depth_axis = scan_data.scan_axes
+            backwards_resolution = self.__backwards_line_resolution
 
-            with self._thread_lock_cursor:
-                stop_loop = self._abort_cursor_move
+            # horizontal scan array / "fast axis", same for each line of each slice
+            horizontal = np.atleast_1d(self._position_to_voltage(
+                horizontal_axis, np.linspace(*scan_data.scan_range[0], horizontal_resolution)))
+            horizontal_return_line = np.linspace(horizontal[-1], horizontal[0], backwards_resolution)
+            horizontal_single_line = np.concatenate((horizontal, horizontal_return_line))
+            horizontal_scan_array = np.tile(horizontal_single_line, vertical_resolution * depth_resolution)
 
+            # vertical scan array / "slow axis". Steps one index during each return line and goes back
+            # to its start value during the last return line of each slice.
+            vertical = np.atleast_1d(self._position_to_voltage(
+                vertical_axis, np.linspace(*scan_data.scan_range[1], vertical_resolution)))
+            vertical_lines = np.repeat(vertical.reshape(vertical_resolution, 1), horizontal_resolution, axis=1)
+            vertical_return_lines = np.linspace(vertical, np.roll(vertical, -1), backwards_resolution).T
+            vertical_slice = np.concatenate((vertical_lines, vertical_return_lines), axis=1).ravel()
+            vertical_scan_array = np.tile(vertical_slice, depth_resolution)
+            # no need to go back after the last slice
+            vertical_scan_array[-backwards_resolution:] = vertical[-1]
+
+            # depth scan array / "slice axis". Constant during a slice, steps to the next slice during
+            # the last return line of each slice.
+            depth = np.atleast_1d(self._position_to_voltage(
+                depth_axis, np.linspace(*scan_data.scan_range[2], depth_resolution)))
+            samples_per_slice = vertical_resolution * (horizontal_resolution + backwards_resolution)
+            depth_scan_array = np.repeat(depth, samples_per_slice)
+            depth_scan_array.reshape(depth_resolution, samples_per_slice)[:-1, -backwards_resolution:] = \
+                np.linspace(depth[:-1], depth[1:], backwards_resolution).T
 
-                target_pos_vec = self._pos_dict_to_vec(self._target_pos)
-                connecting_vec = target_pos_vec - current_pos_vec
-                distance_to_target = np.linalg.norm(connecting_vec)
+            voltage_dict = {
+                self._ni_channel_mapping[horizontal_axis]: horizontal_scan_array,
+                self._ni_channel_mapping[vertical_axis]: vertical_scan_array,
+                self._ni_channel_mapping[depth_axis]: depth_scan_array
+            }
 
-                # Terminate follow loop if target is reached
-                if distance_to_target < self._scanner_distance_atol:
-                    stop_loop = True
+            return voltage_dict
+        else:
+            raise NotImplementedError('Ni Scan arrays could not be initialized for given ScanData dimension')
 
-                if not stop_loop:
-                    # Determine delta t and update timestamp for next iteration
-                    if not self.__t_last_follow:
-                        self.__t_last_follow = time.perf_counter()
+    def _compute_move_trajectory(self, start, stop, velocity):
+        """ Calculates a hardware timed straight line trajectory between two positions with a
+        trapezoidal velocity profile, i.e. constant acceleration up to the move velocity, constant
+        velocity and constant deceleration to the target position.
 
-                    delta_t = t_start - self.__t_last_follow
-                    #self.log.debug(f"Write loop duration: {1e3*(time.perf_counter()-self.__t_last_follow)} ms")
-                    self.__t_last_follow = t_start
+        @param dict start: start position per axis (all scanner axes)
+        @param dict stop: target position per axis (all scanner axes)
+        @param float velocity: maximum velocity of the move in m/s
 
-                    # Calculate new position to go to
-                    max_step_distance = delta_t * self._follow_velocity
+        @return dict: ni output channels (keys) and 1D voltage arrays (values) to be emitted at
+                      sample rate <move_sample_rate>
+        """
+        axes = self.__conversion_axes
+        start_vec = np.array([start[ax] for ax in axes], dtype=np.float64)
+        stop_vec = np.array([stop[ax] for ax in axes], dtype=np.float64)
+        connecting_vec = stop_vec - start_vec
+        distance = np.linalg.norm(connecting_vec)
+
+        sample_rate = self._ni_finite_sampling_io().constraints.sample_rate_in_range(
+            self.__move_sample_rate)[1]
+        acceleration = self.__max_move_acceleration
+        if velocity <= 0:
+            velocity = self.__max_move_velocity
+
+        if distance < self._scanner_distance_atol:
+            travelled = np.zeros(1)
+            distance = 1
+        else:
+            # Trapezoidal profile, degenerates to triangular for short distances
+            t_acc = velocity / acceleration
+            d_acc = 0.5 * acceleration * t_acc ** 2
+            if 2 * d_acc > distance:
+                t_acc = np.sqrt(distance / acceleration)
+                d_acc = 0.5 * distance
+                velocity = acceleration * t_acc
+            t_const = (distance - 2 * d_acc) / velocity
+            t_total = 2 * t_acc + t_const
+
+            number_of_samples = max(int(np.ceil(t_total * sample_rate)), 1)
+            t = np.minimum(np.arange(1, number_of_samples + 1) / sample_rate, t_total)
+            t_dec = np.clip(t - t_acc - t_const, 0, t_acc)
+            travelled = 0.5 * acceleration * np.minimum(t, t_acc) ** 2 \
+                        + velocity * np.clip(t - t_acc, 0, t_const) \
+                        + velocity * t_dec - 0.5 * acceleration * t_dec ** 2
+            travelled[-1] = distance
+
+        positions = start_vec + np.outer(travelled / distance, connecting_vec)
+        voltages = self._positions_to_voltages(positions)
+        return {self._ni_channel_mapping[ax]: voltages[:, i] for i, ax in enumerate(axes)}
+
+    def _configure_move_frame(self, trajectory):
+        """ Sets up the finite sampling io to emit the given move trajectory on all scanner axes.
+        Input channels stay the same as for the scan, their samples are discarded.
+        """
+        ni_io = self._ni_finite_sampling_io()
+        ni_io.set_sample_rate(self.__move_sample_rate)
+        ni_io.set_active_channels(
+            input_channels=(self._ni_channel_mapping[in_ch] for in_ch in self._input_channel_units),
+            output_channels=tuple(trajectory)
+        )
+        ni_io.set_output_mode(SamplingOutputMode.JUMP_LIST)
+        ni_io.set_frame_data(trajectory)
 
-                    if max_step_distance < distance_to_target:
-                        direction_vec = connecting_vec / distance_to_target
-                        new_pos_vec = current_pos_vec + max_step_distance * direction_vec
-                    else:
-                        new_pos_vec = target_pos_vec
+    def _configure_scan_frame(self):
+        """ (Re-)applies the scan frame set up in configure_scan to the finite sampling io, since
+        the io is shared with hardware timed scanner moves.
+        """
+        if self.__ni_scan_frame is None:
+            raise RuntimeError('Scan frame is not configured. Call "configure_scan" first.')
+        frame_data = self.__ni_scan_frame['frame_data']
+        if self._rearm_frames:
+            # Drive all axes like move frames do, so both can re-use the same io tasks. Axes not
+            # scanned are held at their current target. The completed frame is kept for repeated
+            # frames (e.g. frame averaging) as long as these targets do not change.
+            target = self.get_target()
+            held_voltages = {
+                ni_channel: self._position_to_voltage(axis, target[axis])
+                for axis, ni_channel in self._ni_channel_mapping.items()
+                if axis in target and ni_channel not in frame_data
+            }
+            if self.__ni_scan_frame.get('held_voltages') != held_voltages:
+                full_frame_data = frame_data.copy()
+                frame_size = len(next(iter(frame_data.values())))
+                for ni_channel, voltage in held_voltages.items():
+                    full_frame_data[ni_channel] = np.full(frame_size, voltage)
+                self.__ni_scan_frame['held_voltages'] = held_voltages
+                self.__ni_scan_frame['full_frame_data'] = full_frame_data
+            frame_data = self.__ni_scan_frame['full_frame_data']
+        ni_io = self._ni_finite_sampling_io()
+        ni_io.set_sample_rate(self.__ni_scan_frame['sample_rate'])
+        ni_io.set_active_channels(input_channels=self.__ni_scan_frame['input_channels'],
+                                  output_channels=tuple(frame_data))
+        ni_io.set_output_mode(SamplingOutputMode.JUMP_LIST)
+        # Scan waveforms are clipped to the output limits on generation (see _get_scan_waveform)
+        ni_io.set_frame_data(frame_data, validate=False)
 
-                    new_pos = self._pos_vec_to_dict(new_pos_vec)
-                    new_voltage = {self._ni_channel_mapping[ax]: self._position_to_voltage(ax, pos)
-                                   for ax, pos in new_pos.items()}
+    @QtCore.Slot()
+    def _start_hw_timed_move(self):
+        """ Emits the precomputed trajectory from the current to the target position in a single
+        hardware timed frame. Completion is checked by a single-shot timer scheduled for the
+        expected move duration.
+        """
+        try:
+            with self._thread_lock_cursor:
+                if self.__move_trajectory is not None:
+                    self._stop_hw_timed_move()
+
+                start_pos = self.get_position()
+                target_pos = {ax: self._target_pos.get(ax, pos) for ax, pos in start_pos.items()}
+                if all(abs(target_pos[ax] - pos) < self._scanner_distance_atol
+                       for ax, pos in start_pos.items()):
+                    # Nothing to move
+                    self._finish_hw_timed_move()
+                    return
+                trajectory = self._compute_move_trajectory(start_pos, target_pos,
+                                                           self._follow_velocity)
+
+                # free the ni_ao resources for the hardware timed output
+                self._toggle_ao_setpoint_channels(False)
+                self._configure_move_frame(trajectory)
+                self._ni_finite_sampling_io().start_buffered_frame()
+                self.__move_trajectory = trajectory
+                self._move_done_event.clear()
+
+                self.__move_duration = len(next(iter(trajectory.values()))) / \
+                                       self._ni_finite_sampling_io().sample_rate
+                self.__move_done_timer.start(int(np.ceil(1e3 * self.__move_duration)))
+        except:
+            self.log.exception('Unable to start hardware timed move: ')
+            try:
+                self._stop_hw_timed_move()
+            finally:
+                self._move_done_event.set()
+            if self._start_scan_after_cursor:
+                self._start_scan_after_cursor = False
+                self.module_state.unlock()
+
+    def __check_move_done(self):
+        try:
+            ni_io = self._ni_finite_sampling_io()
+            with self._thread_lock_cursor:
+                if self.__move_trajectory is None:
+                    return
+                remaining = ni_io.frame_size - ni_io.samples_in_buffer
+                if ni_io.is_running and remaining > 0:
+                    self.__move_done_timer.start(
+                        max(1, int(np.ceil(1e3 * remaining / ni_io.sample_rate)))
+                    )
+                    return
+            self._finish_hw_timed_move()
+        except:
+            self.log.exception('Error while waiting for hardware timed move: ')
+            self._finish_hw_timed_move()
 
-                    self._ni_ao().setpoints = new_voltage
-                    #self.log.debug(f'Cursor_write_loop move to {new_pos}, Dist= {distance_to_target} '
-                    #               f'took {1e3*(time.perf_counter()-t_start)} ms.')
+    def _stop_hw_timed_move(self):
+        """ Stops the move frame and re-enables the ni_ao setpoint channels at the last emitted
+        voltages.
 
-                    # Start single-shot timer to call this follow loop again after some wait time
-                    t_overhead = time.perf_counter() - t_start
-                    self.__ni_ao_write_timer.start(int(round(1000 * max(0, self._min_step_interval - t_overhead))))
+        @return dict: scanner position the move was stopped at
+        """
+        with self._thread_lock_cursor:
+            self.__move_done_timer.stop()
+            trajectory = self.__move_trajectory
+            self.__move_trajectory = None
+            if trajectory is None:
+                return self.get_position()
+
+            ni_io = self._ni_finite_sampling_io()
+            last_sample = len(next(iter(trajectory.values()))) - 1
+            if ni_io.is_running:
+                last_sample = min(max(ni_io.samples_in_buffer - 1, 0), last_sample)
+                ni_io.stop_buffered_frame()
+            # discard input samples acquired during the move
+            ni_io.get_buffered_samples()
+
+            self._toggle_ao_setpoint_channels(True)
+            self._ni_ao().setpoints = {ch: voltages[last_sample]
+                                       for ch, voltages in trajectory.items()}
+            return self.get_position()
+
+    def _finish_hw_timed_move(self):
+        try:
+            position = self._stop_hw_timed_move()
+        except:
+            self.log.exception('Error while stopping hardware timed move: ')
+            position = self._target_pos.copy()
+        finally:
+            self._move_done_event.set()
 
-            if stop_loop:
-                #self.log.debug(f'Cursor_write_loop stopping at {current_pos_vec}, dist= {distance_to_target}')
-                self._abort_cursor_movement()
+        self.sigMoveFinished.emit(position)
+        if self._start_scan_after_cursor:
+            self._start_hw_timed_scan()
 
-                if self._start_scan_after_cursor:
-                    self._start_hw_timed_scan()
-        except:
-            self.log.exception("Error in ao write loop: ")
+    @QtCore.Slot()
+    def _abort_hw_timed_move(self):
+        """ Stops a hardware timed move that did not finish in time. """
+        with self._thread_lock_cursor:
+            if self.__move_trajectory is not None:
+                self._target_pos = self._stop_hw_timed_move()
+            self._move_done_event.set()
 
     def _start_hw_timed_scan(self):
 
         #self.log.debug("Starting hw timed scan")
         try:
+            with self._thread_lock_cursor:
+                self._toggle_ao_setpoint_channels(False)
+            self._configure_scan_frame()
             self._ni_finite_sampling_io().start_buffered_frame()
             self.sigNextDataChunk.emit()
         except Exception as e:
@@ -786,12 +1162,13 @@ class NiXSeriesScanner(ScannerInterface):
         """
 
         #self.log.debug(f"Aborting move.")
-        self._target_pos = self.get_position()
-
         with self._thread_lock_cursor:
+            if self.__move_trajectory is not None:
+                self._target_pos = self._stop_hw_timed_move()
+                self._move_done_event.set()
+            else:
+                self._target_pos = self.get_position()
 
-            self._abort_cursor_move = True
-            self.__t_last_follow = None
             self._toggle_ao_setpoint_channels(False)
 
             #self.log.debug("hw turned off")
@@ -799,27 +1176,21 @@ class NiXSeriesScanner(ScannerInterface):
     def _move_to_and_start_scan(self, position):
         self._prepare_movement(position)
         self._start_scan_after_cursor = True
-        #self.log.debug("Starting timer to move to scan position")
-        self.__start_ao_write_timer()
+        #self.log.debug("Starting hardware timed move to scan position")
+        self._start_hw_timed_move()
 
     def _prepare_movement(self, position, velocity=None):
         """
-        Clips values of position to allowed range and fills up the write queue.
-        If re-entered from a different thread, clears current write queue and start
-        a new movement.
+        Clips values of position to allowed range and sets the new target position and velocity
+        for the next hardware timed move.
         """
-        # FIXME When position is changed real fast one gets the QT warnings
-        #  QObject::killTimer: Timers cannot be stopped from another thread
-        #  QObject::startTimer: Timers cannot be started from another thread
-
         #self.log.debug("Preparing movement")
 
         with self._thread_lock_cursor:
-            self._abort_cursor_move = False
             if not self._ao_setpoint_channels_active:
                 self._toggle_ao_setpoint_channels(True)
 
-            constr = self.get_constraints()
+            constr = self._constraints
 
             for axis, pos in position.items():
                 in_range_flag, _ = in_range(pos, *constr.axes[axis].value_range)
@@ -843,32 +1214,11 @@ class NiXSeriesScanner(ScannerInterface):
             self._follow_velocity = velocity
 
         #self.log.debug("Movement prepared")
-        # TODO Keep other axis constant?
-
-    def __init_ao_timer(self):
-        self.__ni_ao_write_timer = QtCore.QTimer(parent=self)
-
-        self.__ni_ao_write_timer.setSingleShot(True)
-        self.__ni_ao_write_timer.timeout.connect(self.__ao_cursor_write_loop, QtCore.Qt.QueuedConnection)
-        self.__ni_ao_write_timer.setInterval(1e3*self._min_step_interval)  # (ms), dynamically calculated during write loop
 
-    def __start_ao_write_timer(self):
-        #self.log.debug(f"ao start write timer in thread {self.thread()}, QT.QThread {QtCore.QThread.currentThread()} ")
-        try:
-            if not self.is_move_running:
-                #self.log.debug("Starting AO write timer...")
-                if self.thread() is not QtCore.QThread.currentThread():
-                    QtCore.QMetaObject.invokeMethod(self.__ni_ao_write_timer,
-                                                    'start',
-                                                    QtCore.Qt.BlockingQueuedConnection)
-                else:
-                    self.__ni_ao_write_timer.start()
-            else:
-                pass
-                #self.log.debug("Dropping timer start, already running")
-
-        except:
-            self.log.exception("")
+    def __init_move_timer(self):
+        self.__move_done_timer = QtCore.QTimer(parent=self)
+        self.__move_done_timer.setSingleShot(True)
+        self.__move_done_timer.timeout.connect(self.__check_move_done, QtCore.Qt.QueuedConnection)
 
     # ================ Slow counter interface ===================
             
@@ -958,53 +1308,106 @@ class NiXSeriesScanner(ScannerInterface):
 
 class RawDataContainer:
 
-    def __init__(self, channel_keys, number_of_scan_lines, forward_line_resolution, backwards_line_resolution):
+    def __init__(self, channel_keys, number_of_scan_lines, forward_line_resolution, backwards_line_resolution,
+                 number_of_slices=None, memmap_dir=None, dtypes=None):
         self.forward_line_resolution = forward_line_resolution
         self.number_of_scan_lines = number_of_scan_lines
-        self.forward_line_resolution = forward_line_resolution
         self.backwards_line_resolution = backwards_line_resolution
-
-        self.frame_size = number_of_scan_lines * (forward_line_resolution + backwards_line_resolution)
-        self._raw = {key: np.full(self.frame_size, np.nan) for key in channel_keys}
+        # number of 2D slices of a 3D scan (None for 1D/2D scans), each consisting of number_of_scan_lines lines
+        self.number_of_slices = number_of_slices
+
+        self.frame_size = (1 if number_of_slices is None else number_of_slices) * number_of_scan_lines * \
+                          (forward_line_resolution + backwards_line_resolution)
+        self._memmap_dir = memmap_dir
+        # channels are stored in their target dtype, integer channels use a separate valid mask
+        self._dtypes = {key: np.float64 if dtypes is None else dtypes.get(key, np.float64)
+                        for key in channel_keys}
+        self._use_mask = any(not np.issubdtype(dtype, np.floating) for dtype in self._dtypes.values())
+        self.new_frame()
+
+    def new_frame(self):
+        """ Allocates new (empty) buffers for the next frame. Views of the previous buffers are
+        left untouched.
+        """
+        self._raw = {key: ScanData.allocate_array((self.frame_size,), dtype, self._memmap_dir)
+                     for key, dtype in self._dtypes.items()}
+        self._valid = np.zeros(self.frame_size, dtype=bool) if self._use_mask else None
+        self._filled = 0
 
     def fill_container(self, samples_dict):
-        # get index of first nan from one element of dict
-        first_nan_idx = self.number_of_non_nan_values
+        # samples are appended after the last filled sample
+        first_nan_idx = self._filled
+        number_of_samples = 0
         for key, samples in samples_dict.items():
-            self._raw[key][first_nan_idx:first_nan_idx + len(samples)] = samples
+            raw = self._raw[key]
+            if not np.issubdtype(raw.dtype, np.floating):
+                samples = np.rint(samples)
+            raw[first_nan_idx:first_nan_idx + len(samples)] = samples
+            number_of_samples = len(samples)
+        if self._valid is not None:
+            self._valid[first_nan_idx:first_nan_idx + number_of_samples] = True
+        self._filled = min(first_nan_idx + number_of_samples, self.frame_size)
+
+    def _split_lines(self, raw):
+        line_length = self.forward_line_resolution + self.backwards_line_resolution
+        if self.number_of_slices is not None:
+            # (slice, line, sample) -> (sample, line, slice); all views, nothing is copied
+            return raw.reshape(self.number_of_slices, self.number_of_scan_lines, line_length).transpose(2, 1, 0)
+        return raw.reshape(self.number_of_scan_lines, line_length).T
 
     def forwards_data(self):
         reshaped_2d_dict = dict.fromkeys(self._raw)
         for key in self._raw:
-            if self.number_of_scan_lines > 1:
-                reshaped_arr = self._raw[key].reshape(self.number_of_scan_lines,
-                                                      self.forward_line_resolution + self.backwards_line_resolution)
-                reshaped_2d_dict[key] = reshaped_arr[:, :self.forward_line_resolution].T
+            if self.number_of_slices is not None or self.number_of_scan_lines > 1:
+                reshaped_2d_dict[key] = self._split_lines(self._raw[key])[:self.forward_line_resolution]
             elif self.number_of_scan_lines == 1:
                 reshaped_2d_dict[key] = self._raw[key][:self.forward_line_resolution]
         return reshaped_2d_dict
 
+    def forwards_valid_mask(self):
+        """ Valid mask of the forward data, None if all channels are floating point (NaN).
+        """
+        if self._valid is None:
+            return None
+        if self.number_of_slices is not None or self.number_of_scan_lines > 1:
+            return self._split_lines(self._valid)[:self.forward_line_resolution]
+        return self._valid[:self.forward_line_resolution]
+
     def backwards_data(self):
         reshaped_2d_dict = dict.fromkeys(self._raw)
         for key in self._raw:
-            if self.number_of_scan_lines > 1:
-                reshaped_arr = self._raw[key].reshape(self.number_of_scan_lines,
-                                                      self.forward_line_resolution + self.backwards_line_resolution)
-                reshaped_2d_dict[key] = reshaped_arr[:, self.forward_line_resolution:].T
+            if self.number_of_slices is not None or self.number_of_scan_lines > 1:
+                reshaped_2d_dict[key] = self._split_lines(self._raw[key])[self.forward_line_resolution:]
             elif self.number_of_scan_lines == 1:
                 reshaped_2d_dict[key] = self._raw[key][self.forward_line_resolution:]
 
         return reshaped_2d_dict
 
+    @property
+    def current_slice_index(self):
+        """
+        returns the index of the slice currently being filled
+        """
+        if self.number_of_slices is None:
+            return 0
+        samples_per_slice = self.number_of_scan_lines * (self.forward_line_resolution +
+                                                         self.backwards_line_resolution)
+        return min(int(self.number_of_non_nan_values // samples_per_slice), self.number_of_slices - 1)
+
     @property
     def number_of_non_nan_values(self):
         """
-        returns number of not NaN samples
+        returns number of acquired samples
         """
-        return np.sum(~np.isnan(next(iter(self._raw.values()))))
+        return self._filled
+
+    @property
+    def completed_lines(self):
+        """
+        returns the number of completely acquired lines (forward and backward)
+        """
+        return self._filled // (self.forward_line_resolution + self.backwards_line_resolution)
 
     @property
     def is_full(self):
         return self.number_of_non_nan_values == self.frame_size
-
-
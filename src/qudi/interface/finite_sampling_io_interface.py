@@ -85,6 +85,27 @@ class FiniteSamplingIOInterface(Base):
         """
         pass
 
+    @property
+    def rearm_frames(self):
+        """ Flag indicating if the hardware is kept configured after a frame and re-armed for the
+        next frame with the same set of active channels.
+        Hardware modules supporting this should override this default implementation.
+
+        @return bool: Frame re-arming enabled (True) or not (False)
+        """
+        return False
+
+    def set_rearm_frames(self, enable):
+        """ Enables or disables keeping the hardware configured between frames, so that
+        consecutive frames with the same set of active channels start with less overhead.
+        Hardware modules supporting this should override this default implementation.
+
+        @param bool enable: Keep and re-arm the hardware between frames (True) or not (False)
+
+        @return bool: The frame re-arming state actually set
+        """
+        return False
+
     @abstractmethod
     def set_sample_rate(self, rate):
         """ Will set the sample rate to a new value.
@@ -104,7 +125,7 @@ class FiniteSamplingIOInterface(Base):
         pass
 
     @abstractmethod
-    def set_frame_data(self, data):
+    def set_frame_data(self, data, validate=True):
         """ Fills the frame buffer for the next data frame to be emitted. Data must be a dict
         containing exactly all active channels as keys with corresponding sample data as values.
 
@@ -117,6 +138,8 @@ class FiniteSamplingIOInterface(Base):
         Calling this method will alter read-only property <frame_size>
 
         @param dict data: The frame data (values) to be set for all active output channels (keys)
+        @param bool validate: optional, check the output values against the channel limits. Only
+                              skip this for frames that have been validated before (e.g. cached).
         """
         pass
 
@@ -177,6 +200,30 @@ class FiniteSamplingIOInterface(Base):
         """
         pass
 
+    def read_buffered_samples_into(self, buffers, number_of_samples=None):
+        """ Same as <get_buffered_samples> but the samples are written into the given (persistent)
+        buffers instead of newly allocated arrays. Samples are written to the start of each buffer.
+        If <number_of_samples> is omitted, the currently available samples are read, limited by the
+        size of the buffers.
+
+        Hardware modules should override this default implementation to avoid allocating
+        temporary arrays.
+
+        @param dict buffers: 1D numpy.ndarrays (values) for each active input channel (keys)
+        @param int number_of_samples: optional, the number of samples to read from buffer
+
+        @return int: Number of samples per channel written into the buffers
+        """
+        if number_of_samples is None:
+            capacity = min((len(buf) for buf in buffers.values()), default=self.samples_in_buffer)
+            number_of_samples = min(self.samples_in_buffer, capacity)
+        samples = self.get_buffered_samples(number_of_samples)
+        # a stopped frame can return less than the requested number of samples
+        number_of_samples = min((len(arr) for arr in samples.values()), default=0)
+        for channel, buf in buffers.items():
+            buf[:number_of_samples] = samples[channel][:number_of_samples]
+        return number_of_samples
+
     @abstractmethod
     def get_frame(self, data):
         """ Performs io for a single data frame for all active channels.
@@ -23,8 +23,10 @@ If not, see <https://www.gnu.org/licenses/>.
 __all__ = ['ScannerInterface']
 
 import datetime
+import tempfile
 import numpy as np
 from abc import abstractmethod
+from PySide2 import QtCore
 from qudi.core.module import Base
 
 
@@ -32,8 +34,15 @@ class ScannerInterface(Base):
     """ This is the Interface class to define the controls for a scanning probe device
 
     A scanner device is hardware that can move multiple axes.
+
+    Hardware modules must emit sigScanDataReady whenever new scan data (e.g. a scan line) is
+    available and sigScanFinished once the scan has finished or has been stopped (i.e. after the
+    module state has returned to idle). Logic modules use these signals instead of polling.
     """
 
+    sigScanDataReady = QtCore.Signal()
+    sigScanFinished = QtCore.Signal()
+
     @abstractmethod
     def get_constraints(self):
         """ Get hardware constraints/limitations.
@@ -50,7 +59,7 @@ class ScannerInterface(Base):
 
     @abstractmethod
     def configure_scan(self, settings):
-        """ Configure the hardware with all parameters needed for a 1D or 2D scan.
+        """ Configure the hardware with all parameters needed for a 1D, 2D or 3D scan.
 
         @param ScanSettings settings: ScanSettings instance holding all parameters # TODO update me!
 
@@ -128,6 +137,22 @@ class ScannerInterface(Base):
         """
         pass
 
+    def get_scan_slice(self, index=None):
+        """ Get a single 2D slice of a 3D (z-stack) scan without copying the entire volume.
+        Hardware modules holding large volumes should override this with a cheaper implementation.
+
+        @param int index: optional, slice index along the third scan axis. Defaults to the slice
+                          currently being acquired.
+
+        @return (int, ScanData): slice index, 2D ScanData of the slice
+        """
+        scan_data = self.get_scan_data()
+        if scan_data is None or scan_data.data is None:
+            return 0, None
+        if index is None:
+            index = scan_data.current_slice_index
+        return index, scan_data.get_slice(index)
+
     @abstractmethod
     def emergency_stop(self):
         """
@@ -143,7 +168,8 @@ class ScanData:
     """
 
     def __init__(self, channels, scan_axes, scan_range, scan_resolution, scan_frequency,
-                 target_at_start=None, position_feedback_axes=None):
+                 target_at_start=None, position_feedback_axes=None, memmap_dir=None,
+                 position_dtype=np.float64):
         """
 
         @param ScannerChannel[] channels: ScannerChannel objects involved in this scan
@@ -154,10 +180,17 @@ class ScanData:
         @param dict target_at_start: optional, save scanner target (all axes) at beginning of scan
         @param ScannerAxis[] position_feedback_axes: optional, axes for which to acquire position
                                                      feedback during the scan.
+        @param str memmap_dir: optional, directory for temporary files to memory-map the data
+                               arrays to (useful for large 3D scans). Data is kept in RAM if None.
+        @param type position_dtype: optional, floating point type of the position feedback data
+
+        Channels can have floating point or integer dtypes. Not yet acquired data points of
+        floating point channels are NaN. If any channel has an integer dtype, a separate boolean
+        <valid_mask> flags the acquired data points instead.
         """
         # Sanity checking
-        if not (0 < len(scan_axes) <= 2):
-            raise ValueError('ScanData can only be used for 1D or 2D scans.')
+        if not (0 < len(scan_axes) <= 3):
+            raise ValueError('ScanData can only be used for 1D, 2D or 3D scans.')
         if len(channels) < 1:
             raise ValueError('At least one data channel must be specified for a valid scan.')
         if len(scan_axes) != len(scan_range):
@@ -180,8 +213,12 @@ class ScanData:
         if not all(isinstance(ch, ScannerChannel) for ch in channels):
             raise TypeError(
                 'Parameter "channels" must be iterable containing only ScannerChannel objects.')
-        if not all(np.issubdtype(ch.dtype, np.floating) for ch in channels):
-            raise TypeError('channel dtypes must be either builtin or numpy floating types')
+        if not all(np.issubdtype(ch.dtype, np.floating) or np.issubdtype(ch.dtype, np.integer)
+                   for ch in channels):
+            raise TypeError('channel dtypes must be either builtin or numpy floating or integer '
+                            'types')
+        if not np.issubdtype(position_dtype, np.floating):
+            raise TypeError('position_dtype must be either builtin or numpy floating type')
 
         self._scan_axes = tuple(scan_axes)
         self._scan_range = tuple((float(start), float(stop)) for (start, stop) in scan_range)
@@ -197,7 +234,11 @@ class ScanData:
         self._timestamp = None
         self._data = None
         self._position_data = None
+        self._valid_mask = None
+        self._position_dtype = position_dtype
         self._target_at_start = target_at_start
+        self._memmap_dir = memmap_dir
+        self._frozen = False
         # TODO: Automatic interpolation onto rectangular grid needs to be implemented (for position feedback HW)
         return
 
@@ -207,12 +248,15 @@ class ScanData:
                             scan_range=self._scan_range,
                             scan_resolution=self._scan_resolution,
                             scan_frequency=self._scan_frequency,
-                            position_feedback_axes=self._position_feedback_axes)
+                            position_feedback_axes=self._position_feedback_axes,
+                            memmap_dir=self._memmap_dir,
+                            position_dtype=self._position_dtype)
         new_inst._timestamp = self._timestamp
         if self._data is not None:
             new_inst._data = self._data.copy()
         if self._position_data is not None:
             new_inst._position_data = self._position_data.copy()
+        new_inst._valid_mask = self._valid_mask
         return new_inst
 
     def __deepcopy__(self, memodict={}):
@@ -271,10 +315,96 @@ class ScanData:
 
     @data.setter
     def data(self, data_dict):
+        self.set_data(data_dict)
+
+    def set_data(self, data_dict, valid_mask=None):
+        """ Sets the data arrays of all channels.
+
+        If any channel has an integer dtype and no valid_mask is given, floating point arrays
+        containing NaN for missing data points are accepted and converted to the channel dtypes.
+
+        @param dict data_dict: data arrays (values) for all channels (keys)
+        @param numpy.ndarray valid_mask: optional, boolean array flagging acquired data points.
+                                         Ignored if all channels have floating point dtypes.
+        """
+        if self._frozen:
+            raise RuntimeError('Unable to set data of a frozen ScanData snapshot.')
         assert tuple(data_dict.keys()) == self.channels
         assert all([val.shape == self.scan_resolution for val in data_dict.values()])
+        if self.uses_valid_mask:
+            if valid_mask is None:
+                valid_mask = np.ones(self._scan_resolution, dtype=bool)
+                for ch in self._channels:
+                    arr = data_dict[ch.name]
+                    if np.issubdtype(arr.dtype, np.floating):
+                        valid_mask &= ~np.isnan(arr)
+                data_dict = {
+                    ch.name: data_dict[ch.name] if data_dict[ch.name].dtype == ch.dtype else
+                    np.where(valid_mask, data_dict[ch.name], 0).astype(ch.dtype)
+                    for ch in self._channels
+                }
+            self._valid_mask = valid_mask
         self._data = data_dict
 
+    @property
+    def uses_valid_mask(self):
+        """ Flag indicating that a separate boolean mask instead of NaN values marks the acquired
+        data points, i.e. any channel has an integer dtype.
+        """
+        return any(not np.issubdtype(ch.dtype, np.floating) for ch in self._channels)
+
+    @property
+    def valid_mask(self):
+        """ Boolean array flagging the acquired data points. For scans with only floating point
+        channels the mask is derived from the NaN values of the first channel.
+
+        @return numpy.ndarray: valid mask (None if there is no data)
+        """
+        if self._data is None:
+            return None
+        if self._valid_mask is not None:
+            return self._valid_mask
+        return ~np.isnan(self._data[self._channels[0].name])
+
+    def mark_valid(self, index):
+        """ Flags data points as acquired. Needs to be called after writing directly into the data
+        arrays if integer channels are used. Does nothing for floating point only scans.
+
+        @param index: numpy index (e.g. tuple of slices) of the acquired data points
+        """
+        if self._valid_mask is not None:
+            self._valid_mask[index] = True
+
+    def get_float_data(self, channel):
+        """ Data of a channel as floating point array with NaN for data points not acquired.
+        Floating point channels are returned without copy.
+
+        @param str channel: channel name
+
+        @return numpy.ndarray: channel data
+        """
+        arr = self._data[channel]
+        if np.issubdtype(arr.dtype, np.floating):
+            return arr
+        return np.where(self._valid_mask, arr, np.nan)
+
+    @property
+    def channel_dtypes(self):
+        return {ch.name: ch.dtype for ch in self._channels}
+
+    def empty_copy(self, channel_dtype=None):
+        """ Copy of the scan settings without any data.
+
+        @param type channel_dtype: optional, dtype to use for all channels instead of the original
+
+        @return ScanData: new ScanData instance without data
+        """
+        new_inst = self._new_instance()
+        if channel_dtype is not None:
+            new_inst._channels = tuple(ScannerChannel(name=ch.name, unit=ch.unit, dtype=channel_dtype)
+                                       for ch in self._channels)
+        return new_inst
+
     @property
     def position_data(self):
         return self._position_data
@@ -287,11 +417,19 @@ class ScanData:
     def scan_dimension(self):
         return len(self._scan_axes)
 
+    @property
+    def is_frozen(self):
+        """ Flag indicating an immutable snapshot with read-only data arrays.
+        """
+        return self._frozen
+
     def new_scan(self, timestamp=None):
         """
 
         @param timestamp:
         """
+        if self._frozen:
+            raise RuntimeError('Unable to start a new scan on a frozen ScanData snapshot.')
         if timestamp is None:
             self._timestamp = datetime.datetime.now()
         elif isinstance(timestamp, datetime.datetime):
@@ -300,31 +438,176 @@ class ScanData:
             raise TypeError('Optional parameter "timestamp" must be datetime.datetime object.')
 
         if self.has_position_feedback:
-            self._position_data = {ax.name: np.full(self._scan_resolution, np.nan) for ax in
-                                   self._position_feedback_axes}
+            self._position_data = {
+                ax.name: self.allocate_array(self._scan_resolution, self._position_dtype)
+                for ax in self._position_feedback_axes
+            }
         else:
             self._position_data = None
         self._data = {
-            ch.name: np.full(self._scan_resolution, np.nan, dtype=ch.dtype) for ch in self._channels
+            ch.name: self.allocate_array(self._scan_resolution, ch.dtype, self._memmap_dir)
+            for ch in self._channels
         }
+        if self.uses_valid_mask:
+            self._valid_mask = np.zeros(self._scan_resolution, dtype=bool)
+        else:
+            self._valid_mask = None
         return
 
-    def copy(self):
+    @staticmethod
+    def allocate_array(shape, dtype=np.float64, memmap_dir=None):
+        """ Allocates a NaN (floating point) or zero (integer) initialized data array, optionally
+        memory-mapped to an anonymous temporary file in memmap_dir. The file is removed as soon as
+        the array is released.
+
+        @param tuple shape: shape of the array
+        @param type dtype: floating point or integer data type of the array
+        @param str memmap_dir: optional, directory to create the temporary file in
+
+        @return numpy.ndarray: the allocated array
+        """
+        fill_value = np.nan if np.issubdtype(dtype, np.floating) else 0
+        if memmap_dir is None:
+            return np.full(shape, fill_value, dtype=dtype)
+        arr = np.memmap(tempfile.TemporaryFile(dir=memmap_dir), dtype=dtype, mode='w+',
+                        shape=tuple(shape))
+        arr[...] = fill_value
+        return arr
+
+    @property
+    def current_slice_index(self):
+        """ Index of the last slice along the third axis of a 3D scan that contains data.
+        Always 0 for 1D and 2D scans.
+        """
+        if self.scan_dimension < 3 or self._data is None:
+            return 0
+        acquired = np.flatnonzero(np.any(self.valid_mask[:, 0, :], axis=0))
+        return int(acquired[-1]) if acquired.size > 0 else 0
+
+    def get_slice(self, index):
+        """ 2D slice of a 3D scan at the given index along the third scan axis.
+        The slice data arrays are views into this scan's data, i.e. no data is copied.
+
+        @param int index: slice index along the third scan axis
+
+        @return ScanData: 2D ScanData of the first two scan axes
+        """
+        if self.scan_dimension != 3:
+            raise ValueError('Slices are only available for 3D scans.')
+        target = None if self._target_at_start is None else dict(self._target_at_start)
+        if target is not None:
+            z_axis = self._scan_axes[2].name
+            target[z_axis] = np.linspace(*self._scan_range[2], self._scan_resolution[2])[index]
+        new_inst = ScanData(channels=self._channels,
+                            scan_axes=self._scan_axes[:2],
+                            scan_range=self._scan_range[:2],
+                            scan_resolution=self._scan_resolution[:2],
+                            scan_frequency=self._scan_frequency,
+                            position_feedback_axes=self._position_feedback_axes,
+                            target_at_start=target,
+                            position_dtype=self._position_dtype)
+        new_inst._timestamp = self._timestamp
+        if self._data is not None:
+            new_inst._data = {ch: arr[:, :, index] for ch, arr in self._data.items()}
+        if self._position_data is not None:
+            new_inst._position_data = {ax: arr[:, :, index] for ax, arr in self._position_data.items()}
+        if self._valid_mask is not None:
+            new_inst._valid_mask = self._valid_mask[:, :, index]
+        new_inst._frozen = self._frozen
+        return new_inst
+
+    def snapshot(self):
+        """ Immutable snapshot of this scan. The snapshot shares the data arrays with this instance
+        via read-only views, i.e. no data is copied. Snapshots of already frozen instances return
+        the instance itself.
+        Only take snapshots of finished scans. Hardware modules allocate new arrays with each call
+        to <new_scan>, so the snapshot stays valid after the next scan has been started.
+
+        @return ScanData: frozen ScanData instance
+        """
+        if self._frozen:
+            return self
+        new_inst = self._new_instance()
+        if self._data is not None:
+            new_inst._data = {ch: self._read_only_view(arr) for ch, arr in self._data.items()}
+        if self._position_data is not None:
+            new_inst._position_data = {ax: self._read_only_view(arr) for ax, arr in
+                                       self._position_data.items()}
+        if self._valid_mask is not None:
+            new_inst._valid_mask = self._read_only_view(self._valid_mask)
+        new_inst._frozen = True
+        return new_inst
+
+    def make_writable(self):
+        """ Copies all data arrays shared (read-only) with a snapshot, so they can be written to.
+        Arrays already owned by this instance are not copied. Needs to be called before writing
+        directly into the data arrays of a <shared_copy>.
+        """
+        if self._frozen:
+            raise RuntimeError('Frozen ScanData snapshots can not be made writable. Use copy().')
+        if self._data is not None:
+            self._data = {ch: arr if arr.flags.writeable else arr.copy() for ch, arr in
+                          self._data.items()}
+        if self._position_data is not None:
+            self._position_data = {ax: arr if arr.flags.writeable else arr.copy() for ax, arr in
+                                   self._position_data.items()}
+        if self._valid_mask is not None and not self._valid_mask.flags.writeable:
+            self._valid_mask = self._valid_mask.copy()
+
+    @staticmethod
+    def _read_only_view(arr):
+        view = arr.view()
+        view.flags.writeable = False
+        return view
+
+    def _new_instance(self):
         new_inst = ScanData(channels=self._channels,
                             scan_axes=self._scan_axes,
                             scan_range=self._scan_range,
                             scan_resolution=self._scan_resolution,
                             scan_frequency=self._scan_frequency,
                             position_feedback_axes=self._position_feedback_axes,
-                            target_at_start=self._target_at_start)
+                            target_at_start=self._target_at_start,
+                            memmap_dir=self._memmap_dir,
+                            position_dtype=self._position_dtype)
         new_inst._timestamp = self._timestamp
+        return new_inst
+
+    def copy(self):
+        """ Copy of this instance that is not frozen and owns writable copies of all data arrays.
+        """
+        new_inst = self._new_instance()
+        if self._valid_mask is not None:
+            new_inst._valid_mask = self._valid_mask.copy()
         if self._data is not None:
             new_inst._data = {ch: arr.copy() for ch, arr in self._data.items()}
         if self._position_data is not None:
-            new_inst._position_data = {ch: arr.copy() for ch, arr in self._position_data.items()}
+            new_inst._position_data = {ch: arr.copy() for ch, arr in
+                                       self._position_data.items()}
         return new_inst
 
-    def to_dict(self):
+    def shared_copy(self):
+        """ Copy of this instance that is not frozen, but shares the data arrays of a frozen
+        snapshot as read-only views (copy-on-write). New data can be set via <set_data> right away.
+        Writing directly into the data arrays requires a call to <make_writable> first, which
+        copies the shared arrays. Unfrozen instances are copied like in <copy>.
+        """
+        if not self._frozen:
+            return self.copy()
+        new_inst = self._new_instance()
+        if self._data is not None:
+            new_inst._data = self._data.copy()
+        if self._position_data is not None:
+            new_inst._position_data = self._position_data.copy()
+        new_inst._valid_mask = self._valid_mask
+        return new_inst
+
+    def to_dict(self, include_data=True):
+        """ Dict representation of this instance.
+
+        @param bool include_data: optional, include (copies of) the data and position data arrays.
+                                  If False, only the lightweight metadata is returned.
+        """
         dict_repr = {
             'scan_axes': tuple(ax.to_dict() for ax in self._scan_axes),
             'scan_range': self._scan_range,
@@ -334,10 +617,24 @@ class ScanData:
             'position_feedback_axes': None if self._position_feedback_axes is None else tuple(
                 ax.to_dict() for ax in self._position_feedback_axes),
             'timestamp': None if self._timestamp is None else self._timestamp.timestamp(),
-            'data': None if self._data is None else {ch: d.copy() for ch, d in self._data.items()},
-            'position_data': None if self._position_data is None else {ax: d.copy() for ax, d in
-                                                                       self._position_data.items()}
+            'position_dtype': np.dtype(self._position_dtype).name,
+            'data': None,
+            'position_data': None,
+            'valid_mask': None
         }
+        if include_data:
+            # arrays of frozen snapshots are immutable and need not be copied
+            if self._data is not None:
+                dict_repr['data'] = self._data.copy() if self._frozen else {
+                    ch: d.copy() for ch, d in self._data.items()
+                }
+            if self._position_data is not None:
+                dict_repr['position_data'] = self._position_data.copy() if self._frozen else {
+                    ax: d.copy() for ax, d in self._position_data.items()
+                }
+            if self._valid_mask is not None:
+                dict_repr['valid_mask'] = self._valid_mask if self._frozen else \
+                    self._valid_mask.copy()
         return dict_repr
 
     @classmethod
@@ -355,14 +652,185 @@ class ScanData:
                        scan_range=dict_repr['scan_range'],
                        scan_resolution=dict_repr['scan_resolution'],
                        scan_frequency=dict_repr['scan_frequency'],
-                       position_feedback_axes=position_feedback_axes)
-        new_inst._data = dict_repr['data']
-        new_inst._position_data = dict_repr['position_data']
+                       position_feedback_axes=position_feedback_axes,
+                       position_dtype=getattr(np, dict_repr.get('position_dtype', 'float64')))
+        new_inst._data = dict_repr.get('data', None)
+        new_inst._position_data = dict_repr.get('position_data', None)
+        new_inst._valid_mask = dict_repr.get('valid_mask', None)
+        if new_inst._data is not None and new_inst._valid_mask is None and new_inst.uses_valid_mask:
+            # no mask stored, consider all data points acquired
+            new_inst._valid_mask = np.ones(new_inst.scan_resolution, dtype=bool)
         if dict_repr['timestamp'] is not None:
             new_inst._timestamp = datetime.datetime.fromtimestamp(dict_repr['timestamp'])
         return new_inst
 
 
+class ScanDataPyramid:
+    """ Multi-resolution (mipmap) representation of the channel images of a 2D ScanData.
+
+    Level 0 references the full resolution data arrays (no copy). Each further level is
+    downsampled by a factor of 2 along both axes (NaN-aware block mean, float32) until both
+    dimensions are <= min_size. The levels are updated incrementally, i.e. only for the scan lines
+    acquired since the last call to <update>.
+    """
+
+    def __init__(self, min_size=256):
+        """
+        @param int min_size: optional, maximum size (per dimension) of the coarsest level
+        """
+        self._min_size = int(min_size)
+        self._levels = dict()
+        self._valid_mask = None
+        self._scan_id = None
+        self._complete_lines = 0
+
+    @property
+    def number_of_levels(self):
+        if not self._levels:
+            return 0
+        return len(next(iter(self._levels.values())))
+
+    def reset(self):
+        self._levels = dict()
+        self._valid_mask = None
+        self._scan_id = None
+        self._complete_lines = 0
+
+    def update(self, scan_data):
+        """ Updates all levels with the lines acquired since the last update. A scan with a
+        different timestamp, resolution or channels (i.e. a new scan) rebuilds the pyramid.
+
+        @param ScanData scan_data: the (partially) acquired 2D scan data
+        """
+        if scan_data is None or scan_data.data is None or scan_data.scan_dimension != 2:
+            self.reset()
+            return
+        scan_id = (scan_data._timestamp, scan_data.scan_resolution, scan_data.channels)
+        if scan_id != self._scan_id:
+            self._init_levels(scan_data)
+            self._scan_id = scan_id
+        else:
+            # scan data may be a new copy of the same scan
+            for ch, arr in scan_data.data.items():
+                self._levels[ch][0] = arr
+
+        self._valid_mask = scan_data._valid_mask
+
+        # Lines (second axis) are acquired one after another. Every line before the last started
+        # one is considered complete.
+        first = self._complete_lines
+        if self._valid_mask is None:
+            started = np.flatnonzero(~np.isnan(scan_data.data[scan_data.channels[0]][0, first:]))
+        else:
+            started = np.flatnonzero(self._valid_mask[0, first:])
+        if started.size == 0:
+            return
+        stop = first + int(started[-1]) + 1
+        self._update_lines(first, stop)
+        self._complete_lines = stop - 1
+
+    def get_level(self, channel, level):
+        """ Image of a channel at the given resolution level.
+
+        @param str channel: channel name
+        @param int level: resolution level (0 is full resolution)
+
+        @return numpy.ndarray: image of the level
+        """
+        return self._levels[channel][level]
+
+    def level_for_size(self, pixels):
+        """ Coarsest level still having at least <pixels> data points along the larger axis,
+        e.g. the number of screen pixels available to display the image.
+
+        @param int pixels: number of pixels to resolve
+
+        @return int: resolution level
+        """
+        if not self._levels:
+            return 0
+        levels = next(iter(self._levels.values()))
+        for level in range(len(levels) - 1, 0, -1):
+            if max(levels[level].shape) >= pixels:
+                return level
+        return 0
+
+    def get_region(self, channel, x_range, y_range, scan_range, pixels):
+        """ Region of a channel image at the coarsest level resolving <pixels> data points across
+        the region. Only the region is sliced from the level, the full resolution array is not
+        touched unless the region requires level 0.
+
+        @param str channel: channel name
+        @param tuple x_range: (min, max) of the region along the first scan axis
+        @param tuple y_range: (min, max) of the region along the second scan axis
+        @param tuple scan_range: ((x_min, x_max), (y_min, y_max)) of the full scan
+        @param int pixels: number of pixels to resolve across the region
+
+        @return (numpy.ndarray, tuple): image of the region, ((x_min, x_max), (y_min, y_max)) of
+                                        the image pixel centers
+        """
+        levels = self._levels[channel]
+        full_shape = levels[0].shape
+        start_stop = list()
+        for (low, high), (scan_min, scan_max), size in zip((x_range, y_range), scan_range,
+                                                           full_shape):
+            step = (scan_max - scan_min) / (size - 1) if size > 1 else 1
+            start = int(np.clip(np.floor((min(low, high) - scan_min) / step), 0, size - 1))
+            stop = int(np.clip(np.ceil((max(low, high) - scan_min) / step) + 1, start + 1, size))
+            start_stop.append((start, stop))
+        region_size = max(stop - start for start, stop in start_stop)
+        level = int(np.clip(np.floor(np.log2(max(region_size / max(pixels, 1), 1))),
+                            0,
+                            len(levels) - 1))
+        factor = 2 ** level
+        image = levels[level][start_stop[0][0] // factor:-(-start_stop[0][1] // factor),
+                              start_stop[1][0] // factor:-(-start_stop[1][1] // factor)]
+        # pixel centers (in full resolution indices) of the first and last block
+        region_range = list()
+        for (start, stop), (scan_min, scan_max), size in zip(start_stop, scan_range, full_shape):
+            step = (scan_max - scan_min) / (size - 1) if size > 1 else 0
+            first = (start // factor) * factor + (factor - 1) / 2
+            last = (-(-stop // factor) - 1) * factor + (factor - 1) / 2
+            region_range.append((scan_min + first * step, scan_min + min(last, size - 1) * step))
+        return image, tuple(region_range)
+
+    def _init_levels(self, scan_data):
+        self._levels = dict()
+        self._complete_lines = 0
+        shapes = list()
+        shape = scan_data.scan_resolution
+        while max(shape) > self._min_size:
+            shape = tuple(-(-size // 2) for size in shape)
+            shapes.append(shape)
+        for ch, arr in scan_data.data.items():
+            self._levels[ch] = [arr] + [np.full(s, np.nan, dtype=np.float32) for s in shapes]
+
+    def _update_lines(self, start, stop):
+        for levels in self._levels.values():
+            for level in range(1, len(levels)):
+                lo = start >> level
+                hi = -(-stop // (2 ** level))
+                source = levels[level - 1][:, 2 * lo:2 * hi]
+                if level == 1 and self._valid_mask is not None:
+                    # integer channels mark missing data points in a separate mask
+                    source = np.where(self._valid_mask[:, 2 * lo:2 * hi], source, np.nan)
+                levels[level][:, lo:hi] = self._downsample(source)
+
+    @staticmethod
+    def _downsample(arr):
+        """ NaN-aware 2x2 block mean. Odd sizes are padded with NaN.
+        """
+        size_x, size_y = arr.shape
+        padded = np.full((size_x + size_x % 2, size_y + size_y % 2), np.nan, dtype=np.float32)
+        padded[:size_x, :size_y] = arr
+        blocks = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2)
+        valid = ~np.isnan(blocks)
+        counts = valid.sum(axis=(1, 3))
+        sums = np.where(valid, blocks, 0).sum(axis=(1, 3))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan).astype(np.float32)
+
+
 class ScannerChannel:
     """
     """
@@ -356,6 +356,172 @@ class PointOfInterest:
         return cls(**dict_repr)
 
 
+class DriftModel:
+    """
+    Estimates the sample drift from the ROI position history (rows of time_in_s, x, y, z) and
+    predicts the ROI position and its uncertainty at any point in time.
+
+    Available models are:
+    'kalman': constant velocity Kalman filter with white noise acceleration for each axis
+    'linear': least squares fit of a straight line to the last <history_length> ROI positions
+    """
+    # Prior standard deviation of the drift velocity (1 um/s) before the second ROI position
+    _velocity_prior_std = 1e-6
+
+    def __init__(self, model='kalman', history_length=10, process_noise=1e-22,
+                 measurement_noise=20e-9):
+        """
+        @param str model: drift model, 'kalman' or 'linear'
+        @param int history_length: number of last ROI positions used by the linear model
+        @param float process_noise: spectral density of the white noise acceleration in m^2/s^3
+        @param float measurement_noise: standard deviation of a single ROI position in m
+        """
+        if model not in ('kalman', 'linear'):
+            raise ValueError('Drift model must be either "kalman" or "linear".')
+        self._model = model
+        self._history_length = max(2, int(history_length))
+        self._process_noise = float(process_noise)
+        self._measurement_var = float(measurement_noise) ** 2
+        # State at the time of the last ROI position
+        self._time = 0.
+        self._position = np.zeros(3)
+        self._velocity = np.zeros(3)
+        # Covariance of (position, velocity) for each axis
+        self._covariance = np.zeros((3, 2, 2))
+        # Inflation of the predicted variance if the innovations exceed the expected noise
+        self._noise_scale = 1.
+        self._samples = 0
+
+    @property
+    def is_valid(self):
+        """ The drift velocity can only be estimated from at least 2 ROI positions.
+        """
+        return self._samples >= 2
+
+    @property
+    def time(self):
+        return self._time
+
+    @property
+    def velocity(self):
+        return self._velocity.copy()
+
+    def fit(self, history):
+        """ (Re-)estimates the drift from the ROI position history.
+
+        @param numpy.ndarray history: ROI positions as rows of (time_in_s, x, y, z)
+        """
+        history = np.asarray(history, dtype=float).reshape(-1, 4)
+        history = history[np.argsort(history[:, 0], kind='stable')]
+        self._samples = len(history)
+        self._velocity = np.zeros(3)
+        self._covariance = np.zeros((3, 2, 2))
+        self._noise_scale = 1.
+        if self._samples == 0:
+            self._time = 0.
+            self._position = np.zeros(3)
+        elif self._model == 'linear':
+            self._fit_linear(history[-self._history_length:])
+        else:
+            self._fit_kalman(history)
+
+    def _fit_linear(self, history):
+        times, positions = history[:, 0], history[:, 1:]
+        self._time = times[-1]
+        mean_time = times.mean()
+        mean_pos = positions.mean(axis=0)
+        dt = times - mean_time
+        s_tt = np.dot(dt, dt)
+        if s_tt <= 0:
+            self._position = mean_pos
+            self._covariance[:, 0, 0] = self._measurement_var / len(times)
+            return
+
+        slope = dt @ (positions - mean_pos) / s_tt
+        if len(times) > 2:
+            residuals = positions - mean_pos - np.outer(dt, slope)
+            var = np.maximum(np.sum(residuals ** 2, axis=0) / (len(times) - 2),
+                             self._measurement_var)
+        else:
+            var = np.full(3, self._measurement_var)
+        # The fitted line at the last ROI position and its covariance
+        last_dt = self._time - mean_time
+        self._position = mean_pos + slope * last_dt
+        self._velocity = slope
+        self._covariance[:, 0, 0] = var * (1 / len(times) + last_dt ** 2 / s_tt)
+        self._covariance[:, 0, 1] = var * last_dt / s_tt
+        self._covariance[:, 1, 0] = self._covariance[:, 0, 1]
+        self._covariance[:, 1, 1] = var / s_tt
+
+    def _fit_kalman(self, history):
+        times, positions = history[:, 0], history[:, 1:]
+        r = self._measurement_var
+        self._time = times[0]
+        # state (position, velocity) for each axis
+        state = np.stack((positions[0], np.zeros(3)), axis=1)
+        cov = np.zeros((3, 2, 2))
+        cov[:, 0, 0] = r
+        cov[:, 1, 1] = self._velocity_prior_std ** 2
+        normalized_innovations = list()
+        for t, pos in zip(times[1:], positions[1:]):
+            dt = t - self._time
+            transition = np.array(((1, dt), (0, 1)))
+            state = state @ transition.T
+            cov = transition @ cov @ transition.T + self._process_covariance(dt)
+            innovation_var = cov[:, 0, 0] + r
+            innovation = pos - state[:, 0]
+            normalized_innovations.append(innovation ** 2 / innovation_var)
+            gain = cov[:, :, 0] / innovation_var[:, None]
+            state = state + gain * innovation[:, None]
+            cov = cov - gain[:, :, None] * cov[:, None, 0, :]
+            self._time = t
+        self._position = state[:, 0]
+        self._velocity = state[:, 1]
+        self._covariance = cov
+        if normalized_innovations:
+            self._noise_scale = max(1., float(np.mean(normalized_innovations)))
+
+    def _process_covariance(self, dt):
+        return self._process_noise * np.array(((dt ** 3 / 3, dt ** 2 / 2), (dt ** 2 / 2, dt)))
+
+    def predict(self, t):
+        """ Predicts the ROI position at time(s) <t>.
+
+        @param float|numpy.ndarray t: time(s) in s, same time base as the ROI position history
+
+        @return (numpy.ndarray, numpy.ndarray): predicted ROI positions and their standard
+                                                deviations, both of shape (..., 3)
+        """
+        dt = np.asarray(t, dtype=float)[..., None] - self._time
+        position = self._position + dt * self._velocity
+        var = self._covariance[:, 0, 0] + 2 * dt * self._covariance[:, 0, 1] + \
+            dt ** 2 * self._covariance[:, 1, 1] + self._process_noise * np.abs(dt) ** 3 / 3
+        return position, np.sqrt(self._noise_scale * np.maximum(var, 0))
+
+    def time_until_deviation(self, tolerance, min_time, max_time, include_drift=False):
+        """ Time after the last ROI position until the predicted ROI position is uncertain by more
+        than <tolerance> on any axis.
+
+        @param float tolerance: max. position uncertainty in m
+        @param float min_time: lower limit of the returned time in s (> 0)
+        @param float max_time: upper limit of the returned time in s
+        @param bool include_drift: also count the predicted drift itself as deviation, i.e. if
+                                   the drift is not compensated
+
+        @return float: time in s, None if the drift can not be estimated yet
+        """
+        if not self.is_valid:
+            return None
+        times = np.geomspace(min_time, max(min_time, max_time), 100)
+        _, deviation = self.predict(self._time + times)
+        if include_drift:
+            deviation = deviation + np.abs(times[:, None] * self._velocity)
+        exceeding = np.any(deviation > tolerance, axis=1)
+        if not exceeding.any():
+            return float(times[-1])
+        return float(times[max(int(np.argmax(exceeding)) - 1, 0)])
+
+
 class PoiManagerLogic(LogicBase):
     """
     This is the Logic class for mapping and tracking bright features in the confocal scan.
@@ -366,6 +532,15 @@ class PoiManagerLogic(LogicBase):
         module.Class: 'poi_manager_logic.PoiManagerLogic'
         options:
             data_scan_axes: xy
+            drift_model: 'kalman'  # optional, 'kalman' or 'linear'
+            drift_tolerance: 100e-9  # optional, refocus if the predicted ROI position is more uncertain
+            drift_history_length: 10  # optional, ROI positions used by the linear drift model
+            drift_process_noise: 1e-22  # optional, white noise acceleration of the drift in m^2/s^3
+            drift_measurement_noise: 20e-9  # optional, uncertainty of a single refocus in m
+            min_refocus_period: 10  # optional, shortest refocus period with drift tracking in s
+            max_refocus_period: 3600  # optional, longest refocus period with drift tracking in s
+            drift_probe_mode: 'line_search'  # optional, optimize mode of refocus with drift tracking
+            drift_feed_forward: True  # optional, move the scanner with the predicted drift
         connect:
             scanning_logic: <scanning_probe_logic>
             optimize_logic: <scanning_optimize_logic>
@@ -379,6 +554,15 @@ class PoiManagerLogic(LogicBase):
 
     # config options
     _scan_axes = tuple(str(ConfigOption('data_scan_axes', default='xy', missing='info')))
+    _drift_model_type = ConfigOption('drift_model', default='kalman')
+    _drift_tolerance = ConfigOption('drift_tolerance', default=100e-9)
+    _drift_history_length = ConfigOption('drift_history_length', default=10)
+    _drift_process_noise = ConfigOption('drift_process_noise', default=1e-22)
+    _drift_measurement_noise = ConfigOption('drift_measurement_noise', default=20e-9)
+    _min_refocus_period = ConfigOption('min_refocus_period', default=10)
+    _max_refocus_period = ConfigOption('max_refocus_period', default=3600)
+    _drift_probe_mode = ConfigOption('drift_probe_mode', default='line_search')
+    _drift_feed_forward = ConfigOption('drift_feed_forward', default=True)
 
     # status vars
     _roi = StatusVar(default=RegionOfInterest())  # Notice constructor and representer further below
@@ -388,6 +572,7 @@ class PoiManagerLogic(LogicBase):
     _poi_threshold = StatusVar(default=5)
     _poi_mass_threshold = StatusVar(default=5)
     _poi_diameter = StatusVar(default=1)
+    _drift_tracking = StatusVar(default=False)
 
     # Signals for connecting modules
     sigOptimizeStateUpdated = QtCore.Signal(bool)  # is_active
@@ -398,6 +583,8 @@ class PoiManagerLogic(LogicBase):
     sigThresholdUpdated = QtCore.Signal(float)
     sigMassThresholdUpdated = QtCore.Signal(float)
     sigDiameterUpdated = QtCore.Signal(float)
+    sigDriftUpdated = QtCore.Signal(dict)  # predicted ROI origin, its uncertainty and drift velocity
+    sigBatchRefocusUpdated = QtCore.Signal(int, int, str)  # finished, total, current POI name
 
     # Internal signals
     __sigStartPeriodicRefocus = QtCore.Signal()
@@ -419,6 +606,18 @@ class PoiManagerLogic(LogicBase):
         self._update_roi_position = True
         self._position_update = dict()
         self.__poi_optimization_running = False
+
+        # drift tracking
+        self._drift_model = None
+        self._feed_forward_origin = None
+
+        # batch refocus of multiple POIs
+        self._batch_refocus_queue = list()
+        self._batch_refocus_total = 0
+        self._batch_refocus_results = dict()
+        self._batch_refocus_failed = list()
+        self._batch_update_roi_position = True
+        self.__batch_refocus_running = False
         return
 
     def on_activate(self):
@@ -428,6 +627,10 @@ class PoiManagerLogic(LogicBase):
         self.__timer.setSingleShot(False)
         self._last_refocus = 0
         self._periodic_refocus_poi = None
+        self._drift_model = DriftModel(model=self._drift_model_type,
+                                       history_length=self._drift_history_length,
+                                       process_noise=self._drift_process_noise,
+                                       measurement_noise=self._drift_measurement_noise)
 
         # Connect callback for a finished refocus
         self._optimizelogic().sigOptimizeStateChanged.connect(
@@ -449,11 +652,13 @@ class PoiManagerLogic(LogicBase):
                                  'scan_image': self.roi_scan_image,
                                  'scan_image_extent': self.roi_scan_image_extent})
         self.sigActivePoiUpdated.emit('' if self.active_poi is None else self.active_poi)
+        self._update_drift_model()
         return
 
     def on_deactivate(self):
         # Stop active processes/loops
         self.stop_periodic_refocus()
+        self.stop_batch_refocus()
 
         # Disconnect signals
         self._optimizelogic().sigOptimizeStateChanged.disconnect(self._optimisation_callback)
@@ -574,7 +779,51 @@ class PoiManagerLogic(LogicBase):
     def time_until_refocus(self):
         if not self.__timer.isActive():
             return -1
-        return max(0., self._refocus_period - (time.time() - self._last_refocus))
+        return max(0., self.current_refocus_period - (time.time() - self._last_refocus))
+
+    @property
+    def drift_tracking(self):
+        return bool(self._drift_tracking)
+
+    @drift_tracking.setter
+    def drift_tracking(self, enable):
+        self.set_drift_tracking(enable)
+
+    @property
+    def current_refocus_period(self):
+        """ The period of the periodic refocus. With drift tracking, this is the time until the
+        predicted ROI position gets more uncertain than <drift_tolerance>, limited to
+        [<min_refocus_period>, <max_refocus_period>].
+        """
+        if self._drift_tracking and self._drift_model is not None:
+            period = self._drift_model.time_until_deviation(
+                self._drift_tolerance,
+                max(1e-3, self._min_refocus_period),
+                self._max_refocus_period,
+                include_drift=not self._feeds_forward_drift
+            )
+            if period is not None:
+                return period
+        return float(self._refocus_period)
+
+    @property
+    def _feeds_forward_drift(self):
+        return bool(self._drift_tracking and self._drift_feed_forward and
+                    self._move_scanner_after_optimization)
+
+    def predict_roi_origin(self, timestamp=None):
+        """ Predicts the ROI origin from the ROI position history with the drift model.
+
+        @param datetime timestamp: optional, time to predict the ROI origin for (default: now)
+
+        @return (numpy.ndarray, numpy.ndarray): predicted ROI origin (x, y, z) and its standard
+                                                deviation
+        """
+        with self._thread_lock:
+            if timestamp is None:
+                timestamp = datetime.now()
+            roi_time = (timestamp - self._roi.creation_time).total_seconds()
+            return self._drift_model.predict(roi_time)
 
     @property
     def scanner_position(self):
@@ -824,6 +1073,7 @@ class PoiManagerLogic(LogicBase):
                                      'history': self.roi_pos_history,
                                      'scan_image': self.roi_scan_image,
                                      'scan_image_extent': self.roi_scan_image_extent})
+            self._update_drift_model()
         return
 
     @QtCore.Slot()
@@ -844,6 +1094,7 @@ class PoiManagerLogic(LogicBase):
                                          'scan_image_extent': self.roi_scan_image_extent})
             else:
                 self.sigRoiUpdated.emit({'history': self.roi_pos_history})
+            self._update_drift_model()
             return
 
     @QtCore.Slot(str)
@@ -898,6 +1149,7 @@ class PoiManagerLogic(LogicBase):
                                      'history': self.roi_pos_history,
                                      'scan_image': self.roi_scan_image,
                                      'scan_image_extent': self.roi_scan_image_extent})
+            self._update_drift_model()
             self.set_active_poi(None)
             return
 
@@ -917,11 +1169,56 @@ class PoiManagerLogic(LogicBase):
             with self._thread_lock:
                 self._refocus_period = float(period)
                 if self.__timer.isActive():
-                    self.sigOptimizeTimerUpdated.emit(True, self.refocus_period, self.time_until_refocus)
+                    self.sigOptimizeTimerUpdated.emit(True, self.current_refocus_period,
+                                                      self.time_until_refocus)
                 else:
                     self.sigOptimizeTimerUpdated.emit(False, self.refocus_period, self.refocus_period)
             return
 
+    @QtCore.Slot(bool)
+    def set_drift_tracking(self, enable):
+        """ Enables tracking of the ROI drift. The period of the periodic refocus then adapts to
+        the predicted drift and the refocus uses short optimize probes (<drift_probe_mode>).
+        Between refocus runs the scanner follows the predicted drift (if <drift_feed_forward>).
+
+        @param bool enable: Enable (True) or disable (False) drift tracking
+        """
+        with self._thread_lock:
+            self._drift_tracking = bool(enable)
+            self._feed_forward_origin = self.roi_origin
+            if self.__timer.isActive():
+                self.sigOptimizeTimerUpdated.emit(True, self.current_refocus_period,
+                                                  self.time_until_refocus)
+            return
+
+    def _update_drift_model(self):
+        """ Re-estimates the drift from the ROI position history. Call after every change of
+        the history.
+        """
+        with self._thread_lock:
+            self._drift_model.fit(self.roi_pos_history)
+            self._feed_forward_origin = self.roi_origin
+            origin, uncertainty = self.predict_roi_origin()
+            self.sigDriftUpdated.emit({'origin': origin,
+                                       'uncertainty': uncertainty,
+                                       'velocity': self._drift_model.velocity})
+
+    def _feed_forward_drift(self):
+        """ Moves the scanner along with the predicted drift of the periodically refocused POI
+        between refocus runs.
+        """
+        if not self._feeds_forward_drift or not self._drift_model.is_valid:
+            return
+        if self._optimizelogic().module_state() != 'idle' or \
+                self._scanninglogic().module_state() != 'idle':
+            return
+        origin, _ = self.predict_roi_origin()
+        if np.all(np.abs(origin - self._feed_forward_origin) < self._drift_tolerance / 2):
+            return
+        self._feed_forward_origin = origin
+        self.move_scanner(self.get_poi_position(self._periodic_refocus_poi) + origin -
+                          self.roi_origin)
+
     @QtCore.Slot(float)
     def set_poi_threshold(self, threshold):
         with self._thread_lock:
@@ -970,12 +1267,13 @@ class PoiManagerLogic(LogicBase):
                 return
             self.module_state.lock()
             self._periodic_refocus_poi = name
-            self.optimise_poi_position(name=name)
+            self.optimise_poi_position(name=name, optimize_mode=self._periodic_optimize_mode)
             self._last_refocus = time.time()
             self.__timer.timeout.connect(self._periodic_refocus_loop)
             self.__timer.start(500)
 
-            self.sigOptimizeTimerUpdated.emit(True, self.refocus_period, self.refocus_period)
+            period = self.current_refocus_period
+            self.sigOptimizeTimerUpdated.emit(True, period, period)
         return
 
     def stop_periodic_refocus(self):
@@ -1012,14 +1310,183 @@ class PoiManagerLogic(LogicBase):
         with self._thread_lock:
             if self.__timer.isActive():
                 remaining_time = self.time_until_refocus
-                self.sigOptimizeTimerUpdated.emit(True, self.refocus_period, remaining_time)
+                self.sigOptimizeTimerUpdated.emit(True, self.current_refocus_period, remaining_time)
                 if remaining_time <= 0 and self._optimizelogic().module_state() == 'idle':
-                    self.optimise_poi_position(self._periodic_refocus_poi)
+                    self.optimise_poi_position(self._periodic_refocus_poi,
+                                               optimize_mode=self._periodic_optimize_mode)
                     self._last_refocus = time.time()
+                elif self._drift_tracking:
+                    self._feed_forward_drift()
         return
 
+    @property
+    def batch_refocus_running(self):
+        return self.__batch_refocus_running
+
     @QtCore.Slot()
-    def optimise_poi_position(self, name=None, update_roi_position=True):
+    def refocus_all_pois(self, names=None, update_roi_position=True):
+        """
+        Refocuses all POIs (or the POIs <names>) one after another along a short tour through
+        the POI positions, starting next to the current scanner position.
+        All POI anchors are updated at once after the last POI. If <update_roi_position> is set,
+        the median shift of all POIs is applied as ROI shift and only the remaining shift of each
+        POI is applied to its anchor.
+        This function will return immediately. Progress is reported by sigBatchRefocusUpdated.
+
+        @param list names: optional, names of the POIs to refocus (default: all POIs)
+        @param bool update_roi_position: Flag indicating if the ROI should be shifted accordingly.
+        """
+        with self._thread_lock:
+            if names is None:
+                names = self.poi_names
+            unknown = [name for name in names if name not in self.poi_names]
+            if unknown:
+                self.log.warning(f'Skipping unknown POIs {unknown} in batch refocus.')
+            names = [name for name in names if name not in unknown]
+            if not names:
+                self.log.error('Unable to start batch refocus. No POIs to refocus.')
+                return
+            if self.module_state() != 'idle' or self._optimizelogic().module_state() != 'idle':
+                self.log.error('Unable to start batch refocus. Periodic refocus or optimization '
+                               'is still running.')
+                return
+
+            positions = np.array([self.get_poi_position(name) for name in names])
+            tour = self._poi_tour(positions, self.scanner_position)
+            self.module_state.lock()
+            self.__batch_refocus_running = True
+            self._batch_refocus_queue = [names[ii] for ii in tour]
+            self._batch_refocus_total = len(names)
+            self._batch_refocus_results = dict()
+            self._batch_refocus_failed = list()
+            self._batch_update_roi_position = bool(update_roi_position)
+            self.sigOptimizeStateUpdated.emit(True)
+            self._refocus_next_batch_poi()
+        return
+
+    @QtCore.Slot()
+    def stop_batch_refocus(self):
+        """ Stops a running batch refocus. The POIs refocused so far are updated. """
+        with self._thread_lock:
+            if not self.__batch_refocus_running:
+                return
+            self._batch_refocus_queue = list()
+            if self._optimizelogic().module_state() != 'idle':
+                self._optimizelogic().stop_optimize()
+            # Finish right away instead of in the queued _optimisation_callback, which might be
+            # disconnected before (e.g. on deactivation)
+            self._finish_batch_refocus()
+        return
+
+    def _refocus_next_batch_poi(self):
+        with self._thread_lock:
+            if not self._batch_refocus_queue:
+                self._finish_batch_refocus()
+                return
+            if self._optimizelogic().module_state() != 'idle':
+                self.log.error('Unable to continue batch refocus. OptimizeLogic module is locked.')
+                self._finish_batch_refocus()
+                return
+            name = self._batch_refocus_queue[0]
+            self.sigBatchRefocusUpdated.emit(
+                self._batch_refocus_total - len(self._batch_refocus_queue),
+                self._batch_refocus_total,
+                name
+            )
+            self._position_update = dict(zip(('x', 'y', 'z'), self.get_poi_position(name)))
+            self._scanninglogic().set_target_position(self._position_update, move_blocking=True)
+            self._optimizelogic().start_optimize(warm_start_key=name)
+
+    def _finish_batch_refocus(self):
+        """ Applies the new positions of all refocused POIs in a single ROI update. """
+        with self._thread_lock:
+            if not self.__batch_refocus_running:
+                return
+            if self._batch_refocus_failed:
+                self.log.warning(f'Batch refocus failed for POIs {self._batch_refocus_failed}. '
+                                 f'Their positions are not updated.')
+            results = self._batch_refocus_results
+            self._batch_refocus_results = dict()
+            self._batch_refocus_queue = list()
+            self.__batch_refocus_running = False
+
+            if results:
+                names = list(results)
+                shifts = np.array([results[name] - self.get_poi_position(name) for name in names])
+                if self._batch_update_roi_position:
+                    roi_shift = np.median(shifts, axis=0)
+                else:
+                    roi_shift = np.zeros(3)
+                for name, shift in zip(names, shifts):
+                    self._roi.set_poi_anchor(name, self.get_poi_anchor(name) + shift - roi_shift)
+                if np.any(roi_shift != 0):
+                    self._roi.add_history_entry(self.roi_origin + roi_shift)
+                self.sigRoiUpdated.emit({'pois': self.poi_positions,
+                                         'history': self.roi_pos_history,
+                                         'scan_image': self.roi_scan_image,
+                                         'scan_image_extent': self.roi_scan_image_extent})
+                self._update_drift_model()
+
+            self.sigBatchRefocusUpdated.emit(len(results), self._batch_refocus_total, '')
+            self.module_state.unlock()
+            self.sigOptimizeStateUpdated.emit(False)
+
+    @staticmethod
+    def _poi_tour(positions, start):
+        """ Orders positions along a short open path starting at <start>. The nearest neighbour
+        path is improved by 2-opt moves (reversing path segments) until no move shortens it.
+
+        @param numpy.ndarray positions: positions of shape (N, 3)
+        @param numpy.ndarray start: start position of the path
+
+        @return list: position indices in path order
+        """
+        positions = np.asarray(positions, dtype=float)
+        unvisited = np.ones(len(positions), dtype=bool)
+        tour = list()
+        current = np.asarray(start, dtype=float)
+        for _ in range(len(positions)):
+            dist = np.linalg.norm(positions - current, axis=1)
+            dist[~unvisited] = np.inf
+            index = int(np.argmin(dist))
+            tour.append(index)
+            unvisited[index] = False
+            current = positions[index]
+        if len(tour) < 3:
+            return tour
+
+        # path[0] is the fixed start, path[i] is position tour[i - 1]
+        tour = np.array(tour)
+        path = np.vstack((np.asarray(start, dtype=float), positions[tour]))
+        tolerance = 1e-9 * max(float(np.linalg.norm(np.ptp(path, axis=0))), 1e-300)
+        for _ in range(len(tour)):
+            improved = False
+            for i in range(1, len(path) - 1):
+                # reversing path[i:j + 1] replaces the edges (i-1, i), (j, j+1) with
+                # (i-1, j), (i, j+1). The last point has no outgoing edge.
+                ends = path[i + 1:]
+                following = path[i + 2:]
+                old_edges = np.linalg.norm(path[i - 1] - path[i]) + np.append(
+                    np.linalg.norm(ends[:-1] - following, axis=1), 0)
+                new_edges = np.linalg.norm(path[i - 1] - ends, axis=1) + np.append(
+                    np.linalg.norm(path[i] - following, axis=1), 0)
+                gain = old_edges - new_edges
+                best = int(np.argmax(gain))
+                if gain[best] > tolerance:
+                    j = i + 1 + best
+                    path[i:j + 1] = path[i:j + 1][::-1]
+                    tour[i - 1:j] = tour[i - 1:j][::-1]
+                    improved = True
+            if not improved:
+                break
+        return tour.tolist()
+
+    @property
+    def _periodic_optimize_mode(self):
+        return self._drift_probe_mode if self._drift_tracking else None
+
+    @QtCore.Slot()
+    def optimise_poi_position(self, name=None, update_roi_position=True, optimize_mode=None):
         """
         Triggers the optimisation procedure for the given poi using the optimizelogic.
         The difference between old and new position can be used to update the ROI position.
@@ -1028,6 +1495,7 @@ class PoiManagerLogic(LogicBase):
 
         @param str name: Name of the POI for which to optimise the position.
         @param bool update_roi_position: Flag indicating if the ROI should be shifted accordingly.
+        @param str optimize_mode: optional, optimize mode to use for this optimisation only
         """
         if name is None:
             if self.active_poi is None:
@@ -1044,7 +1512,12 @@ class PoiManagerLogic(LogicBase):
         with self._thread_lock:
             if self._optimizelogic().module_state() == 'idle':
                 self.__poi_optimization_running = True
-                self._optimizelogic().start_optimize()
+                # the mode only applies to this run, the optimizer settings stay untouched
+                if self._optimizelogic().start_optimize(warm_start_key=name,
+                                                        optimize_mode=optimize_mode) < 0:
+                    self.__poi_optimization_running = False
+                    self.sigOptimizeStateUpdated.emit(False)
+                    return
                 self.sigOptimizeStateUpdated.emit(True)
             else:
                 self.log.warning('Unable to start POI refocus procedure. '
@@ -1061,6 +1534,23 @@ class PoiManagerLogic(LogicBase):
         @param fit_data:
         """
         with self._thread_lock:
+            # Collect the positions of a batch refocus and continue with the next POI
+            if self.__batch_refocus_running:
+                if is_running:
+                    self._position_update.update(optimal_position)
+                else:
+                    if self._batch_refocus_queue:
+                        name = self._batch_refocus_queue.pop(0)
+                        # failed fits and aborted runs must not shift POIs or the ROI
+                        if self._optimizelogic().last_optimize_succeeded:
+                            self._batch_refocus_results[name] = np.array(
+                                [self._position_update[ax] for ax in ('x', 'y', 'z')]
+                            )
+                        else:
+                            self._batch_refocus_failed.append(name)
+                            self.log.warning(f'Refocus of POI "{name}" failed.')
+                    self._refocus_next_batch_poi()
+                return
             # If the refocus was initiated by poimanager, update POI and ROI position
             if self.__poi_optimization_running:
                 if is_running:
@@ -1229,6 +1719,7 @@ class PoiManagerLogic(LogicBase):
                                  'history': self.roi_pos_history,
                                  'scan_image': self.roi_scan_image,
                                  'scan_image_extent': self.roi_scan_image_extent})
+        self._update_drift_model()
         self.set_active_poi(None if len(poi_names) == 0 else poi_names[0])
         return
 
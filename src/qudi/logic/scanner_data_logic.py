@@ -20,17 +20,24 @@ You should have received a copy of the GNU Lesser General Public License along w
 If not, see <https://www.gnu.org/licenses/>.
 """
 
-__all__ = ['ScannerDataLogic']
+__all__ = ['ScannerDataLogic', 'ScanHistoryEntry', 'save_scan_data_file', 'load_scan_data_file',
+           'load_scan_file_metadata', 'render_scan_thumbnail', 'write_png']
 
+import os
+import json
 import time
 import copy
+import uuid
+import zlib
+import struct
 import datetime
 import numpy as np
-from functools import reduce
+from functools import reduce, lru_cache
+from concurrent.futures import ThreadPoolExecutor
 import operator
 
 import matplotlib as mpl
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from PySide2 import QtCore
 
 from qudi.core.module import LogicBase
@@ -40,20 +47,339 @@ from qudi.core.configoption import ConfigOption
 from qudi.core.statusvariable import StatusVar
 from qudi.util.datastorage import ImageFormat, NpyDataStorage, TextDataStorage
 from qudi.util.units import ScaledFloat
+from qudi.util.paths import get_default_data_dir
 
-from qudi.interface.scanning_probe_interface import ScanData
+from qudi.interface.scanner_interface import ScanData
+
+
+def save_scan_data_file(file_path, scan_data, metadata=None, retrace_data=None, thumbnail_size=64):
+    """ Writes all channels, position feedback and metadata of a scan to a single binary
+    container file (numpy .npz archive) in one pass.
+
+    The archive contains the JSON encoded ScanData metadata ("scan_data"), optional user metadata
+    ("metadata"), the channel data ("data_<i>"), position feedback ("position_<i>"), optional
+    retrace data ("retrace_<i>") and a small float32 preview image of the first channel
+    ("thumbnail").
+
+    @param str file_path: path of the file to write. The ".npz" suffix is appended if missing.
+    @param ScanData scan_data: the scan data to save
+    @param dict metadata: optional, additional JSON serializable metadata
+    @param dict retrace_data: optional, retrace (backwards) data arrays per channel
+    @param int thumbnail_size: optional, maximum size (per dimension) of the preview image
+
+    @return str: path of the written file
+    """
+    if not file_path.endswith('.npz'):
+        file_path = file_path + '.npz'
+    scan_dict = scan_data.to_dict(include_data=False)
+    target = scan_data.scanner_target_at_start
+    scan_dict['scanner_target_at_start'] = None if target is None else {
+        ax: float(pos) for ax, pos in target.items()
+    }
+
+    arrays = dict()
+    if scan_data.data is not None:
+        arrays.update({f'data_{i:d}': scan_data.data[ch] for i, ch in
+                       enumerate(scan_data.channels)})
+        if scan_data.uses_valid_mask:
+            arrays['valid_mask'] = scan_data.valid_mask
+        image = scan_data.get_float_data(scan_data.channels[0])
+        steps = tuple(max(1, -(-size // thumbnail_size)) for size in image.shape[:2])
+        arrays['thumbnail'] = np.asarray(image[tuple(slice(None, None, step) for step in steps)],
+                                         dtype=np.float32)
+    else:
+        arrays['thumbnail'] = np.empty(0, dtype=np.float32)
+    if scan_data.position_data is not None:
+        scan_dict['position_axes'] = tuple(scan_data.position_data)
+        arrays.update({f'position_{i:d}': arr for i, arr in
+                       enumerate(scan_data.position_data.values())})
+    if retrace_data is not None:
+        scan_dict['retrace_channels'] = tuple(retrace_data)
+        arrays.update({f'retrace_{i:d}': np.asarray(arr) for i, arr in
+                       enumerate(retrace_data.values())})
+
+    # numpy scalars (e.g. resolution) are not JSON serializable by default. Fall back to str for
+    # any other object.
+    def encode(obj):
+        return obj.item() if isinstance(obj, np.generic) else str(obj)
+
+    np.savez(file_path,
+             scan_data=json.dumps(scan_dict, default=encode),
+             metadata=json.dumps(dict() if metadata is None else metadata, default=encode),
+             **arrays)
+    return file_path
+
+
+def load_scan_data_file(file_path, include_retrace=False):
+    """ Rebuilds the ScanData from a file written by save_scan_data_file.
+
+    @param str file_path: path of the file to read
+    @param bool include_retrace: optional, also return the retrace data (None if not saved)
+
+    @return ScanData|(ScanData, dict): the stored scan data (and retrace data)
+    """
+    with np.load(file_path) as file:
+        dict_repr = json.loads(str(file['scan_data']))
+        channels = [ch['name'] for ch in dict_repr['channels']]
+        if 'data_0' in file.files:
+            dict_repr['data'] = {ch: file[f'data_{i:d}'] for i, ch in enumerate(channels)}
+        if 'valid_mask' in file.files:
+            dict_repr['valid_mask'] = file['valid_mask']
+        if 'position_axes' in dict_repr:
+            dict_repr['position_data'] = {ax: file[f'position_{i:d}'] for i, ax in
+                                          enumerate(dict_repr.pop('position_axes'))}
+        retrace_data = None
+        if 'retrace_channels' in dict_repr:
+            retrace_channels = dict_repr.pop('retrace_channels')
+            if include_retrace:
+                retrace_data = {ch: file[f'retrace_{i:d}'] for i, ch in enumerate(retrace_channels)}
+    target = dict_repr.pop('scanner_target_at_start', None)
+    scan_data = ScanData.from_dict(dict_repr)
+    scan_data.scanner_target_at_start = target
+    if include_retrace:
+        return scan_data, retrace_data
+    return scan_data
+
+
+def load_scan_file_metadata(file_path):
+    """ Reads only the additional metadata from a file written by save_scan_data_file.
+
+    @param str file_path: path of the file to read
+
+    @return dict: the additional metadata
+    """
+    with np.load(file_path) as file:
+        return json.loads(str(file['metadata']))
+
+
+@lru_cache(maxsize=8)
+def _colormap_lut(cmap_name='inferno', size=256):
+    """ Cached RGB lookup table (size x 3, uint8) of a matplotlib colormap.
+    """
+    try:
+        cmap = mpl.colormaps[cmap_name]
+    except AttributeError:
+        # matplotlib < 3.5
+        cmap = mpl.cm.get_cmap(cmap_name)
+    lut = cmap(np.linspace(0, 1, size))[:, :3]
+    return np.round(lut * 255).astype(np.uint8)
+
+
+def render_scan_thumbnail(data, color_range=None, cmap_name='inferno', max_size=512,
+                          line_height=128):
+    """ Lightweight thumbnail renderer without matplotlib figures.
+    2D images are mapped through a cached colormap lookup table, oriented like the full figure
+    (first axis horizontal, second axis vertical pointing upwards). 1D data is rasterized as a
+    simple line plot.
+
+    @param numpy.ndarray data: 1D or 2D scan data of a single channel
+    @param tuple color_range: optional, (min, max) of the color (2D) or value (1D) scale.
+                              Defaults to the data range.
+    @param str cmap_name: optional, name of the matplotlib colormap
+    @param int max_size: optional, maximum image size per dimension (data is decimated)
+    @param int line_height: optional, image height in pixels for 1D data
+
+    @return numpy.ndarray: RGB image (rows, columns, 3) of dtype uint8
+    """
+    data = np.asarray(data)
+    steps = tuple(max(1, -(-size // max_size)) for size in data.shape)
+    data = data[tuple(slice(None, None, step) for step in steps)]
+    valid = ~np.isnan(data)
+    if color_range is None:
+        color_range = (np.min(data[valid]), np.max(data[valid])) if np.any(valid) else (0, 1)
+    vmin, vmax = color_range
+    scale = 1 / (vmax - vmin) if vmax != vmin else 0
+    normalized = np.clip((np.where(valid, data, vmin) - vmin) * scale, 0, 1)
+
+    if data.ndim == 1:
+        image = np.full((line_height, data.size, 3), 255, dtype=np.uint8)
+        rows = np.round((1 - normalized) * (line_height - 1)).astype(np.intp)
+        # connect neighbouring points by filling the row span between them in each column
+        lower = np.minimum(rows, np.concatenate((rows[1:], rows[-1:])))
+        upper = np.maximum(rows, np.concatenate((rows[1:], rows[-1:])))
+        row_index = np.arange(line_height)[:, np.newaxis]
+        mask = (row_index >= lower) & (row_index <= upper) & valid
+        image[mask] = _colormap_lut(cmap_name)[64]
+        return image
+
+    lut = _colormap_lut(cmap_name)
+    indices = np.round(normalized * (lut.shape[0] - 1)).astype(np.intp)
+    image = lut[indices.T[::-1]]
+    image[~valid.T[::-1]] = 0
+    return image
+
+
+def write_png(file_path, image):
+    """ Writes an RGB uint8 image (rows, columns, 3) to a PNG file using only zlib.
+
+    @param str file_path: path of the file to write. The ".png" suffix is appended if missing.
+    @param numpy.ndarray image: RGB image of dtype uint8
+
+    @return str: path of the written file
+    """
+    if not file_path.endswith('.png'):
+        file_path = file_path + '.png'
+    height, width = image.shape[:2]
+    # each row starts with filter type 0 (None)
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(tag, payload):
+        return struct.pack('>I', len(payload)) + tag + payload + \
+               struct.pack('>I', zlib.crc32(tag + payload) & 0xffffffff)
+
+    with open(file_path, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        file.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        file.write(chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)))
+        file.write(chunk(b'IEND', b''))
+    return file_path
+
+
+class ScanHistoryEntry:
+    """ Lightweight in-memory representation of a scan history entry.
+    The full ScanData is stored in a binary file (.npz) and only loaded on demand. The thumbnail
+    image is read from the same file on first access.
+    """
+
+    _thumbnail_size = 64
+
+    def __init__(self, file_path, scan_axes, scan_range, scan_resolution, scan_frequency,
+                 timestamp=None, target_at_start=None, channels=None):
+        self.file_path = file_path
+        self.scan_axes = tuple(scan_axes)
+        self.scan_range = tuple(tuple(rng) for rng in scan_range)
+        self.scan_resolution = tuple(int(res) for res in scan_resolution)
+        self.scan_frequency = float(scan_frequency)
+        self.timestamp = timestamp
+        self.target_at_start = None if target_at_start is None else dict(target_at_start)
+        self.channels = None if channels is None else tuple(channels)
+        self._thumbnail = None
+
+    def matches(self, scan_axes=None, start_time=None, stop_time=None, roi=None):
+        """ Checks the entry metadata against query criteria. Omitted criteria always match.
+
+        @param tuple scan_axes: optional, scan axes names of the entry
+        @param float start_time: optional, earliest POSIX timestamp of the scan
+        @param float stop_time: optional, latest POSIX timestamp of the scan
+        @param dict roi: optional, (min, max) ranges (values) per axis (keys). The scan range of
+                         scan axes must overlap the ROI, all other axes must have been positioned
+                         within the ROI at the start of the scan.
+
+        @return bool: entry matches all criteria
+        """
+        if scan_axes is not None and tuple(scan_axes) != self.scan_axes:
+            return False
+        if start_time is not None and (self.timestamp is None or self.timestamp < start_time):
+            return False
+        if stop_time is not None and (self.timestamp is None or self.timestamp > stop_time):
+            return False
+        if roi:
+            for axis, (roi_min, roi_max) in roi.items():
+                if axis in self.scan_axes:
+                    scan_min, scan_max = sorted(self.scan_range[self.scan_axes.index(axis)])
+                    if scan_max < min(roi_min, roi_max) or scan_min > max(roi_min, roi_max):
+                        return False
+                elif self.target_at_start is not None and axis in self.target_at_start:
+                    if not min(roi_min, roi_max) <= self.target_at_start[axis] <= max(roi_min,
+                                                                                     roi_max):
+                        return False
+                else:
+                    return False
+        return True
+
+    @property
+    def scan_dimension(self):
+        return len(self.scan_axes)
+
+    @property
+    def thumbnail(self):
+        """ Downsampled image (first channel) of the scan, loaded lazily from file.
+        """
+        if self._thumbnail is None:
+            with np.load(self.file_path) as file:
+                self._thumbnail = file['thumbnail']
+        return self._thumbnail
+
+    def to_dict(self):
+        return {'file_path': self.file_path,
+                'scan_axes': self.scan_axes,
+                'scan_range': self.scan_range,
+                'scan_resolution': self.scan_resolution,
+                'scan_frequency': self.scan_frequency,
+                'timestamp': self.timestamp,
+                'target_at_start': self.target_at_start,
+                'channels': self.channels}
+
+    @classmethod
+    def from_dict(cls, dict_repr):
+        return cls(**dict_repr)
+
+    @property
+    def datetime(self):
+        return None if self.timestamp is None else datetime.datetime.fromtimestamp(self.timestamp)
+
+    @classmethod
+    def from_scan_data(cls, scan_data, directory):
+        """ Writes the scan data to a new file in directory and creates the corresponding entry.
+
+        @param ScanData scan_data: the scan data to store
+        @param str directory: directory to create the history file in
+
+        @return ScanHistoryEntry: the new history entry
+        """
+        stamp = scan_data._timestamp if scan_data._timestamp is not None else datetime.datetime.now()
+        file_name = '{0}_{1}_{2}.npz'.format(stamp.strftime('%Y%m%d-%H%M-%S'),
+                                             ''.join(scan_data.scan_axes),
+                                             uuid.uuid4().hex[:8])
+        file_path = save_scan_data_file(os.path.join(directory, file_name),
+                                        scan_data,
+                                        thumbnail_size=cls._thumbnail_size)
+        return cls(file_path=file_path,
+                   scan_axes=scan_data.scan_axes,
+                   scan_range=scan_data.scan_range,
+                   scan_resolution=scan_data.scan_resolution,
+                   scan_frequency=scan_data.scan_frequency,
+                   timestamp=stamp.timestamp(),
+                   target_at_start=None if scan_data.scanner_target_at_start is None else {
+                       ax: float(pos) for ax, pos in scan_data.scanner_target_at_start.items()
+                   },
+                   channels=scan_data.channels)
+
+    def load(self):
+        """ Loads the full scan data from file.
+
+        @return ScanData: the stored scan data
+        """
+        return load_scan_data_file(self.file_path)
+
+    def remove(self):
+        """ Deletes the history file of this entry.
+        """
+        try:
+            os.remove(self.file_path)
+        except FileNotFoundError:
+            pass
 
 
 class ScannerDataLogic(LogicBase):
     """
     Todo: add some info about this module
+
+    The scan history is persisted as one binary file per scan in <history_dir>. Only lightweight
+    metadata of each scan is kept in memory and saved in the status variables; the full data is
+    loaded lazily when it is restored from history.
     
     Example config:
     
     scanning_data_logic:
         module.Class: 'scanning_data_logic.ScanningDataLogic'
         options:
-            max_history_length: 50
+            max_history_length: 500
+            history_dir: 'C:\\Data\\scan_history'  # optional, default: <default data dir>/scan_history
+            save_file_format: 'binary'  # optional, 'binary' (single file per scan) or 'text'
+            save_thumbnails: True  # optional
+            thumbnail_renderer: 'lut'  # optional, 'lut' (fast PNG) or 'figure' (full matplotlib figure)
         connect:
             scan_logic: scanning_probe_logic
     
@@ -63,7 +389,15 @@ class ScannerDataLogic(LogicBase):
     _scan_logic = Connector(name='scan_logic', interface='ScannerLogic')
 
     # config options
-    _max_history_length = ConfigOption(name='max_history_length', default=10)
+    _max_history_length = ConfigOption(name='max_history_length', default=200)
+    _history_dir = ConfigOption(name='history_dir', default=None)
+    _save_file_format = ConfigOption(name='save_file_format',
+                                     default='binary',
+                                     checker=lambda x: x in ('binary', 'text'))
+    _save_thumbnails = ConfigOption(name='save_thumbnails', default=True)
+    _thumbnail_renderer = ConfigOption(name='thumbnail_renderer',
+                                       default='lut',
+                                       checker=lambda x: x in ('lut', 'figure'))
 
     # status variables
     _scan_history = StatusVar(name='scan_history', default=list())
@@ -80,18 +414,21 @@ class ScannerDataLogic(LogicBase):
         self._curr_history_index = 0
         self._curr_data_per_scan = dict()
         self._logic_id = None
+        self._thumbnail_executor = None
         return
 
     def on_activate(self):
         """ Initialisation performed during activation of the module.
         """
+        os.makedirs(self._history_directory, exist_ok=True)
         self._shrink_history()
+        # Scan data is loaded lazily from the history files
+        self._curr_data_per_scan = dict()
         if self._scan_history:
-            self._curr_data_per_scan = {sd.scan_axes: sd for sd in self._scan_history}
             self.restore_from_history(-1)
         else:
             self._curr_history_index = 0
-            self._curr_data_per_scan = dict()
+        self._thumbnail_executor = ThreadPoolExecutor(max_workers=1)
         self._logic_id = self._scan_logic().module_uuid
         self._scan_logic().sigScanStateChanged.connect(self._update_scan_state)
 
@@ -100,14 +437,46 @@ class ScannerDataLogic(LogicBase):
         """
         self._scan_logic().sigScanStateChanged.disconnect(self._update_scan_state)
         self._curr_data_per_scan = dict()
+        # wait for pending thumbnails to be written
+        self._thumbnail_executor.shutdown(wait=True)
+        self._thumbnail_executor = None
 
     @_scan_history.representer
     def __scan_history_to_dicts(self, history):
-        return [data.to_dict() for data in history]
+        return [entry.to_dict() for entry in history]
 
     @_scan_history.constructor
     def __scan_history_from_dicts(self, history_dicts):
-        return [ScanData.from_dict(hist_dict) for hist_dict in history_dicts]
+        history = list()
+        for hist_dict in history_dicts:
+            try:
+                if 'file_path' in hist_dict:
+                    entry = ScanHistoryEntry.from_dict(hist_dict)
+                    if os.path.isfile(entry.file_path):
+                        history.append(entry)
+                else:
+                    # Legacy status variable containing the full scan data. Move it to a file.
+                    os.makedirs(self._history_directory, exist_ok=True)
+                    history.append(ScanHistoryEntry.from_scan_data(ScanData.from_dict(hist_dict),
+                                                                   self._history_directory))
+            except:
+                self.log.exception('Unable to restore scan history entry:')
+        return history
+
+    @property
+    def _history_directory(self):
+        if self._history_dir:
+            return self._history_dir
+        return os.path.join(get_default_data_dir(), 'scan_history')
+
+    @property
+    def history_entries(self):
+        """ Lightweight metadata entries of all scans in history (oldest first).
+
+        @return tuple: ScanHistoryEntry instances
+        """
+        with self._thread_lock:
+            return tuple(self._scan_history)
 
     def get_current_scan_data(self, scan_axes=None):
         """
@@ -121,6 +490,16 @@ class ScannerDataLogic(LogicBase):
                     scan_axes = self._scan_history[-1].scan_axes
                 except IndexError:
                     return None
+            if scan_axes not in self._curr_data_per_scan:
+                # lazy load the most recent scan with these axes from history
+                for entry in reversed(self._scan_history):
+                    if entry.scan_axes == scan_axes:
+                        try:
+                            self._curr_data_per_scan[scan_axes] = entry.load()
+                        except:
+                            self.log.exception(f'Unable to load scan history file '
+                                               f'"{entry.file_path}":')
+                        break
             return self._curr_data_per_scan.get(scan_axes, None)
 
     def get_current_scan_id(self, scan_axes=None):
@@ -140,14 +519,19 @@ class ScannerDataLogic(LogicBase):
             if np.isnan(ret_id):
                 return np.nan
 
-            assert self._scan_history[ret_id] == self.get_current_scan_data(scan_axes)
             return self._abs_index(ret_id)
 
     def get_all_current_scan_data(self):
         with self._thread_lock:
-            return list(self._curr_data_per_scan.copy().values())
-
-    def history_previous(self):
+            all_axes = list(dict.fromkeys(entry.scan_axes for entry in self._scan_history))
+            all_axes.extend(ax for ax in self._curr_data_per_scan if ax not in all_axes)
+            all_data = (self.get_current_scan_data(axes) for axes in all_axes)
+            return [data for data in all_data if data is not None]
+
+    def history_previous(self, steps=1):
+        """ Restores the history entry <steps> entries before the current one. Intermediate
+        entries are skipped, i.e. only a single restore is performed.
+        """
         with self._thread_lock:
             if self._curr_history_index < 1:
                 self.log.warning('Unable to restore previous state from scan history. '
@@ -155,16 +539,98 @@ class ScannerDataLogic(LogicBase):
                 return
 
             #self.log.debug(f"Hist_prev called, index {self._curr_history_index - 1}")
-            return self.restore_from_history(self._curr_history_index - 1)
+            return self.restore_from_history(max(0, self._curr_history_index - int(steps)))
 
-    def history_next(self):
+    def history_next(self, steps=1):
+        """ Restores the history entry <steps> entries after the current one. Intermediate
+        entries are skipped, i.e. only a single restore is performed.
+        """
         with self._thread_lock:
             if self._curr_history_index >= len(self._scan_history) - 1:
                 self.log.warning('Unable to restore next state from scan history. '
                                  'Already at latest history entry.')
                 return
             #self.log.debug(f"Hist_prev called, index {self._curr_history_index + 1}")
-            return self.restore_from_history(self._curr_history_index + 1)
+            return self.restore_from_history(min(len(self._scan_history) - 1,
+                                                 self._curr_history_index + int(steps)))
+
+    def query_history(self, scan_axes=None, start_time=None, stop_time=None, roi=None):
+        """ Query the scan history by metadata only. No scan data is loaded.
+
+        @param tuple scan_axes: optional, scan axes names
+        @param start_time: optional, earliest scan start (datetime.datetime or POSIX timestamp)
+        @param stop_time: optional, latest scan start (datetime.datetime or POSIX timestamp)
+        @param dict roi: optional, (min, max) ranges (values) per axis (keys), see
+                         ScanHistoryEntry.matches
+
+        @return list: (history index, ScanHistoryEntry) tuples of all matching entries
+        """
+        if isinstance(start_time, datetime.datetime):
+            start_time = start_time.timestamp()
+        if isinstance(stop_time, datetime.datetime):
+            stop_time = stop_time.timestamp()
+        with self._thread_lock:
+            return [(index, entry) for index, entry in enumerate(self._scan_history) if
+                    entry.matches(scan_axes, start_time, stop_time, roi)]
+
+    def get_history_entry(self, index):
+        """ Metadata of a history entry without loading the scan data.
+
+        @param int index: history index (negative values count from the latest entry)
+
+        @return ScanHistoryEntry: the history entry
+        """
+        with self._thread_lock:
+            return self._scan_history[self._abs_index(index)]
+
+    def load_history_data(self, index):
+        """ Loads the scan data of a history entry without restoring it, i.e. neither the scan
+        settings are changed nor is any signal emitted.
+
+        @param int index: history index (negative values count from the latest entry)
+
+        @return ScanData: frozen snapshot of the stored scan data
+        """
+        with self._thread_lock:
+            entry = self._scan_history[self._abs_index(index)]
+        return entry.load().snapshot()
+
+    def compare_history(self, index_a, index_b, mode='difference', channels=None):
+        """ Computes difference (a - b) or ratio (a / b) images between two history entries
+        with identical scan axes and resolution, e.g. to check for drift.
+
+        @param int index_a: history index of the first scan
+        @param int index_b: history index of the second scan
+        @param str mode: optional, 'difference' or 'ratio'
+        @param iterable channels: optional, channel names to compare. Defaults to all channels.
+
+        @return ScanData: comparison data (float64) with the scan settings of the first scan
+        """
+        if mode not in ('difference', 'ratio'):
+            raise ValueError('Comparison mode must be either "difference" or "ratio".')
+        data_a = self.load_history_data(index_a)
+        data_b = self.load_history_data(index_b)
+        if data_a.scan_axes != data_b.scan_axes or \
+                data_a.scan_resolution != data_b.scan_resolution:
+            raise ValueError('Unable to compare scans with different scan axes or resolution.')
+        if not np.allclose(data_a.scan_range, data_b.scan_range):
+            self.log.warning('Comparing history entries with different scan ranges.')
+        if data_a.data is None or data_b.data is None:
+            raise ValueError('Unable to compare history entries without data.')
+        if channels is None:
+            channels = [ch for ch in data_a.channels if ch in data_b.channels]
+
+        result = data_a.empty_copy(channel_dtype=np.float64)
+        result.new_scan(timestamp=data_a._timestamp)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for ch in channels:
+                values_a = data_a.get_float_data(ch)
+                values_b = data_b.get_float_data(ch)
+                if mode == 'difference':
+                    result.data[ch][...] = values_a - values_b
+                else:
+                    result.data[ch][...] = np.where(values_b != 0, values_a / values_b, np.nan)
+        return result.snapshot()
 
     def restore_from_history(self, index):
         with self._thread_lock:
@@ -175,10 +641,13 @@ class ScannerDataLogic(LogicBase):
             index = self._abs_index(index)
 
             try:
-                data = self._scan_history[index]
+                data = self._scan_history[index].load()
             except IndexError:
                 self.log.exception('Unable to restore scan history with index "{0}"'.format(index))
                 return
+            except:
+                self.log.exception('Unable to load scan history file with index "{0}"'.format(index))
+                return
 
             settings = {
                 'range': {ax: data.scan_range[i] for i, ax in enumerate(data.scan_axes)},
@@ -205,15 +674,20 @@ class ScannerDataLogic(LogicBase):
         with self._thread_lock:
             if not running and caller_id is self._logic_id:
                 #self.log.debug(f"Adding to data history with settings {settings}")
-                self._scan_history.append(data)
+                try:
+                    self._scan_history.append(
+                        ScanHistoryEntry.from_scan_data(data, self._history_directory)
+                    )
+                except:
+                    self.log.exception('Unable to write scan history file:')
                 self._shrink_history()
-                self._curr_data_per_scan[data.scan_axes] = data
+                self._curr_data_per_scan[data.scan_axes] = data.snapshot()
                 self._curr_history_index = len(self._scan_history) - 1
                 self.sigHistoryScanDataRestored.emit(data)
 
     def _shrink_history(self):
         while len(self._scan_history) > self._max_history_length:
-            self._scan_history.pop(0)
+            self._scan_history.pop(0).remove()
 
     def _abs_index(self, index):
         if index < 0:
@@ -221,14 +695,19 @@ class ScannerDataLogic(LogicBase):
 
         return index
 
-    def draw_1d_scan_figure(self, scan_data, channel):
+    def draw_1d_scan_figure(self, scan_data, channel, scanner_pos=None):
         """ Create an XY plot of 1D scan data.
 
+        @param ScanData scan_data: the scan data to plot
+        @param str channel: the channel to plot
+        @param dict scanner_pos: optional, scanner target to mark. Defaults to the current target.
+
         @return fig: a matplotlib figure object to be saved to file.
         """
         data = scan_data.data[channel]
         axis = scan_data.scan_axes[0]
-        scanner_pos = self._scan_logic().scanner_target
+        if scanner_pos is None:
+            scanner_pos = self._scan_logic().scanner_target
 
         # Scale axes and data
         scan_range_x = (scan_data.scan_range[0][0], scan_data.scan_range[0][1])
@@ -237,8 +716,9 @@ class ScannerDataLogic(LogicBase):
         si_prefix_data = ScaledFloat(np.nanmax(data)-np.nanmin(data)).scale
         si_factor_data = ScaledFloat(np.nanmax(data)-np.nanmin(data)).scale_val
 
-        # Create figure
-        fig, ax = plt.subplots()
+        # Create figure. Not using pyplot, since this may run in the thumbnail worker thread.
+        fig = Figure()
+        ax = fig.add_subplot()
 
         # Create image plot
         x_axis = np.linspace(scan_data.scan_range[0][0],
@@ -281,7 +761,24 @@ class ScannerDataLogic(LogicBase):
                         arrowprops={'facecolor': '#17becf', 'shrink': 0.05})
         return fig
 
-    def save_scan(self, scan_data, color_range=None):
+    def save_scan(self, scan_data, color_range=None, retrace_data=None, save_thumbnails=None,
+                  thumbnail_renderer=None):
+        """ Saves the scan data to file.
+
+        In "binary" save_file_format, all channels, position feedback, metadata and the optional
+        retrace data are written in one pass to a single container file (see save_scan_data_file).
+        In "text" format, one text file per channel is written.
+        Thumbnails are rendered in a background thread after the data has been written.
+
+        @param ScanData scan_data: the scan data to save
+        @param tuple color_range: optional, color bar range of the 2D thumbnails
+        @param dict retrace_data: optional, retrace data arrays per channel (binary format only)
+        @param bool save_thumbnails: optional, render thumbnails. Defaults to ConfigOption
+                                     "save_thumbnails".
+        @param str thumbnail_renderer: optional, 'lut' for fast colormapped PNG images or 'figure'
+                                       for full matplotlib figures. Defaults to ConfigOption
+                                       "thumbnail_renderer".
+        """
         with self._thread_lock:
             if self.module_state() != 'idle':
                 self.log.error('Unable to save 2D scan. Saving still in progress...')
@@ -290,93 +787,180 @@ class ScannerDataLogic(LogicBase):
             if scan_data is None:
                 raise ValueError('Unable to save 2D scan. No data available.')
 
+            if save_thumbnails is None:
+                save_thumbnails = self._save_thumbnails
+            if thumbnail_renderer is None:
+                thumbnail_renderer = self._thumbnail_renderer
+            # frozen snapshot, so the background thumbnail rendering sees consistent data
+            scan_data = scan_data.snapshot()
+
             self.sigSaveStateChanged.emit(True)
             self.module_state.lock()
             try:
-                ds = TextDataStorage(root_dir=self.module_default_data_dir)
                 timestamp = datetime.datetime.now()
-
-                # ToDo: Add meaningful metadata if missing:
-                parameters = {}
-                for range, resolution, unit, axis in zip(scan_data.scan_range,
-                                      scan_data.scan_resolution,
-                                      scan_data.axes_units.values(),
-                                      scan_data.scan_axes):
-
-                    parameters[f"{axis} axis name"] = axis
-                    parameters[f"{axis} axis unit"] = unit
-                    parameters[f"{axis} scan range"] = range
-                    parameters[f"{axis} axis resolution"] = resolution
-                    parameters[f"{axis} axis min"] = range[0]
-                    parameters[f"{axis} axis max"] = range[1]
-
-                parameters["pixel frequency"] = scan_data.scan_frequency
-                parameters[f"scanner target at start"] = scan_data.scanner_target_at_start
-                parameters['measurement start'] = str(scan_data._timestamp)
-
-                # add meta data for axes in full target, but not scan axes
-                if scan_data.scanner_target_at_start:
-                    for new_ax in scan_data.scanner_target_at_start.keys():
-                        if new_ax not in scan_data.scan_axes:
-                            ax_info = self._scan_logic().scanner_constraints.axes[new_ax]
-                            ax_name = ax_info.name
-                            ax_unit = ax_info.unit
-                            parameters[f"{new_ax} axis name"] = ax_name
-                            parameters[f"{new_ax} axis unit"] = ax_unit
-
-                # Save data and thumbnail to file
-                for channel, data in scan_data.data.items():
-                    # data
-                    # nametag = '{0}_{1}{2}_image_scan'.format(channel, *scan_data.scan_axes)
-                    tag = self.create_tag_from_scan_data(scan_data, channel)
-                    file_path, _, _ = ds.save_data(data,
-                                                   metadata=parameters,
-                                                   nametag=tag,
-                                                   timestamp=timestamp,
-                                                   column_headers='Image (columns is X, rows is Y)')
-                    # thumbnail
-                    if len(scan_data.scan_axes) == 1:
-                        figure = self.draw_1d_scan_figure(scan_data, channel)
-                        ds.save_thumbnail(figure, file_path=file_path.rsplit('.', 1)[0])
-                    elif len(scan_data.scan_axes) == 2:
-                        figure = self.draw_2d_scan_figure(scan_data, channel, cbar_range=color_range)
-                        ds.save_thumbnail(figure, file_path=file_path.rsplit('.', 1)[0])
+                parameters = self._get_scan_metadata(scan_data)
+
+                thumbnail_paths = dict()
+                if self._save_file_format == 'binary':
+                    data_dir = self.module_default_data_dir
+                    os.makedirs(data_dir, exist_ok=True)
+                    tag = self.create_tag_from_scan_data(scan_data)
+                    file_path = os.path.join(
+                        data_dir, '{0}_{1}'.format(timestamp.strftime('%Y%m%d-%H%M-%S'), tag)
+                    )
+                    file_path = save_scan_data_file(file_path,
+                                                    scan_data,
+                                                    metadata=parameters,
+                                                    retrace_data=retrace_data)
+                    thumbnail_paths = {ch: '{0}_{1}'.format(file_path.rsplit('.', 1)[0], ch)
+                                       for ch in scan_data.channels}
+                else:
+                    if retrace_data is not None:
+                        self.log.warning('Retrace data is only saved in binary save_file_format.')
+                    if scan_data.scan_dimension == 3:
+                        # volumes can not be represented as text columns
+                        ds = NpyDataStorage(root_dir=self.module_default_data_dir)
                     else:
+                        ds = TextDataStorage(root_dir=self.module_default_data_dir)
+                    for channel, data in scan_data.data.items():
+                        # nametag = '{0}_{1}{2}_image_scan'.format(channel, *scan_data.scan_axes)
+                        tag = self.create_tag_from_scan_data(scan_data, channel)
+                        if scan_data.scan_dimension == 3:
+                            column_headers = 'Volume (axis 0 is X, axis 1 is Y, axis 2 is Z)'
+                        else:
+                            column_headers = 'Image (columns is X, rows is Y)'
+                        file_path, _, _ = ds.save_data(data,
+                                                       metadata=parameters,
+                                                       nametag=tag,
+                                                       timestamp=timestamp,
+                                                       column_headers=column_headers)
+                        thumbnail_paths[channel] = file_path.rsplit('.', 1)[0]
+
+                if save_thumbnails:
+                    if scan_data.scan_dimension > 2:
                         self.log.warning('No figure saved for data with more than 2 dimensions.')
-
+                    else:
+                        # The worker thread must not access the scan logic. Annotate the target
+                        # at the time of saving.
+                        full_figure = thumbnail_renderer == 'figure'
+                        scanner_pos = axes_units = None
+                        if full_figure:
+                            scanner_pos = self._scan_logic().scanner_target
+                            axes_units = {ax: axis.unit for ax, axis in
+                                          self._scan_logic().scanner_constraints.axes.items()}
+                        self._thumbnail_executor.submit(self._save_thumbnails_to_file,
+                                                        scan_data,
+                                                        thumbnail_paths,
+                                                        color_range,
+                                                        full_figure,
+                                                        scanner_pos,
+                                                        axes_units)
             finally:
                 self.module_state.unlock()
                 self.sigSaveStateChanged.emit(False)
             return
 
+    def _get_scan_metadata(self, scan_data):
+        # ToDo: Add meaningful metadata if missing:
+        parameters = {}
+        for range, resolution, unit, axis in zip(scan_data.scan_range,
+                              scan_data.scan_resolution,
+                              scan_data.axes_units.values(),
+                              scan_data.scan_axes):
+
+            parameters[f"{axis} axis name"] = axis
+            parameters[f"{axis} axis unit"] = unit
+            parameters[f"{axis} scan range"] = range
+            parameters[f"{axis} axis resolution"] = resolution
+            parameters[f"{axis} axis min"] = range[0]
+            parameters[f"{axis} axis max"] = range[1]
+
+        parameters["pixel frequency"] = scan_data.scan_frequency
+        parameters[f"scanner target at start"] = scan_data.scanner_target_at_start
+        parameters['measurement start'] = str(scan_data._timestamp)
+
+        # add meta data for axes in full target, but not scan axes
+        if scan_data.scanner_target_at_start:
+            for new_ax in scan_data.scanner_target_at_start.keys():
+                if new_ax not in scan_data.scan_axes:
+                    ax_info = self._scan_logic().scanner_constraints.axes[new_ax]
+                    ax_name = ax_info.name
+                    ax_unit = ax_info.unit
+                    parameters[f"{new_ax} axis name"] = ax_name
+                    parameters[f"{new_ax} axis unit"] = ax_unit
+        return parameters
+
+    def _save_thumbnails_to_file(self, scan_data, file_paths, color_range=None, full_figure=False,
+                                 scanner_pos=None, axes_units=None):
+        """ Renders and saves one thumbnail per channel. Runs in the thumbnail worker thread.
+
+        @param ScanData scan_data: frozen scan data snapshot
+        @param dict file_paths: file paths (without suffix) of the thumbnails per channel
+        @param tuple color_range: optional, color bar range of the 2D thumbnails
+        @param bool full_figure: optional, render full matplotlib figures instead of plain images
+        @param dict scanner_pos: scanner target to annotate, required for full_figure
+        @param dict axes_units: units of all scanner axes, required for full_figure
+        """
+        try:
+            if not full_figure:
+                for channel, file_path in file_paths.items():
+                    write_png(file_path,
+                              render_scan_thumbnail(scan_data.get_float_data(channel), color_range))
+                return
+            ds = TextDataStorage(root_dir=self.module_default_data_dir)
+            for channel, file_path in file_paths.items():
+                if scan_data.scan_dimension == 1:
+                    figure = self.draw_1d_scan_figure(scan_data, channel, scanner_pos=scanner_pos)
+                else:
+                    figure = self.draw_2d_scan_figure(scan_data,
+                                                      channel,
+                                                      cbar_range=color_range,
+                                                      scanner_pos=scanner_pos,
+                                                      axes_units=axes_units)
+                ds.save_thumbnail(figure, file_path=file_path)
+        except:
+            self.log.exception('Unable to save scan thumbnails:')
+
     def save_scan_by_axis(self, scan_axes=None, color_range=None):
         # wrapper for self.save_scan. Avoids copying scan_data through QtSignals
         scan = self.get_current_scan_data(scan_axes=scan_axes)
         self.save_scan(scan, color_range=color_range)
 
-    def create_tag_from_scan_data(self, scan_data, channel):
+    def create_tag_from_scan_data(self, scan_data, channel=None):
         axes = scan_data.scan_axes
         axis_dim = len(axes)
         axes_code = reduce(operator.add, axes)
+        if channel is None:
+            return f"{axis_dim}D-scan with {axes_code} axes"
         tag = f"{axis_dim}D-scan with {axes_code} axes from channel {channel}"
         return tag
 
-    def draw_2d_scan_figure(self, scan_data, channel, cbar_range=None):
+    def draw_2d_scan_figure(self, scan_data, channel, cbar_range=None, scanner_pos=None,
+                            axes_units=None):
         """ Create a 2-D color map figure of the scan image.
 
+        @param ScanData scan_data: the scan data to plot
+        @param str channel: the channel to plot
+        @param tuple cbar_range: optional, color bar range. Defaults to the full data range.
+        @param dict scanner_pos: optional, scanner target to mark. Defaults to the current target.
+        @param dict axes_units: optional, units of all scanner axes. Defaults to the units of the
+                                scanner constraints.
+
         @return fig: a matplotlib figure object to be saved to file.
         """
         image_arr = scan_data.data[channel]
         scan_axes = scan_data.scan_axes
-        scanner_pos = self._scan_logic().scanner_target
+        if scanner_pos is None:
+            scanner_pos = self._scan_logic().scanner_target
 
 
         # If no colorbar range was given, take full range of data
         if cbar_range is None:
             cbar_range = (np.nanmin(image_arr), np.nanmax(image_arr))
 
-        # Create figure
-        fig, ax = plt.subplots()
+        # Create figure. Not using pyplot, since this may run in the thumbnail worker thread.
+        fig = Figure()
+        ax = fig.add_subplot()
 
         # Scale axes and data
         scan_range_x = (scan_data.scan_range[0][1], scan_data.scan_range[0][0])
@@ -428,7 +1012,7 @@ class ScannerDataLogic(LogicBase):
                         xycoords=trans_ymark,
                         arrowprops={'facecolor': '#17becf', 'shrink': 0.05})
 
-        metainfo_str = self._pretty_print_metainfo(scan_axes, scan_data, scanner_pos)
+        metainfo_str = self._pretty_print_metainfo(scan_axes, scan_data, scanner_pos, axes_units)
         if metainfo_str:
             ax.annotate(metainfo_str,
                         xy=(1.10, -.17), xycoords='axes fraction',
@@ -436,7 +1020,7 @@ class ScannerDataLogic(LogicBase):
                         fontsize=7, color='grey')
 
         # Draw the colorbar
-        cbar = plt.colorbar(cfimage, shrink=0.8)  #, fraction=0.046, pad=0.08, shrink=0.75)
+        cbar = fig.colorbar(cfimage, ax=ax, shrink=0.8)  #, fraction=0.046, pad=0.08, shrink=0.75)
         if scan_data.channel_units[channel]:
             cbar.set_label(f'{channel} ({si_prefix_cb}{scan_data.channel_units[channel]})')
         else:
@@ -446,7 +1030,10 @@ class ScannerDataLogic(LogicBase):
         cbar.ax.tick_params(which=u'both', length=0)
         return fig
 
-    def _pretty_print_metainfo(self, scan_axes, scan_data, scanner_pos):
+    def _pretty_print_metainfo(self, scan_axes, scan_data, scanner_pos, axes_units=None):
+        if axes_units is None:
+            axes_units = {ax: axis.unit for ax, axis in
+                          self._scan_logic().scanner_constraints.axes.items()}
         metainfo_str = ""
 
         # annotate scanner position
@@ -461,8 +1048,7 @@ class ScannerDataLogic(LogicBase):
             target_str = ""
             for (target_ax, target_val) in scan_data.scanner_target_at_start.items():
                 if target_ax not in scan_axes:
-                    ax_info = self._scan_logic().scanner_constraints.axes[target_ax]
-                    unit = ax_info.unit
+                    unit = axes_units[target_ax]
                     target_str += f"{target_ax}: {ScaledFloat(target_val):.3r}{unit}\n"
             if target_str:
                 metainfo_str += "Scan start at:\n"
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 """
-This module is responsible for controlling any kind of scanning probe imaging for 1D and 2D
+This module is responsible for controlling any kind of scanning probe imaging for 1D, 2D and 3D
 scanning.
 
 Copyright (c) 2021, the qudi developers. See the AUTHORS.md file at the top-level directory of this
@@ -22,6 +22,7 @@ If not, see <https://www.gnu.org/licenses/>.
 
 __all__ = ['ScannerLogic']
 
+import time
 from PySide2 import QtCore
 import copy as cp
 import numpy as np
@@ -35,9 +36,15 @@ from qudi.core.statusvariable import StatusVar
 
 class ScannerLogic(LogicBase):
     """
-    This is the Logic class for 1D/2D SPM measurements.
-    Scanning in this context means moving something along 1 or 2 dimensions and collecting data from
-    possibly multiple sources at each position.
+    This is the Logic class for 1D/2D/3D SPM measurements.
+    Scanning in this context means moving something along 1, 2 or 3 dimensions and collecting data
+    from possibly multiple sources at each position.
+    While a 3D scan (z-stack) is running, only the 2D slice currently being acquired is streamed via
+    sigScanSliceUpdated instead of copying the entire volume on each update.
+    Scan progress and completion are driven by the sigScanDataReady and sigScanFinished signals of
+    the scanner hardware. The ConfigOption min_poll_interval limits the rate of scan progress
+    updates. As a fallback for scanners not emitting sigScanFinished on every stop, a slow watchdog
+    timer (ConfigOption scan_watchdog_interval) finishes the scan once the scanner is idle.
 
     Example config for copy-paste:
 
@@ -47,6 +54,7 @@ class ScannerLogic(LogicBase):
             max_history_length: 20
             max_scan_update_interval: 2
             position_update_interval: 1
+            scan_watchdog_interval: 1  # optional, in s
         connect:
             scanner: scanner_dummy
 
@@ -59,14 +67,20 @@ class ScannerLogic(LogicBase):
     _scan_ranges = StatusVar(name='scan_ranges', default=None)
     _scan_resolution = StatusVar(name='scan_resolution', default=None)
     _scan_frequency = StatusVar(name='scan_frequency', default=None)
+    _scan_averages = StatusVar(name='scan_averages', default=1)
 
     # config options
+    # minimum interval between two scan progress updates (s)
     _min_poll_interval = ConfigOption(name='min_poll_interval', default=None)
+    # interval of the fallback check for scans finished without sigScanFinished (s)
+    _scan_watchdog_interval = ConfigOption(name='scan_watchdog_interval', default=1.)
 
     # signals
     sigScanStateChanged = QtCore.Signal(bool, object, object)
     sigScannerTargetChanged = QtCore.Signal(dict, object)
     sigScanSettingsChanged = QtCore.Signal(dict)
+    sigAveragingProgress = QtCore.Signal(int, int)  # completed frames, total frames
+    sigScanSliceUpdated = QtCore.Signal(int, object, object)  # slice index, 2D ScanData, caller id
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -74,10 +88,17 @@ class ScannerLogic(LogicBase):
         self._thread_lock = RecursiveMutex()
 
         # others
-        self.__scan_poll_timer = None
-        self.__scan_poll_interval = 0
+        self.__last_progress_time = 0
         self.__scan_stop_requested = True
         self._curr_caller_id = self.module_uuid
+        self._curr_scan_axes = tuple()
+        self.__scan_watchdog_timer = None
+
+        # frame averaging
+        self._avg_scan_data = None
+        self._avg_counts = None
+        self._avg_frames_done = 0
+        self._avg_frames_total = 1
         return
 
     def on_activate(self):
@@ -108,20 +129,25 @@ class ScannerLogic(LogicBase):
         if not isinstance(self._scan_frequency, dict):
             self._scan_frequency = {ax.name: ax.max_frequency for ax in constr.axes.values()}
         """
-        self.__scan_poll_interval = 0
+        self.__last_progress_time = 0
         self.__scan_stop_requested = True
         self._curr_caller_id = self.module_uuid
 
-        self.__scan_poll_timer = QtCore.QTimer()
-        self.__scan_poll_timer.setSingleShot(True)
-        self.__scan_poll_timer.timeout.connect(self.__scan_poll_loop, QtCore.Qt.QueuedConnection)
+        self.__scan_watchdog_timer = QtCore.QTimer()
+        self.__scan_watchdog_timer.setInterval(int(round(self._scan_watchdog_interval * 1000)))
+        self.__scan_watchdog_timer.timeout.connect(self.__scan_watchdog, QtCore.Qt.QueuedConnection)
+
+        self._scanner().sigScanDataReady.connect(self.__scan_data_ready, QtCore.Qt.QueuedConnection)
+        self._scanner().sigScanFinished.connect(self.__scan_finished, QtCore.Qt.QueuedConnection)
         return
 
     def on_deactivate(self):
         """ Reverse steps of activation
         """
-        self.__scan_poll_timer.stop()
-        self.__scan_poll_timer.timeout.disconnect()
+        self._scanner().sigScanDataReady.disconnect(self.__scan_data_ready)
+        self._scanner().sigScanFinished.disconnect(self.__scan_finished)
+        self.__scan_watchdog_timer.stop()
+        self.__scan_watchdog_timer.timeout.disconnect()
         if self.module_state() != 'idle':
             self._scanner().stop_scan()
         return
@@ -129,6 +155,8 @@ class ScannerLogic(LogicBase):
     @property
     def scan_data(self):
         with self._thread_lock:
+            if self._avg_scan_data is not None:
+                return self._get_averaged_scan_data()
             return self._scanner().get_scan_data()
 
     @property
@@ -168,6 +196,16 @@ class ScannerLogic(LogicBase):
         with self._thread_lock:
             return cp.copy(self._scan_frequency)
 
+    @property
+    def scan_averages(self):
+        with self._thread_lock:
+            return self._scan_averages
+
+    @property
+    def completed_averages(self):
+        with self._thread_lock:
+            return self._avg_frames_done
+
     @property
     def scan_saved_to_history(self):
         with self._thread_lock:
@@ -179,6 +217,7 @@ class ScannerLogic(LogicBase):
             return {'range': self.scan_ranges,
                     'resolution': self.scan_resolution,
                     'frequency': self.scan_frequency,
+                    'averages': self.scan_averages,
                     'save_to_history': cp.copy(self._scan_saved_to_hist)}
 
     def set_scan_settings(self, settings):
@@ -189,6 +228,8 @@ class ScannerLogic(LogicBase):
                 self.set_scan_resolution(settings['resolution'])
             if 'frequency' in settings:
                 self.set_scan_frequency(settings['frequency'])
+            if 'averages' in settings:
+                self.set_scan_averages(settings['averages'])
             if 'save_to_history' in settings:
                 self._scan_saved_to_hist = settings['save_to_history']
 
@@ -290,6 +331,24 @@ class ScannerLogic(LogicBase):
             self.sigScanSettingsChanged.emit({'frequency': new_freq})
             return new_freq
 
+    def set_scan_averages(self, averages):
+        """ Set the number of frames to average for scans started by the scanner GUI. It is not
+        applied to other callers of start_scan (e.g. the optimizer), see start_scan.
+
+        @param int averages: number of frames to average (1 disables averaging)
+
+        @return int: the number of averages actually set
+        """
+        with self._thread_lock:
+            if self.module_state() != 'idle':
+                self.log.warning('Scan is running. Unable to change number of scan averages.')
+            elif int(averages) < 1:
+                self.log.error('Number of scan averages must be >= 1.')
+            else:
+                self._scan_averages = int(averages)
+            self.sigScanSettingsChanged.emit({'averages': self._scan_averages})
+            return self._scan_averages
+
     def set_target_position(self, pos_dict, caller_id=None, move_blocking=False):
         with self._thread_lock:
             if self.module_state() != 'idle':
@@ -322,10 +381,10 @@ class ScannerLogic(LogicBase):
             )
             return new_pos
 
-    def toggle_scan(self, start, scan_axes, caller_id=None):
+    def toggle_scan(self, start, scan_axes, caller_id=None, averages=1):
         with self._thread_lock:
             if start:
-                return self.start_scan(scan_axes, caller_id)
+                return self.start_scan(scan_axes, caller_id, averages)
             return self.stop_scan()
 
     def _update_scan_settings(self, scan_axes, settings):
@@ -350,7 +409,16 @@ class ScannerLogic(LogicBase):
             self._scan_frequency[scan_axes[0]] = new
             self.sigScanSettingsChanged.emit({'frequency': {scan_axes[0]: new}})
 
-    def start_scan(self, scan_axes, caller_id=None):
+    def start_scan(self, scan_axes, caller_id=None, averages=1):
+        """ Starts a scan of the given axes with the current scan settings.
+
+        @param tuple scan_axes: names of the axes to scan
+        @param object caller_id: optional, id of the module requesting the scan
+        @param int averages: optional, number of frames to acquire and average. The scanner is
+                             configured once and re-triggered for each frame.
+
+        @return int: error code (0:OK, -1:error)
+        """
         with self._thread_lock:
             if self.module_state() != 'idle':
                 self.sigScanStateChanged.emit(True, self.scan_data, self._curr_caller_id)
@@ -358,6 +426,7 @@ class ScannerLogic(LogicBase):
 
             scan_axes = tuple(scan_axes)
             self._curr_caller_id = self.module_uuid if caller_id is None else caller_id
+            self._curr_scan_axes = scan_axes
 
             self.module_state.lock()
 
@@ -374,21 +443,28 @@ class ScannerLogic(LogicBase):
 
             self._update_scan_settings(scan_axes, new_settings)
             #self.log.debug("Applied new scan settings")
+            self._avg_scan_data = None
+            self._avg_counts = None
 
-            # Calculate poll time to check for scan completion. Use line scan time estimate.
-            line_points = self._scan_resolution[scan_axes[0]] if len(scan_axes) > 1 else 1
-            self.__scan_poll_interval = max(self._min_poll_interval,
-                                            line_points / self._scan_frequency[scan_axes[0]])
-            self.__scan_poll_timer.setInterval(int(round(self.__scan_poll_interval * 1000)))
-
+            self.__last_progress_time = time.perf_counter()
             if self._scanner().start_scan() < 0:  # TODO Current interface states that bool is returned from start_scan
                 self.module_state.unlock()
                 self.sigScanStateChanged.emit(False, None, self._curr_caller_id)
                 self.log.error("Couldn't start scan.")
                 return -1
 
+            # Some scanners (e.g. the dummy) only create the scan data when the scan is started
+            try:
+                self._init_averaging(averages)
+            except:
+                self.log.exception('Unable to initialize scan frame averaging:')
+                self._avg_scan_data = None
+                self._avg_counts = None
+                self.stop_scan()
+                return -1
+
+            self.__start_watchdog()
             self.sigScanStateChanged.emit(True, self.scan_data, self._curr_caller_id)
-            self.__start_timer()
             return 0
 
     def stop_scan(self):
@@ -397,56 +473,179 @@ class ScannerLogic(LogicBase):
                 self.sigScanStateChanged.emit(False, self.scan_data, self._curr_caller_id)
                 return 0
 
-            self.__stop_timer()
-
-            err = self._scanner().stop_scan() if self._scanner().module_state() != 'idle' else 0
+            self.__stop_watchdog()
+            try:
+                err = self._scanner().stop_scan() if self._scanner().module_state() != 'idle' else 0
 
-            self.module_state.unlock()
+                if self._avg_scan_data is not None and self._avg_frames_done == 0:
+                    # Stopped during the first frame. Nothing to average, keep the partial frame.
+                    self._accumulate_frame(self._scanner().get_scan_data())
+            except:
+                self.log.exception('An exception was raised while stopping the scan:')
+                err = -1
+            finally:
+                self.module_state.unlock()
 
+            # Finished scans are passed on as immutable snapshots sharing the data arrays
+            scan_data = self.scan_data
+            if scan_data is not None:
+                scan_data = scan_data.snapshot()
             if self.scan_settings['save_to_history']:
                 # module_uuid signals data-ready to data logic
-                self.sigScanStateChanged.emit(False, self.scan_data, self.module_uuid)
+                self.sigScanStateChanged.emit(False, scan_data, self.module_uuid)
             else:
-                self.sigScanStateChanged.emit(False, self.scan_data, self._curr_caller_id)
+                self.sigScanStateChanged.emit(False, scan_data, self._curr_caller_id)
 
             return err
 
-    def __scan_poll_loop(self):
+    def __scan_data_ready(self):
+        """ Emits the scan progress for new data from the scanner, at most once every
+        min_poll_interval.
+        """
         with self._thread_lock:
+            if self.module_state() == 'idle':
+                return
+            now = time.perf_counter()
+            if now - self.__last_progress_time < self._min_poll_interval:
+                return
+            self.__last_progress_time = now
             try:
-                if self.module_state() == 'idle':
-                    return
+                self.__emit_scan_progress()
+            except:
+                self.log.exception('An exception was raised while updating the scan progress:')
 
-                if self._scanner().module_state() == 'idle':
-                    self.stop_scan()
+    def __scan_finished(self):
+        """ Handles the end of a scan (frame) reported by the scanner.
+        """
+        with self._thread_lock:
+            try:
+                # Ignore stale signals, e.g. from a scan stopped by this logic or an already
+                # re-triggered averaging frame
+                if self.module_state() == 'idle' or self._scanner().module_state() != 'idle':
                     return
-                # TODO Added the following line as a quick test; Maybe look at it with more caution if correct
-                self.sigScanStateChanged.emit(True, self.scan_data, self._curr_caller_id)
 
-                # Queue next call to this slot
-                self.__scan_poll_timer.start()
-            except TimeoutError:
-                self.log.exception('Timed out while waiting for scan data:')
+                if self._avg_scan_data is not None:
+                    self._accumulate_frame(self._scanner().get_scan_data())
+                    if self._avg_frames_done < self._avg_frames_total:
+                        # Re-trigger the already configured scan for the next frame
+                        if self._scanner().start_scan() < 0:
+                            self.log.error('Unable to start next frame of averaged scan.')
+                            self.stop_scan()
+                            return
+                        self.__emit_scan_progress()
+                        return
+                self.stop_scan()
             except:
-                self.log.exception('An exception was raised while polling the scan:')
+                self.log.exception('An exception was raised while finishing the scan:')
+                # Never leave the logic locked
+                if self.module_state() != 'idle':
+                    self.stop_scan()
             return
 
-    def set_full_scan_ranges(self):
-        scan_range = {ax: axis.value_range for ax, axis in self.scanner_constraints.axes.items()}
-        return self.set_scan_range(scan_range)
-
-    def __start_timer(self):
+    def __scan_watchdog(self):
+        """ Finishes the scan if the scanner stopped without emitting sigScanFinished.
+        """
+        with self._thread_lock:
+            if self.module_state() == 'idle':
+                self.__scan_watchdog_timer.stop()
+                return
+            if self._scanner().module_state() != 'idle':
+                return
+            self.log.debug('Scanner stopped without emitting sigScanFinished.')
+            self.__scan_finished()
+
+    def __start_watchdog(self):
         if self.thread() is not QtCore.QThread.currentThread():
-            QtCore.QMetaObject.invokeMethod(self.__scan_poll_timer,
+            QtCore.QMetaObject.invokeMethod(self.__scan_watchdog_timer,
                                             'start',
-                                            QtCore.Qt.BlockingQueuedConnection)
+                                            QtCore.Qt.QueuedConnection)
         else:
-            self.__scan_poll_timer.start()
+            self.__scan_watchdog_timer.start()
 
-    def __stop_timer(self):
+    def __stop_watchdog(self):
         if self.thread() is not QtCore.QThread.currentThread():
-            QtCore.QMetaObject.invokeMethod(self.__scan_poll_timer,
+            QtCore.QMetaObject.invokeMethod(self.__scan_watchdog_timer,
                                             'stop',
-                                            QtCore.Qt.BlockingQueuedConnection)
+                                            QtCore.Qt.QueuedConnection)
         else:
-            self.__scan_poll_timer.stop()
+            self.__scan_watchdog_timer.stop()
+
+    def __emit_scan_progress(self):
+        if len(self._curr_scan_axes) == 3:
+            # Stream only the currently acquired slice of the (raw) frame
+            index, slice_data = self._scanner().get_scan_slice()
+            if slice_data is not None:
+                self.sigScanSliceUpdated.emit(index, slice_data, self._curr_caller_id)
+        else:
+            self.sigScanStateChanged.emit(True, self.scan_data, self._curr_caller_id)
+
+    def _init_averaging(self, averages):
+        """ Resets the running mean accumulators for a new (averaged) scan. Must be called after
+        the scanner started the first frame, so the accumulators match the geometry of the frames.
+
+        @param int averages: number of frames to average
+        """
+        self._avg_frames_done = 0
+        self._avg_frames_total = max(1, int(averages))
+        self._avg_counts = None
+        self._avg_scan_data = None
+        if self._avg_frames_total > 1:
+            frame = self._scanner().get_scan_data()
+            if frame is None:
+                raise RuntimeError('Scanner provides no scan data for the started scan.')
+            # running mean is always kept as float64, independent of the channel dtypes
+            avg_scan_data = frame.empty_copy(channel_dtype=np.float64)
+            avg_scan_data.new_scan()
+            shape = avg_scan_data.scan_resolution
+            self._avg_counts = {ch: np.zeros(shape, dtype=np.int64)
+                                for ch in avg_scan_data.channels}
+            self._avg_scan_data = avg_scan_data
+        self.sigAveragingProgress.emit(0, self._avg_frames_total)
+
+    def _accumulate_frame(self, frame):
+        """ Adds a completed frame to the running mean in place.
+        Pixels without data (NaN) are ignored, so each pixel keeps its own sample count.
+
+        @param ScanData frame: the completed frame
+        """
+        if tuple(frame.scan_resolution) != tuple(self._avg_scan_data.scan_resolution):
+            raise ValueError(f'Frame resolution {frame.scan_resolution} does not match averaged '
+                             f'scan resolution {self._avg_scan_data.scan_resolution}.')
+        mean_data = self._avg_scan_data.data
+        for ch in frame.channels:
+            values = frame.get_float_data(ch)
+            valid = ~np.isnan(values)
+            counts = self._avg_counts[ch]
+            counts[valid] += 1
+            mean = mean_data[ch]
+            mean[valid & (counts == 1)] = 0
+            mean[valid] += (values[valid] - mean[valid]) / counts[valid]
+        self._avg_frames_done += 1
+        self.sigAveragingProgress.emit(self._avg_frames_done, self._avg_frames_total)
+
+    def _get_averaged_scan_data(self):
+        """ Running average of all completed frames. Pixels already acquired in the currently
+        running frame are included, so the image is updated line by line.
+
+        @return ScanData: copy of the averaged scan data
+        """
+        if self.module_state() == 'idle' or self._avg_frames_done >= self._avg_frames_total:
+            # The average is final, a new scan allocates new averaging arrays
+            return self._avg_scan_data.snapshot()
+        averaged = self._avg_scan_data.copy()
+        frame = self._scanner().get_scan_data()
+        if frame is None or frame.data is None:
+            return averaged
+        for ch in frame.channels:
+            values = frame.get_float_data(ch)
+            valid = ~np.isnan(values)
+            counts = self._avg_counts[ch][valid] + 1
+            mean = averaged.data[ch]
+            mean[valid] = np.where(counts > 1,
+                                   mean[valid] + (values[valid] - mean[valid]) / counts,
+                                   values[valid])
+        return averaged
+
+    def set_full_scan_ranges(self):
+        scan_range = {ax: axis.value_range for ax, axis in self.scanner_constraints.axes.items()}
+        return self.set_scan_range(scan_range)
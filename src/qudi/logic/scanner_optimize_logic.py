@@ -20,12 +20,15 @@ You should have received a copy of the GNU Lesser General Public License along w
 If not, see <https://www.gnu.org/licenses/>.
 """
 
-__all__ = ['ScannerOptimizeLogic']
+__all__ = ['ScannerOptimizeLogic', 'estimate_gaussian_moments', 'iter_optimizer_sequences']
 
 import numpy as np
 from PySide2 import QtCore
 import itertools
+import functools
 import copy as cp
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 from qudi.core.module import LogicBase
 from qudi.util.mutex import RecursiveMutex, Mutex
@@ -37,6 +40,66 @@ from qudi.util.fit_models.gaussian import Gaussian2D, Gaussian
 from qudi.interface.scanning_probe_interface import ScanData
 
 
+def estimate_gaussian_moments(coords, data):
+    """ Fast, non-iterative estimate of a single gaussian peak. The background (offset) is the
+    median of the data. Center and widths are the moments of the background subtracted region
+    above half maximum, so noise far away from the peak does not bias the estimate.
+
+    @param tuple coords: coordinate arrays (one per dimension), each broadcastable to data shape
+    @param numpy.ndarray data: 1D or 2D data array, NaN values are ignored
+
+    @return dict: estimated 'offset', 'amplitude', 'center' (tuple), 'sigma' (tuple), signal to
+                  noise ratio 'snr', number of 'pixels' above half maximum and flag 'truncated'
+                  (peak touches the data border). None if no peak could be estimated.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    coords = [np.broadcast_to(np.asarray(c, dtype=np.float64), data.shape) for c in coords]
+    finite = np.isfinite(data)
+    if np.count_nonzero(finite) < 3:
+        return None
+    values = data[finite]
+    offset = np.median(values)
+    noise = 1.4826 * np.median(np.abs(values - offset))
+    signal = np.where(finite, data - offset, 0)
+    amplitude = signal.max()
+    if amplitude <= 0:
+        return None
+
+    mask = signal >= amplitude / 2
+    weights = signal[mask]
+    total = weights.sum()
+    # the half maximum region is a line segment (1D) or an ellipse (2D) of uniform moments
+    fwhm_var_factor = 3 if data.ndim == 1 else 4
+    center = list()
+    sigma = list()
+    for dim, c in enumerate(coords):
+        step = np.ptp(c) / max(data.shape[dim] - 1, 1)
+        c = c[mask]
+        ctr = (c * weights).sum() / total
+        var = ((c - ctr) ** 2).mean() + step ** 2 / 12
+        center.append(float(ctr))
+        sigma.append(float(np.sqrt(fwhm_var_factor * var / (2 * np.log(2)))))
+    truncated = any(np.take(mask, [0, -1], axis=dim).any() for dim in range(data.ndim))
+    return {'offset': float(offset),
+            'amplitude': float(amplitude),
+            'center': tuple(center),
+            'sigma': tuple(sigma),
+            'snr': float(amplitude / noise) if noise > 0 else np.inf,
+            'pixels': int(np.count_nonzero(mask)),
+            'truncated': bool(truncated)}
+
+
+class MomentFitResult:
+    """ Minimal stand-in for a lmfit ModelResult, used if the full fit is skipped in favour of a
+    confident moment estimate.
+    """
+    def __init__(self, params, best_fit):
+        self.params = params
+        self.best_values = params.valuesdict()
+        self.best_fit = best_fit
+        self.success = True
+
+
 class ScannerOptimizeLogic(LogicBase):
     """
     This module is responsible for performing scanning probe measurements in order to find some optimal
@@ -46,6 +109,19 @@ class ScannerOptimizeLogic(LogicBase):
 
     scanning_optimize_logic:
         module.Class: 'scanning_optimize_logic.ScanningOptimizeLogic'
+        options:
+            skip_fit_if_confident: False  # optional, use the moment estimate without full gauss fit
+            prefit_min_snr: 10  # optional, min. signal to noise ratio of a confident moment estimate
+            pipeline_fits: True  # optional, start the next scan of other axes while fitting
+            warm_start: True  # optional, reduce scan range and seed fits from the last fit per POI
+            warm_start_range_sigmas: 6  # optional, reduced scan range in units of the last fit sigma
+            warm_start_max_drift: 2  # optional, max. drift (in sigma) before falling back to full range
+            warm_start_cache_size: 64  # optional, number of POIs/positions to remember fits for
+            line_search_points: 7  # optional, points per line scan in 'line_search' optimize mode
+            line_search_span: 0.5  # optional, line scan length as fraction of the optimizer scan range
+            line_search_max_iterations: 20  # optional, max. number of line scan cycles over all axes
+            line_search_tolerance: 0.05  # optional, converged if all steps of a cycle are below this
+                                         # fraction of the line scan length
         connect:
             scan_logic: scanning_probe_logic
 
@@ -55,6 +131,17 @@ class ScannerOptimizeLogic(LogicBase):
     _scan_logic = Connector(name='scan_logic', interface='ScannerLogic')
 
     # config options
+    _skip_fit_if_confident = ConfigOption(name='skip_fit_if_confident', default=False)
+    _prefit_min_snr = ConfigOption(name='prefit_min_snr', default=10)
+    _pipeline_fits = ConfigOption(name='pipeline_fits', default=True)
+    _warm_start = ConfigOption(name='warm_start', default=True)
+    _warm_start_range_sigmas = ConfigOption(name='warm_start_range_sigmas', default=6)
+    _warm_start_max_drift = ConfigOption(name='warm_start_max_drift', default=2)
+    _warm_start_cache_size = ConfigOption(name='warm_start_cache_size', default=64)
+    _line_search_points = ConfigOption(name='line_search_points', default=7)
+    _line_search_span = ConfigOption(name='line_search_span', default=0.5)
+    _line_search_max_iterations = ConfigOption(name='line_search_max_iterations', default=20)
+    _line_search_tolerance = ConfigOption(name='line_search_tolerance', default=0.05)
 
     # status variables
     _scan_sequence = StatusVar(name='scan_sequence', default=None)
@@ -62,12 +149,18 @@ class ScannerOptimizeLogic(LogicBase):
     _scan_frequency = StatusVar(name='scan_frequency', default=None)
     _scan_range = StatusVar(name='scan_range', default=None)
     _scan_resolution = StatusVar(name='scan_resolution', default=None)
+    _optimize_mode = StatusVar(name='optimize_mode', default='sequence')
+
+    # 'sequence': fit images/lines of the scan sequence, 'line_search': iterate short line scans
+    _optimize_modes = ('sequence', 'line_search')
 
     # signals
     sigOptimizeStateChanged = QtCore.Signal(bool, dict, object)
     sigOptimizeSettingsChanged = QtCore.Signal(dict)
 
     _sigNextSequenceStep = QtCore.Signal()
+    _sigFitFinished = QtCore.Signal(object)
+    _sigMomentEstimate = QtCore.Signal(object)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -80,6 +173,32 @@ class ScannerOptimizeLogic(LogicBase):
         self._optimal_position = dict()
         self._last_scans = list()
         self._last_fits = list()
+        self._optimize_succeeded = False
+
+        # Fits run in a worker thread, see _scan_state_changed
+        self._fit_executor = None
+        self._optimize_id = 0
+        self._pending_fits = dict()
+        self._unapplied_fits = list()
+        self._waiting_for_fits = False
+
+        # Last fit parameters per POI (key) for warm starts, see _find_warm_start_entry
+        self._warm_start_cache = OrderedDict()
+        self._warm_start_key = None
+        self._warm_start_entry = None
+        self._new_warm_start_steps = dict()
+        # optimize mode of the running optimize, see start_optimize
+        self._run_optimize_mode = None
+        self._full_scan_ranges = dict()
+        self._full_scan_resolution = dict()
+
+        # Closed-loop line search, see _line_search_step
+        self._line_search_axes = list()
+        self._line_search_step_ends = dict()
+        self._line_search_spans = dict()
+        self._line_search_results = dict()
+        self._line_search_iteration = 0
+        self._line_search_max_step = 0
 
     def on_activate(self):
         """ Initialisation performed during activation of the module.
@@ -102,6 +221,8 @@ class ScannerOptimizeLogic(LogicBase):
                 self._scan_sequence = list()
         if self._data_channel is None:
             self._data_channel = tuple(channels.values())[0].name
+        if self._optimize_mode not in self._optimize_modes:
+            self._optimize_mode = self._optimize_modes[0]
 
         # check nd correct optimizer settings loaded from StatusVar
         new_settings = self.check_sanity_optimizer_settings(self.optimize_settings)
@@ -116,7 +237,14 @@ class ScannerOptimizeLogic(LogicBase):
         self._last_scans = list()
         self._last_fits = list()
 
+        self._fit_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='optimizer_fit')
+        self._pending_fits = dict()
+        self._unapplied_fits = list()
+        self._waiting_for_fits = False
+
         self._sigNextSequenceStep.connect(self._next_sequence_step, QtCore.Qt.QueuedConnection)
+        self._sigFitFinished.connect(self._fit_finished, QtCore.Qt.QueuedConnection)
+        self._sigMomentEstimate.connect(self._emit_moment_estimate, QtCore.Qt.QueuedConnection)
         self._scan_logic().sigScanStateChanged.connect(
             self._scan_state_changed, QtCore.Qt.QueuedConnection
         )
@@ -127,6 +255,10 @@ class ScannerOptimizeLogic(LogicBase):
         self._scan_logic().sigScanStateChanged.disconnect(self._scan_state_changed)
         self._sigNextSequenceStep.disconnect()
         self.stop_optimize()
+        self._sigFitFinished.disconnect()
+        self._sigMomentEstimate.disconnect()
+        self._fit_executor.shutdown(wait=True)
+        self._fit_executor = None
         return
 
     @property
@@ -164,6 +296,10 @@ class ScannerOptimizeLogic(LogicBase):
 
         self._scan_sequence = sequence
 
+    @property
+    def optimize_mode(self):
+        return self._optimize_mode
+
     @property
     def optimizer_running(self):
         return self.module_state() != 'idle'
@@ -174,7 +310,8 @@ class ScannerOptimizeLogic(LogicBase):
                 'data_channel': self._data_channel,
                 'scan_range': self.scan_range,
                 'scan_resolution': self.scan_resolution,
-                'scan_sequence': self.scan_sequence}
+                'scan_sequence': self.scan_sequence,
+                'optimize_mode': self._optimize_mode}
 
     @property
     def last_scans(self):
@@ -186,6 +323,13 @@ class ScannerOptimizeLogic(LogicBase):
         with self._result_lock:
             return self._last_fits.copy()
 
+    @property
+    def last_optimize_succeeded(self):
+        """ Flag indicating if the last optimize run completed, i.e. it was neither stopped early
+        nor aborted due to a failed fit.
+        """
+        return self._optimize_succeeded
+
     def check_sanity_optimizer_settings(self, settings=None, plot_dimensions=None):
         # shaddows scanning_probe_logic::check_sanity. Unify code somehow?
 
@@ -270,6 +414,13 @@ class ScannerOptimizeLogic(LogicBase):
                 if 'scan_sequence' in settings:
                     self.scan_sequence = settings['scan_sequence']
                     settings_update['scan_sequence'] = self.scan_sequence
+                if 'optimize_mode' in settings:
+                    if settings['optimize_mode'] in self._optimize_modes:
+                        self._optimize_mode = settings['optimize_mode']
+                    else:
+                        self.log.error(f'Unknown optimize mode "{settings["optimize_mode"]}". '
+                                       f'Valid modes are {self._optimize_modes}.')
+                    settings_update['optimize_mode'] = self._optimize_mode
 
             self.sigOptimizeSettingsChanged.emit(settings_update)
             return settings_update
@@ -279,12 +430,28 @@ class ScannerOptimizeLogic(LogicBase):
             return self.start_optimize()
         return self.stop_optimize()
 
-    def start_optimize(self):
+    def start_optimize(self, warm_start_key=None, optimize_mode=None):
+        """ Starts the optimize sequence around the current scanner target.
+
+        @param str warm_start_key: optional, name of the POI (or any other key) to warm start from
+                                   the last fit results of. If omitted, the closest previously
+                                   optimized position is used.
+        @param str optimize_mode: optional, optimize mode to use for this run only. Defaults to
+                                  the "optimize_mode" setting, which is left unchanged.
+        """
         with self._thread_lock:
             if self.module_state() != 'idle':
                 self.sigOptimizeStateChanged.emit(True, dict(), None)
                 return 0
 
+            if optimize_mode is None:
+                optimize_mode = self._optimize_mode
+            elif optimize_mode not in self._optimize_modes:
+                self.log.error(f'Unknown optimize mode "{optimize_mode}". '
+                               f'Valid modes are {self._optimize_modes}.')
+                return -1
+            self._run_optimize_mode = optimize_mode
+
             # ToDo: Sanity checks for settings go here
             self.module_state.lock()
             with self._result_lock:
@@ -331,8 +498,25 @@ class ScannerOptimizeLogic(LogicBase):
             # optimizer scans are never saved
             self._scan_logic().set_scan_settings({'save_to_history': False})
 
+            self._full_scan_ranges = self._scan_logic().scan_ranges
+            self._full_scan_resolution = self._scan_logic().scan_resolution
+            self._warm_start_key = warm_start_key
+            self._warm_start_entry = None
+            self._new_warm_start_steps = dict()
+            if self._run_optimize_mode == 'line_search':
+                self._init_line_search(curr_pos)
+            else:
+                self._warm_start_entry = self._find_warm_start_entry(warm_start_key, curr_pos)
+                if self._warm_start_entry is not None:
+                    self._reduce_scan_ranges(curr_pos)
+
             self._sequence_index = 0
             self._optimal_position = dict()
+            self._optimize_succeeded = False
+            self._optimize_id += 1
+            self._pending_fits = dict()
+            self._unapplied_fits = list()
+            self._waiting_for_fits = False
             self.sigOptimizeStateChanged.emit(True, self.optimal_position, None)
             self._sigNextSequenceStep.emit()
             return 0
@@ -345,12 +529,12 @@ class ScannerOptimizeLogic(LogicBase):
 
             #self.log.debug(f"Next opt sequence step {self._sequence_index}")
 
-            if self._scan_logic().toggle_scan(True,
-                                              self._scan_sequence[self._sequence_index],
-                                              self.module_uuid) < 0:
-                self.log.error('Unable to start {0} scan. Optimize aborted.'.format(
-                    self._scan_sequence[self._sequence_index])
-                )
+            if self._run_optimize_mode == 'line_search':
+                scan_axes = (self._line_search_axes[self._sequence_index],)
+            else:
+                scan_axes = self._scan_sequence[self._sequence_index]
+            if self._scan_logic().toggle_scan(True, scan_axes, self.module_uuid) < 0:
+                self.log.error('Unable to start {0} scan. Optimize aborted.'.format(scan_axes))
                 self.stop_optimize()
             return
 
@@ -359,57 +543,373 @@ class ScannerOptimizeLogic(LogicBase):
         with self._thread_lock:
             if is_running or self.module_state() == 'idle' or caller_id != self.module_uuid:
                 return
-            elif data is not None:
-                #self.log.debug(f"Trying to fit on data after scan of dim {data.scan_dimension}")
-
-                try:
-                    if data.scan_dimension == 1:
-                        x = np.linspace(*data.scan_range[0], data.scan_resolution[0])
-                        opt_pos, fit_data, fit_res = self._get_pos_from_1d_gauss_fit(
-                            x,
-                            data.data[self._data_channel]
-                        )
-                    else:
-                        x = np.linspace(*data.scan_range[0], data.scan_resolution[0])
-                        y = np.linspace(*data.scan_range[1], data.scan_resolution[1])
-                        xy = np.meshgrid(x, y, indexing='ij')
-                        opt_pos, fit_data, fit_res = self._get_pos_from_2d_gauss_fit(
-                            xy,
-                            data.data[self._data_channel].ravel()
-                        )
-
-                    position_update = {ax: opt_pos[ii] for ii, ax in enumerate(data.scan_axes)}
-                    #self.log.debug(f"Optimizer issuing position update: {position_update}")
-                    if fit_data is not None:
-                        new_pos = self._scan_logic().set_target_position(position_update, move_blocking=True)
-                        for ax in tuple(position_update):
-                            position_update[ax] = new_pos[ax]
-
-                        fit_data = {'fit_data': fit_data, 'full_fit_res': fit_res}
-
-                    self._optimal_position.update(position_update)
-                    with self._result_lock:
-                        self._last_scans.append(data.copy())
-                        self._last_fits.append(fit_res)
-                    self.sigOptimizeStateChanged.emit(True, position_update, fit_data)
-
-                    # Abort optimize if fit failed
-                    if fit_data is None:
-                        self.log.warning("Stopping optimization due to failed fit.")
-                        self.stop_optimize()
-                        return
-
-                except:
-                    self.log.exception("")
+
+            if self._run_optimize_mode == 'line_search':
+                self._line_search_step(data)
+                return
+
+            # The scanner is idle now, so positions of fits finished during the scan can be applied
+            if not self._apply_unapplied_fits():
+                return
 
             self._sequence_index += 1
+            if data is not None:
+                with self._result_lock:
+                    # index of this scan (and its fit) in the last scans/fits
+                    result_index = len(self._last_scans)
+                    self._last_scans.append(data.snapshot())
+                    self._last_fits.append(None)
+                optimize_id = self._optimize_id
+                future = self._fit_executor.submit(self._fit_scan_data, data,
+                                                   self._get_warm_start_seed(data), optimize_id)
+                self._pending_fits[future] = (result_index, tuple(data.scan_axes))
+                future.add_done_callback(
+                    lambda f: self._sigFitFinished.emit((optimize_id, f))
+                )
+
+            # Start the next scan right away if it does not depend on the position of pending fits
+            if self._sequence_index < len(self._scan_sequence) and self._pipeline_fits:
+                pending_axes = set(ax for _, axes in self._pending_fits.values() for ax in axes)
+                if pending_axes.isdisjoint(self._scan_sequence[self._sequence_index]):
+                    self._sigNextSequenceStep.emit()
+                    return
+            self._continue_after_fits()
+            return
+
+    def _init_line_search(self, position):
+        """ Sets up short line scans of <line_search_points> points across <line_search_span>
+        times the optimizer scan range around the current position for all axes of the scan
+        sequence.
+        """
+        self._line_search_axes = list()
+        self._line_search_step_ends = dict()
+        for step in self._scan_sequence:
+            self._line_search_axes.extend(step)
+            self._line_search_step_ends[len(self._line_search_axes) - 1] = tuple(step)
+        self._line_search_spans = {ax: self._scan_range[ax] * self._line_search_span
+                                   for ax in self._line_search_axes}
+        self._line_search_results = dict()
+        self._line_search_iteration = 0
+        self._line_search_max_step = 0
+
+        self._scan_logic().set_scan_range(
+            {ax: (position[ax] - span / 2, position[ax] + span / 2)
+             for ax, span in self._line_search_spans.items()}
+        )
+        self._scan_logic().set_scan_resolution(
+            {ax: self._line_search_points for ax in self._line_search_spans}
+        )
 
-            # Terminate optimize sequence if finished; continue with next sequence step otherwise
-            if self._sequence_index >= len(self._scan_sequence):
+    def _line_search_step(self, data):
+        """ Moves the scanned axis to the peak of a parabola fitted to the last line scan and
+        starts the next line scan. Terminates if no axis moved by more than <line_search_tolerance>
+        times the line scan length during a full cycle over all axes, or after
+        <line_search_max_iterations> cycles.
+        """
+        axis = self._line_search_axes[self._sequence_index]
+        if data is not None:
+            with self._result_lock:
+                # only keep the last line scan of each axis
+                result_index = self._line_search_results.setdefault(axis, len(self._last_scans))
+                if result_index == len(self._last_scans):
+                    self._last_scans.append(data.snapshot())
+                    self._last_fits.append(None)
+                else:
+                    self._last_scans[result_index] = data.snapshot()
+
+            x = np.linspace(*data.scan_range[0], data.scan_resolution[0])
+            peak = self._parabolic_peak_position(x, data.get_float_data(self._data_channel))
+            if peak is None:
+                self.log.warning('Stopping line search optimization due to invalid scan data.')
                 self.stop_optimize()
-            else:
-                self._sigNextSequenceStep.emit()
+                return
+
+            new_pos = self._scan_logic().set_target_position({axis: peak}, move_blocking=True)
+            line_center = (data.scan_range[0][0] + data.scan_range[0][1]) / 2
+            self._line_search_max_step = max(
+                self._line_search_max_step,
+                abs(new_pos[axis] - line_center) / self._line_search_spans[axis]
+            )
+            self._optimal_position[axis] = new_pos[axis]
+            half_span = self._line_search_spans[axis] / 2
+            self._scan_logic().set_scan_range(
+                {axis: (new_pos[axis] - half_span, new_pos[axis] + half_span)}
+            )
+
+        step = self._line_search_step_ends.get(self._sequence_index, None)
+        if step is not None:
+            self.sigOptimizeStateChanged.emit(
+                True,
+                {ax: self._optimal_position[ax] for ax in step if ax in self._optimal_position},
+                None
+            )
+
+        self._sequence_index += 1
+        if self._sequence_index >= len(self._line_search_axes):
+            self._sequence_index = 0
+            self._line_search_iteration += 1
+            converged = self._line_search_max_step <= self._line_search_tolerance
+            self._line_search_max_step = 0
+            if converged or self._line_search_iteration >= self._line_search_max_iterations:
+                if not converged:
+                    self.log.info(f'Line search optimization did not converge within '
+                                  f'{self._line_search_iteration} iterations.')
+                self._optimize_succeeded = True
+                self.stop_optimize()
+                return
+        self._sigNextSequenceStep.emit()
+
+    @staticmethod
+    def _parabolic_peak_position(x, y):
+        """ Position of the maximum of a parabola fitted to a line scan, limited to the scanned
+        range. Falls back to the brightest sample if the data is not curved downwards.
+
+        @param numpy.ndarray x: scan positions
+        @param numpy.ndarray y: scan data
+
+        @return float: peak position, None if there are less than 3 valid samples
+        """
+        center = (x[0] + x[-1]) / 2
+        half_span = abs(x[-1] - x[0]) / 2
+        valid = np.isfinite(y)
+        if half_span == 0 or np.count_nonzero(valid) < 3:
+            return None
+        # fit in units of the half line length for a well conditioned polynomial fit
+        u = (x[valid] - center) / half_span
+        y = y[valid]
+        curvature, slope, _ = np.polyfit(u, y, 2)
+        if curvature < 0:
+            u_peak = -slope / (2 * curvature)
+        else:
+            u_peak = u[np.argmax(y)]
+        return center + float(np.clip(u_peak, -1, 1)) * half_span
+
+    def _fit_scan_data(self, data, seed=None, optimize_id=None):
+        """ Fits the optimizer scan data. Runs in a worker thread.
+
+        @param ScanData data: the optimizer scan
+        @param dict seed: optional, warm start values of the peak, see _get_warm_start_seed
+        @param int optimize_id: optional, optimize run the scan belongs to
+
+        @return tuple: position update (dict), fit data (dict or None if fit failed), fitted peak
+                       values (dict or None), flag if the peak drifted beyond the warm start range
+        """
+        if data.scan_dimension == 1:
+            x = np.linspace(*data.scan_range[0], data.scan_resolution[0])
+            estimate = estimate_gaussian_moments((x,), data.data[self._data_channel])
+            self._sigMomentEstimate.emit((optimize_id, tuple(data.scan_axes), estimate))
+            opt_pos, fit_data, fit_res = self._get_pos_from_1d_gauss_fit(
+                x,
+                data.data[self._data_channel],
+                estimate,
+                seed
+            )
+        else:
+            x = np.linspace(*data.scan_range[0], data.scan_resolution[0])
+            y = np.linspace(*data.scan_range[1], data.scan_resolution[1])
+            xy = np.meshgrid(x, y, indexing='ij')
+            estimate = estimate_gaussian_moments(xy, data.data[self._data_channel])
+            self._sigMomentEstimate.emit((optimize_id, tuple(data.scan_axes), estimate))
+            opt_pos, fit_data, fit_res = self._get_pos_from_2d_gauss_fit(
+                xy,
+                data.data[self._data_channel].ravel(),
+                estimate,
+                seed
+            )
+        position_update = {ax: opt_pos[ii] for ii, ax in enumerate(data.scan_axes)}
+        peak_values = None
+        if fit_data is not None:
+            fit_data = {'fit_data': fit_data, 'full_fit_res': fit_res}
+            peak_values = self._peak_values_from_fit(fit_res)
+
+        drifted = False
+        if seed is not None:
+            drifted = fit_data is None or any(
+                abs(pos - ctr) > self._warm_start_max_drift * abs(sigma)
+                for pos, ctr, sigma in zip(opt_pos, seed['center'], seed['sigma'])
+            )
+        return position_update, fit_data, peak_values, drifted
+
+    def _fit_finished(self, result):
+        optimize_id, future = result
+        with self._thread_lock:
+            if optimize_id != self._optimize_id or self.module_state() == 'idle':
+                # belongs to an aborted optimize run
+                return
+            result_index, scan_axes = self._pending_fits.pop(future)
+            try:
+                position_update, fit_data, peak_values, drifted = future.result()
+            except:
+                self.log.exception('Optimizer fit failed: ')
+                position_update, fit_data, peak_values, drifted = dict(), None, None, False
+            self._unapplied_fits.append(
+                (result_index, scan_axes, position_update, fit_data, peak_values, drifted)
+            )
+
+            # Waiting for fits means no scan of this optimize run is in progress
+            if self._waiting_for_fits or self._scan_logic().module_state() == 'idle':
+                if not self._apply_unapplied_fits():
+                    return
+            if self._waiting_for_fits:
+                self._continue_after_fits()
+
+    def _apply_unapplied_fits(self):
+        """ Moves to the optimal positions of all finished fits. Must only be called while the
+        scanner is idle.
+
+        @return bool: Optimize continues (True) or was stopped due to a failed fit or restarted
+                      with full scan ranges (False)
+        """
+        fits = sorted(self._unapplied_fits, key=lambda fit: fit[0])
+        self._unapplied_fits = list()
+        for result_index, scan_axes, position_update, fit_data, peak_values, drifted in fits:
+            if drifted:
+                self._fall_back_to_full_range()
+                return False
+
+            if fit_data is not None:
+                new_pos = self._scan_logic().set_target_position(position_update, move_blocking=True)
+                for ax in tuple(position_update):
+                    position_update[ax] = new_pos[ax]
+                self._new_warm_start_steps[scan_axes] = peak_values
+
+            self._optimal_position.update(position_update)
+            with self._result_lock:
+                self._last_fits[result_index] = None if fit_data is None else fit_data['full_fit_res']
+            self.sigOptimizeStateChanged.emit(True, position_update, fit_data)
+
+            # Abort optimize if fit failed
+            if fit_data is None:
+                self.log.warning("Stopping optimization due to failed fit.")
+                self.stop_optimize()
+                return False
+        return True
+
+    def _continue_after_fits(self):
+        """ Continues with the next sequence step (or terminates the optimize sequence if finished)
+        as soon as all pending fits are applied.
+        """
+        if self._pending_fits or self._unapplied_fits:
+            self._waiting_for_fits = True
             return
+        self._waiting_for_fits = False
+        if self._sequence_index >= len(self._scan_sequence):
+            self._store_warm_start_entry()
+            self._optimize_succeeded = True
+            self.stop_optimize()
+        else:
+            self._sigNextSequenceStep.emit()
+
+    def _find_warm_start_entry(self, key, position):
+        """ Returns the last fit results stored for <key>, or for the closest previously optimized
+        position if no key is given. Entries are rejected if the position drifted by more than
+        <warm_start_max_drift> sigma since.
+
+        @param str key: POI name (or any other key), can be None
+        @param dict position: current scanner target position
+
+        @return dict: warm start entry with 'position' and fitted peak values per scan axes 'steps'
+        """
+        if not self._warm_start or not self._warm_start_cache:
+            return None
+        if key is not None:
+            entry = self._warm_start_cache.get(key, None)
+        else:
+            def distance(item):
+                return sum((item['position'][ax] - pos) ** 2 for ax, pos in position.items()
+                           if ax in item['position'])
+            entry = min(self._warm_start_cache.values(), key=distance)
+        if entry is None:
+            return None
+
+        for axes, peak_values in entry['steps'].items():
+            for ax, sigma in zip(axes, peak_values['sigma']):
+                if abs(position.get(ax, 0) - entry['position'].get(ax, 0)) > \
+                        self._warm_start_max_drift * abs(sigma):
+                    return None
+        return entry
+
+    def _store_warm_start_entry(self):
+        if not self._warm_start or not self._new_warm_start_steps:
+            return
+        self._warm_start_cache[self._warm_start_key] = {
+            'position': self._scan_logic().scanner_target,
+            'steps': self._new_warm_start_steps.copy()
+        }
+        self._warm_start_cache.move_to_end(self._warm_start_key)
+        while len(self._warm_start_cache) > self._warm_start_cache_size:
+            self._warm_start_cache.popitem(last=False)
+
+    def _reduce_scan_ranges(self, position):
+        """ Reduces scan range and resolution of all axes with a warm start entry to
+        <warm_start_range_sigmas> times the last fit sigma, keeping the pixel size.
+        """
+        ranges = dict()
+        resolution = dict()
+        for axes, peak_values in self._warm_start_entry['steps'].items():
+            for ax, sigma in zip(axes, peak_values['sigma']):
+                full_span = abs(self._full_scan_ranges[ax][1] - self._full_scan_ranges[ax][0])
+                span = min(full_span, self._warm_start_range_sigmas * abs(sigma))
+                if span <= 0 or full_span <= 0:
+                    continue
+                ranges[ax] = (position[ax] - span / 2, position[ax] + span / 2)
+                full_res = self._full_scan_resolution[ax]
+                resolution[ax] = min(full_res, max(5, int(np.ceil(full_res * span / full_span))))
+        self._scan_logic().set_scan_range(ranges)
+        self._scan_logic().set_scan_resolution(resolution)
+
+    def _fall_back_to_full_range(self):
+        """ Discards the warm start and repeats the optimize sequence with the full scan ranges
+        around the current target.
+        """
+        self.log.info('Optimize peak drifted out of the reduced warm start scan range. '
+                      'Repeating optimize sequence with full scan range.')
+        self._warm_start_cache.pop(self._warm_start_key, None)
+        self._warm_start_entry = None
+        self._new_warm_start_steps = dict()
+
+        # discard fits of the warm started scans still in progress
+        for future in self._pending_fits:
+            future.cancel()
+        self._optimize_id += 1
+        self._pending_fits = dict()
+        self._unapplied_fits = list()
+        self._waiting_for_fits = False
+
+        curr_pos = self._scan_logic().scanner_target
+        self._scan_logic().set_scan_range(
+            {ax: (curr_pos[ax] - abs(rng[1] - rng[0]) / 2, curr_pos[ax] + abs(rng[1] - rng[0]) / 2)
+             for ax, rng in self._full_scan_ranges.items()}
+        )
+        self._scan_logic().set_scan_resolution(self._full_scan_resolution)
+        self._sequence_index = 0
+        self._sigNextSequenceStep.emit()
+
+    def _get_warm_start_seed(self, data):
+        """ Peak values of the last fit of the same scan axes to seed the fit with. The center is
+        the center of the scan range, i.e. the target the scan was started at.
+        """
+        if self._warm_start_entry is None:
+            return None
+        peak_values = self._warm_start_entry['steps'].get(tuple(data.scan_axes), None)
+        if peak_values is None:
+            return None
+        seed = dict(peak_values)
+        seed['center'] = tuple((rng[0] + rng[1]) / 2 for rng in data.scan_range)
+        return seed
+
+    @staticmethod
+    def _peak_values_from_fit(fit_res):
+        values = fit_res.best_values
+        if 'center' in values:
+            center, sigma = (values['center'],), (values['sigma'],)
+        else:
+            center = (values['center_x'], values['center_y'])
+            sigma = (values['sigma_x'], values['sigma_y'])
+        return {'center': center,
+                'sigma': sigma,
+                'amplitude': values['amplitude'],
+                'offset': values['offset']}
 
     def stop_optimize(self):
         with self._thread_lock:
@@ -424,46 +924,132 @@ class ScannerOptimizeLogic(LogicBase):
                 err = 0
             self._scan_logic().set_scan_settings(self._stashed_scan_settings)
             self._stashed_scan_settings = dict()
+            # discard fits of this optimize run still in progress
+            for future in self._pending_fits:
+                future.cancel()
+            self._optimize_id += 1
+            self._pending_fits = dict()
+            self._unapplied_fits = list()
+            self._waiting_for_fits = False
             self.module_state.unlock()
             self.sigOptimizeStateChanged.emit(False, dict(), None)
             return err
 
-    def _get_pos_from_2d_gauss_fit(self, xy, data):
+    def _is_confident_estimate(self, estimate):
+        """ A moment estimate is confident if the peak is well above noise, resolved by more than
+        one pixel per dimension and not truncated by the scan range.
+        """
+        if estimate is None:
+            return False
+        return not estimate['truncated'] and estimate['snr'] >= self._prefit_min_snr and \
+            estimate['pixels'] >= 2 ** len(estimate['center'])
+
+    def _emit_moment_estimate(self, result):
+        """ Publishes the moment estimate (computed in the fit worker thread) as preliminary
+        optimal position before the full fit, unless the optimize run has ended in the meantime.
+        """
+        optimize_id, scan_axes, estimate = result
+        with self._thread_lock:
+            if optimize_id != self._optimize_id or self.module_state() == 'idle':
+                return
+            if self._is_confident_estimate(estimate):
+                self.sigOptimizeStateChanged.emit(True, dict(zip(scan_axes, estimate['center'])),
+                                                  None)
+
+    @staticmethod
+    def _gaussian_param_values(peak_values):
+        """ Maps peak values (center/sigma tuples, amplitude, offset) to the parameter names of
+        the Gaussian or Gaussian2D fit model.
+        """
+        values = {'offset': peak_values['offset'], 'amplitude': peak_values['amplitude']}
+        if len(peak_values['center']) == 1:
+            values['center'] = peak_values['center'][0]
+            values['sigma'] = peak_values['sigma'][0]
+        else:
+            values['center_x'], values['center_y'] = peak_values['center']
+            values['sigma_x'], values['sigma_y'] = peak_values['sigma']
+        return values
+
+    @staticmethod
+    def _seed_params(params, values):
+        """ Sets the start values of fit parameters, clipped to the parameter bounds.
+        """
+        for name, value in values.items():
+            if name in params:
+                param = params[name]
+                param.set(value=float(np.clip(value, param.min, param.max)))
+        return params
+
+    def _moment_fit_result(self, model, coords, values):
+        """ Evaluates the model at the moment estimate instead of fitting it.
+        """
+        params = self._seed_params(model.make_params(), values)
+        best_fit = model.eval(params=params, x=coords)
+        return MomentFitResult(params, best_fit)
+
+    def _get_pos_from_2d_gauss_fit(self, xy, data, estimate=None, seed=None):
         model = Gaussian2D()
+        moment_values = None
+        if self._is_confident_estimate(estimate):
+            moment_values = self._gaussian_param_values(estimate)
 
         try:
-            fit_result = model.fit(data, x=xy, **model.estimate_peak(data, xy))
+            if moment_values is not None and self._skip_fit_if_confident:
+                fit_result = self._moment_fit_result(model, xy, moment_values)
+            else:
+                params = model.estimate_peak(data, xy)
+                if seed is not None:
+                    self._seed_params(params, self._gaussian_param_values(seed))
+                if moment_values is not None:
+                    self._seed_params(params, moment_values)
+                fit_result = model.fit(data, x=xy, **params)
         except:
-            x_min, x_max = xy[0].min(), xy[0].max()
-            y_min, y_max = xy[1].min(), xy[1].max()
-            x_middle = (x_max - x_min) / 2 + x_min
-            y_middle = (y_max - y_min) / 2 + y_min
             self.log.exception('2D Gaussian fit unsuccessful.')
-            return (x_middle, y_middle), None, None
+            if moment_values is None:
+                x_min, x_max = xy[0].min(), xy[0].max()
+                y_min, y_max = xy[1].min(), xy[1].max()
+                x_middle = (x_max - x_min) / 2 + x_min
+                y_middle = (y_max - y_min) / 2 + y_min
+                return (x_middle, y_middle), None, None
+            self.log.warning('Using moment estimate of 2D Gaussian instead.')
+            fit_result = self._moment_fit_result(model, xy, moment_values)
 
         return (fit_result.best_values['center_x'],
                 fit_result.best_values['center_y']), fit_result.best_fit.reshape(xy[0].shape), fit_result
 
-    def _get_pos_from_1d_gauss_fit(self, x, data):
+    def _get_pos_from_1d_gauss_fit(self, x, data, estimate=None, seed=None):
         model = Gaussian()
+        moment_values = None
+        if self._is_confident_estimate(estimate):
+            moment_values = self._gaussian_param_values(estimate)
 
         try:
-            fit_result = model.fit(data, x=x, **model.estimate_peak(data, x))
+            if moment_values is not None and self._skip_fit_if_confident:
+                fit_result = self._moment_fit_result(model, x, moment_values)
+            else:
+                params = model.estimate_peak(data, x)
+                if seed is not None:
+                    self._seed_params(params, self._gaussian_param_values(seed))
+                if moment_values is not None:
+                    self._seed_params(params, moment_values)
+                fit_result = model.fit(data, x=x, **params)
         except:
-            x_min, x_max = x.min(), x.max()
-            middle = (x_max - x_min) / 2 + x_min
             self.log.exception('1D Gaussian fit unsuccessful.')
-            return (middle,), None, None
+            if moment_values is None:
+                x_min, x_max = x.min(), x.max()
+                middle = (x_max - x_min) / 2 + x_min
+                return (middle,), None, None
+            self.log.warning('Using moment estimate of 1D Gaussian instead.')
+            fit_result = self._moment_fit_result(model, x, moment_values)
 
         return (fit_result.best_values['center'],), fit_result.best_fit, fit_result
 
-
 class OptimizerScanSequence:
     def __init__(self, axes, dimensions=[2,1], sequence=None):
         self._avail_axes = axes
         self._optimizer_dim = dimensions
         self._sequence = None
-        if sequence in self._available_opt_seqs_raw():
+        if self._is_available_sequence(sequence):
             self.sequence = sequence
 
     def __eq__(self, other):
@@ -505,7 +1091,7 @@ class OptimizerScanSequence:
         """
         @param sequence: list of tuples, eg. [('x','y'), ('z')]
         """
-        if not sequence in self._available_opt_seqs_raw():
+        if not self._is_available_sequence(sequence):
             raise ValueError(f"Given {sequence} sequence incompatible with axes= {self._avail_axes}, dims= {self._optimizer_dim}")
 
         self._sequence = sequence
@@ -516,116 +1102,68 @@ class OptimizerScanSequence:
         Based on the given plot dimensions and axes configuration, give all possible permutations of scan sequences.
         """
 
-        return [OptimizerScanSequence(self._avail_axes, self._optimizer_dim, seq) for seq in self._available_opt_seqs_raw()]
+        return [OptimizerScanSequence(self._avail_axes, self._optimizer_dim, list(seq)) for seq in
+                _cached_optimizer_sequences(tuple(self._avail_axes), tuple(self._optimizer_dim))]
 
     def _available_opt_seqs_raw(self, remove_1d_in_2d=True):
         """
         @oaram remove_1d_in_2d: remove sequences where 1d steps are repeated in 2d steps, eg. [('x','y'), ('x')]
         """
-        def get_n_in(comb_list, seq_step):
-            if type(seq_step) != tuple:
-                raise ValueError
+        return [list(seq) for seq in _cached_optimizer_sequences(tuple(self._avail_axes),
+                                                                 tuple(self._optimizer_dim),
+                                                                 remove_1d_in_2d)]
 
-            n_in = 0
-            for old_step in comb_list:
-                if type(old_step) != tuple:
-                    raise ValueError
-                if old_step == seq_step:
-                    n_in += 1
-                    continue
-                if len(old_step) == 2 and len(seq_step) == 2:
-                    if old_step[0] == seq_step[1] and old_step[1] == seq_step[0]:
-                        n_in += 1
-                        continue
-            return n_in
-
-        def add_comb(old_comb, new_seqs):
-            out_comb = []
-
-            for old_list in old_comb:
-                for seq in new_seqs:
-                    out_comb.append(combine(old_list, seq))
-
-            if not old_comb:
-                return [[seq] for seq in new_seqs]
-            if not out_comb:
-                return old_comb
-
-            # clean doubles within combination
-            out_clean = []
-            for comb in out_comb:
-                out_clean.append([el for el in comb if get_n_in(comb, el) == 1])
-            out_comb = [el for el in out_clean if len(el) == len(out_comb[0])]
-
-            return out_comb
-
-        def combine(in1, in2):
-
-            in1 = cp.deepcopy(in1)
-            in2 = cp.deepcopy(in2)
-
-            if type(in1) == str:
-                in1 = tuple(in1)
-            if type(in2) == str:
-                in2 = tuple(in2)
-
-            if type(in1) == list and type(in2) == list:
-                in1.extend(in2)
-                return in1
-            elif type(in1) != list and type(in2) == list:
-                in2.insert(0, in1)
-                return in2
-            elif type(in1) == list and type(in2) != list:
-                in1.append(in2)
-                return in1
-            else:
-                return [in1, in2]
-
-        def remove_duplicates(comb_list):
-            out_seqs = []
-            for seq in comb_list:
-                if seq not in out_seqs:
-                    out_seqs.append(seq)
-
-            return out_seqs
-
-        def remove_1d_in_2d_axes_dupl(comb_list):
-            out_seqs = []
-            for seq in comb_list:
-                is_1d_in_2d = False
-                for step in seq:
-                    if type(step) == tuple and len(step) == 1:
-                        # if 1d step, check whether in any of the other 2 stpes
-                        is_step_in = any([step[0] in s for s in seq if type(s)==tuple and len(s)==2])
-                        if is_step_in:
-                            is_1d_in_2d = True
-
-                if not is_1d_in_2d:
-                    out_seqs.append(seq)
-            return out_seqs
-
-        combs_2d = list(itertools.combinations(self._avail_axes, 2))
-        combs_1d = list(itertools.combinations(self._avail_axes, 1))
-        out_seqs = []
-
-        for dim in self._optimizer_dim:
-            if dim == 1:
-                out_seqs = add_comb(out_seqs, combs_1d)
-            elif dim == 2:
-                out_seqs = add_comb(out_seqs, combs_2d)
-            else:
-                raise ValueError("Only support 1d and 2d optimization sequences.")
-
-        # add permutations
-        out_seqs_any_order = []
-        for seq in out_seqs:
-            out_seqs_any_order.extend([list(el) for el in list(itertools.permutations(seq))])
-        out_seqs = out_seqs_any_order
-        # clean up
-        out_seqs = remove_duplicates(out_seqs)
+    def _is_available_sequence(self, sequence):
+        try:
+            return tuple(sequence) in _cached_optimizer_sequence_set(tuple(self._avail_axes),
+                                                                     tuple(self._optimizer_dim))
+        except TypeError:
+            # unhashable steps (e.g. lists) never match the tuple steps of valid sequences
+            return False
+
+
+def iter_optimizer_sequences(axes, dimensions, remove_1d_in_2d=True):
+    """ Generates all optimizer scan sequences for the given axes and the dimensions of the
+    sequence steps, e.g. [2, 1]. Steps of each sequence are distinct and can come in any order.
+    Sequences are generated lazily, only the already yielded sequences are kept to skip duplicates.
+
+    @param iterable axes: names of the scanner axes
+    @param iterable dimensions: dimension (1 or 2) of each step
+    @param bool remove_1d_in_2d: skip sequences where 1d steps are repeated in 2d steps,
+                                 eg. [('x','y'), ('x')]
+
+    @return generator: sequences as lists of axes tuples
+    """
+    step_choices = list()
+    for dim in dimensions:
+        if dim not in (1, 2):
+            raise ValueError("Only support 1d and 2d optimization sequences.")
+        combs = tuple(itertools.combinations(axes, dim))
+        # dimensions without any possible step are skipped
+        if combs:
+            step_choices.append(combs)
+    if not step_choices:
+        return
+
+    yielded = set()
+    for steps in itertools.product(*step_choices):
+        if len(set(steps)) != len(steps):
+            continue
         if remove_1d_in_2d:
-            out_seqs = remove_1d_in_2d_axes_dupl(out_seqs)
+            axes_2d = set(ax for step in steps if len(step) == 2 for ax in step)
+            if any(len(step) == 1 and step[0] in axes_2d for step in steps):
+                continue
+        for seq in itertools.permutations(steps):
+            if seq not in yielded:
+                yielded.add(seq)
+                yield list(seq)
+
 
-        return out_seqs
+@functools.lru_cache(maxsize=32)
+def _cached_optimizer_sequences(axes, dimensions, remove_1d_in_2d=True):
+    return tuple(tuple(seq) for seq in iter_optimizer_sequences(axes, dimensions, remove_1d_in_2d))
 
 
+@functools.lru_cache(maxsize=32)
+def _cached_optimizer_sequence_set(axes, dimensions):
+    return frozenset(_cached_optimizer_sequences(axes, dimensions))